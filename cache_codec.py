@@ -0,0 +1,70 @@
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, Tuple, Union
+
+import orjson
+import zstandard
+
+# Every encoded payload starts with one version byte naming the codec that
+# produced it. Entries written before codecs existed are plain JSON text and
+# always start with "{", which is never a registered version byte.
+CODEC_ORJSON = 1
+CODEC_ORJSON_ZSTD = 2
+
+# Payloads smaller than this are not worth the zstd frame overhead
+COMPRESSION_MIN_BYTES = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", "1024"))
+ZSTD_LEVEL = int(os.getenv("CACHE_ZSTD_LEVEL", "6"))
+
+# zstd contexts are not safe to share between threads
+_zstd = threading.local()
+
+def _compressor() -> zstandard.ZstdCompressor:
+    if not hasattr(_zstd, "compressor"):
+        _zstd.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _zstd.compressor
+
+def _decompressor() -> zstandard.ZstdDecompressor:
+    if not hasattr(_zstd, "decompressor"):
+        _zstd.decompressor = zstandard.ZstdDecompressor()
+    return _zstd.decompressor
+
+def _encode_orjson_zstd(data: Any) -> bytes:
+    return _compressor().compress(orjson.dumps(data))
+
+def _decode_orjson_zstd(body: bytes) -> Any:
+    return orjson.loads(_decompressor().decompress(body))
+
+_CODECS: Dict[int, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    CODEC_ORJSON: (orjson.dumps, orjson.loads),
+    CODEC_ORJSON_ZSTD: (_encode_orjson_zstd, _decode_orjson_zstd),
+}
+
+def register_codec(version: int, encoder: Callable[[Any], bytes], decoder: Callable[[bytes], Any]) -> None:
+    """Register a codec under a version byte so its payloads can be decoded"""
+    if not 0 < version < 256 or version == ord("{"):
+        raise ValueError(f"Invalid codec version byte: {version}")
+    _CODECS[version] = (encoder, decoder)
+
+def encode(data: Any, version: int = CODEC_ORJSON_ZSTD) -> bytes:
+    """Serialize data with the given codec, prefixed by its version byte"""
+    if version == CODEC_ORJSON_ZSTD:
+        raw = orjson.dumps(data)
+        if len(raw) < COMPRESSION_MIN_BYTES:
+            return bytes([CODEC_ORJSON]) + raw
+        return bytes([CODEC_ORJSON_ZSTD]) + _compressor().compress(raw)
+    encoder, _ = _CODECS[version]
+    return bytes([version]) + encoder(data)
+
+def decode(payload: Union[bytes, str]) -> Any:
+    """Deserialize a payload written by encode() or a legacy json.dumps() string"""
+    if isinstance(payload, str):
+        return json.loads(payload)
+    if not payload:
+        raise ValueError("Empty cache payload")
+    version = payload[0]
+    if version not in _CODECS:
+        # Legacy entries are plain UTF-8 JSON
+        return json.loads(payload)
+    _, decoder = _CODECS[version]
+    return decoder(payload[1:])
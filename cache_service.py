@@ -3,8 +3,68 @@ import json
 import hashlib
 import time
 import re
-from typing import Optional, Dict, Any
-from redis_stream_client import redis_client
+import threading
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Any, List, Set, Tuple, Union
+import redis
+import cache_codec
+from redis_stream_client import redis_client, redis_binary_client
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry TTL and a byte budget"""
+    
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        # Bumped on every invalidation so a fill that raced with one is dropped
+        self.generation = 0
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any, size: int, generation: Optional[int] = None) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+    
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self.generation += 1
+            self._remove(key)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size_bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
 
 class CacheService:
     """Multi-layer caching service for EchoBrief"""
@@ -13,15 +73,269 @@ class CacheService:
     EPISODE_CACHE_PREFIX = "episode"
     TRANSCRIPT_CACHE_PREFIX = "transcript"
     
+    # Summary types stored per transcript (ts: takeaways, ns: narrative, bs: bullet points)
+    SUMMARY_TYPES = ("ts", "ns", "bs")
+    
     # TTL values (in seconds) - 7 days
     EPISODE_CACHE_TTL = 7 * 24 * 60 * 60
     TRANSCRIPT_CACHE_TTL = 7 * 24 * 60 * 60
     
+    # Live-entry counters: one hash field per (tier, expiry hour) so expired
+    # entries drop out of the stats without scanning the keyspace
+    STATS_KEY = "cache:stats"
+    STATS_BUCKET_SECONDS = 60 * 60
+    STATS_TIERS = ("episode", "transcript", "file_hash", "summary")
+    # Entry writes and deletes move their counter in the same script, and the
+    # bucket always comes from the entry's absolute expiry on the Redis clock,
+    # so a delete decrements exactly the field its write incremented.
+    # KEYS: stats hash, entries; ARGV: bucket seconds, then per script below
+    _ENTRY_EXPIRY_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local bucket_ms = tonumber(ARGV[1]) * 1000
+local function expires_at(key)
+    local ok, at = pcall(redis.call, 'PEXPIRETIME', key)
+    if ok then
+        return at
+    end
+    local ttl = redis.call('PTTL', key)
+    if ttl < 0 then
+        return ttl
+    end
+    return now_ms + ttl
+end
+local function field(tier, at)
+    return tier .. ':' .. string.format('%d', math.floor(at / bucket_ms))
+end
+"""
+    # ARGV: bucket seconds, tier, payload, ttl seconds
+    _WRITE_ENTRY_SCRIPT = _ENTRY_EXPIRY_LUA + """
+local previous = expires_at(KEYS[2])
+if previous >= 0 then
+    redis.call('HINCRBY', KEYS[1], field(ARGV[2], previous), -1)
+end
+local expiry = now_ms + tonumber(ARGV[4]) * 1000
+redis.call('SET', KEYS[2], ARGV[3])
+redis.call('PEXPIREAT', KEYS[2], expiry)
+redis.call('HINCRBY', KEYS[1], field(ARGV[2], expiry), 1)
+return 1
+"""
+    # ARGV: bucket seconds, then each entry's tier ("" for uncounted keys)
+    _DELETE_ENTRIES_SCRIPT = _ENTRY_EXPIRY_LUA + """
+local deleted = 0
+for i = 2, #KEYS do
+    local previous = expires_at(KEYS[i])
+    if redis.call('UNLINK', KEYS[i]) == 1 then
+        deleted = deleted + 1
+        if ARGV[i] ~= '' and previous >= 0 then
+            redis.call('HINCRBY', KEYS[1], field(ARGV[i], previous), -1)
+        end
+    end
+end
+return deleted
+"""
+    
+    # Keys requested per SCAN call and deleted per UNLINK when clearing
+    CLEAR_BATCH_SIZE = 500
+    
+    # In-process L1 tier in front of Redis for episode lookups. It is only
+    # consulted while this process is subscribed to the invalidation channel,
+    # so writes from other services can never be masked for longer than the
+    # time it takes a pub/sub message to arrive.
+    L1_CACHE_MAX_BYTES = int(os.getenv("L1_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    L1_CACHE_TTL = float(os.getenv("L1_CACHE_TTL", "60"))
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    INVALIDATE_ALL = "*"
+    
+    # Podcast Index lookups (show title / iTunes id -> RSS URL). Feed URLs
+    # rarely change, so entries are served for FEED_URL_CACHE_TTL and only
+    # refreshed in the background once older than FEED_URL_FRESH_SECONDS.
+    # "Not found" answers are cached briefly so unknown shows don't hit the API
+    # on every submission.
+    FEED_URL_CACHE_PREFIX = "feedurl"
+    FEED_URL_CACHE_TTL = int(os.getenv("FEED_URL_CACHE_TTL", str(30 * 24 * 60 * 60)))
+    FEED_URL_FRESH_SECONDS = int(os.getenv("FEED_URL_FRESH_SECONDS", str(7 * 24 * 60 * 60)))
+    FEED_URL_NEGATIVE_TTL = int(os.getenv("FEED_URL_NEGATIVE_TTL", str(60 * 60)))
+    
+    # Indexed RSS feeds (see feed_index) shared by every resolver replica. The
+    # index is kept long after it goes stale so the feed can be revalidated
+    # with a conditional GET instead of downloaded and parsed again.
+    RSS_FEED_CACHE_PREFIX = "rssfeed"
+    RSS_FEED_CACHE_TTL = int(os.getenv("RSS_FEED_CACHE_TTL", str(7 * 24 * 60 * 60)))
+    # Decoded indexes are also kept in-process, tagged with the revision they
+    # were built from; a lookup reads only the small meta key and transfers
+    # and decodes the index again only when another replica stored a new one.
+    RSS_FEED_LOCAL_MAX_BYTES = int(os.getenv("RSS_FEED_LOCAL_MAX_BYTES", str(16 * 1024 * 1024)))
+    
+    # Titles scraped from Apple/Spotify episode pages; an episode's titles
+    # don't change, so these live as long as episode summaries
+    PAGE_METADATA_CACHE_PREFIX = "pagemeta"
+    PAGE_METADATA_CACHE_TTL = 30 * 24 * 60 * 60
+    
+    # Single-flight registry: the first /submit for an episode owns the job and
+    # identical requests attach to its job_id until the summary is cached.
+    # Consumers extend the key on every heartbeat while they work on the job,
+    # so the TTL only runs out if a job dies without releasing its key.
+    INFLIGHT_JOB_PREFIX = "inflight"
+    INFLIGHT_JOB_TTL = int(os.getenv("INFLIGHT_JOB_TTL", str(15 * 60)))
+    # Resolved request data and final results, kept so late subscribers of a
+    # shared job still get them
+    JOB_PREFIX = "job"
+    JOB_TTL = 60 * 60
+    # Delete the in-flight key only if it still names the releasing job
+    _RELEASE_INFLIGHT_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+    # Extend the in-flight key only if it still names the heartbeating job
+    _REFRESH_INFLIGHT_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+    
+    # Acoustic fingerprints of transcribed audio (see audio_fingerprint), so a
+    # copy of an episode with different ads can reuse its transcript. Each
+    # fingerprint is also filed under its MinHash bands; recordings sharing a
+    # band are candidate matches. Both live, and are cleared, with the transcripts.
+    FINGERPRINT_CACHE_PREFIX = f"{TRANSCRIPT_CACHE_PREFIX}:fingerprint"
+    
+    _l1 = LocalCache(L1_CACHE_MAX_BYTES, L1_CACHE_TTL)
+    _l1_enabled = False
+    _rss_feed_l1 = LocalCache(RSS_FEED_LOCAL_MAX_BYTES, RSS_FEED_CACHE_TTL)
+    _tier_stats = {
+        "l1": {"hits": 0, "misses": 0},
+        "redis": {"hits": 0, "misses": 0}
+    }
+    
     @staticmethod
     def _generate_episode_key(platform: str, episode_id: str, summary_type: str) -> str:
         """Generate cache key for episode-level caching"""
         return f"{CacheService.EPISODE_CACHE_PREFIX}:{platform}:{episode_id}:{summary_type}"
     
+    @staticmethod
+    def _stats_tier(key: str) -> str:
+        """The tier _write_entry counts a key under, "" for keys it doesn't write"""
+        prefix, _, rest = key.partition(":")
+        if prefix == CacheService.EPISODE_CACHE_PREFIX:
+            return "episode"
+        if prefix != CacheService.TRANSCRIPT_CACHE_PREFIX:
+            return ""
+        kind, _, rest = rest.partition(":")
+        if not rest:
+            return "transcript"
+        return {"file": "file_hash", "summary": "summary"}.get(kind, "")
+    
+    @staticmethod
+    def _write_entry(key: str, ttl: int, payload: Union[str, bytes], tier: str,
+                     client: redis.Redis = None) -> None:
+        """Write a cache entry and move its counter to the new expiry bucket"""
+        client = client or redis_client
+        client.eval(
+            CacheService._WRITE_ENTRY_SCRIPT, 2, CacheService.STATS_KEY, key,
+            CacheService.STATS_BUCKET_SECONDS, tier, payload, ttl
+        )
+    
+    @staticmethod
+    def _delete_entries(keys: List[str], client: redis.Redis = None) -> int:
+        """Unlink cache entries and decrement their counters"""
+        client = client or redis_client
+        return client.eval(
+            CacheService._DELETE_ENTRIES_SCRIPT, len(keys) + 1, CacheService.STATS_KEY, *keys,
+            CacheService.STATS_BUCKET_SECONDS, *[CacheService._stats_tier(key) for key in keys]
+        )
+    
+    @staticmethod
+    def _publish_invalidation(key: str) -> None:
+        """Drop key from this process's L1 and tell every other process to do the same"""
+        if key == CacheService.INVALIDATE_ALL:
+            CacheService._l1.clear()
+        else:
+            CacheService._l1.discard(key)
+        try:
+            redis_client.publish(CacheService.INVALIDATION_CHANNEL, key)
+        except Exception as e:
+            print(f"⚠️ Cache invalidation publish error: {e}")
+    
+    @staticmethod
+    def _handle_invalidation(key: str) -> None:
+        """Apply an invalidation message received from another process"""
+        if key == CacheService.INVALIDATE_ALL:
+            CacheService._l1.clear()
+        else:
+            CacheService._l1.discard(key)
+    
+    @staticmethod
+    def start_invalidation_listener() -> threading.Thread:
+        """Subscribe to L1 invalidations in a daemon thread and enable the L1 tier"""
+        def _listen():
+            backoff = 1
+            while True:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(CacheService.INVALIDATION_CHANNEL)
+                    # Anything cached before (re)subscribing may have missed messages
+                    CacheService._l1.clear()
+                    CacheService._l1_enabled = True
+                    print("👂 Listening for cache invalidations...")
+                    backoff = 1
+                    for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            CacheService._handle_invalidation(message["data"])
+                except Exception as e:
+                    print(f"⚠️ Cache invalidation listener error: {e}")
+                finally:
+                    CacheService._l1_enabled = False
+                    CacheService._l1.clear()
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+        
+        thread = threading.Thread(target=_listen, name="cache-invalidation-listener", daemon=True)
+        thread.start()
+        return thread
+    
+    @staticmethod
+    def get_tier_stats() -> Dict[str, Any]:
+        """Get per-tier hit/miss counters for episode lookups in this process"""
+        l1_stats = CacheService._tier_stats["l1"]
+        redis_stats = CacheService._tier_stats["redis"]
+        lookups = l1_stats["hits"] + l1_stats["misses"]
+        return {
+            "l1": {
+                **l1_stats,
+                "enabled": CacheService._l1_enabled,
+                "entries": len(CacheService._l1),
+                "size_bytes": CacheService._l1.size_bytes,
+                "max_bytes": CacheService._l1.max_bytes,
+                "hit_ratio": l1_stats["hits"] / lookups if lookups else 0.0
+            },
+            "redis": dict(redis_stats)
+        }
+    
+    @staticmethod
+    def _unlink_matching(pattern: str) -> int:
+        """
+        Incrementally SCAN for keys matching pattern and UNLINK them in bounded
+        batches, each batch decrementing its entries' counters in the same script
+        """
+        cleared = 0
+        batch = []
+        for key in redis_client.scan_iter(match=pattern, count=CacheService.CLEAR_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= CacheService.CLEAR_BATCH_SIZE:
+                cleared += CacheService._delete_entries(batch)
+                batch = []
+        if batch:
+            cleared += CacheService._delete_entries(batch)
+        return cleared
+    
     @staticmethod
     def extract_episode_id(url: str) -> str:
         """Extract episode ID from URL"""
@@ -53,13 +367,28 @@ class CacheService:
         """Get cached episode summary"""
         try:
             key = CacheService._generate_episode_key(platform, episode_id, summary_type)
+            
+            if CacheService._l1_enabled:
+                data = CacheService._l1.get(key)
+                if data is not None:
+                    CacheService._tier_stats["l1"]["hits"] += 1
+                    print(f"🎯 L1 Cache HIT: Found cached episode {episode_id} for {summary_type}")
+                    # Callers enrich the result in place, so hand out a copy
+                    return dict(data)
+                CacheService._tier_stats["l1"]["misses"] += 1
+            
+            generation = CacheService._l1.generation
             cached_data = redis_client.get(key)
             
             if cached_data:
                 data = json.loads(cached_data)
+                CacheService._tier_stats["redis"]["hits"] += 1
+                if CacheService._l1_enabled:
+                    CacheService._l1.put(key, dict(data), len(cached_data), generation)
                 print(f"🎯 Cache HIT: Found cached episode {episode_id} for {summary_type}")
                 return data
             
+            CacheService._tier_stats["redis"]["misses"] += 1
             print(f"❌ Cache MISS: No cached episode {episode_id} for {summary_type}")
             return None
             
@@ -78,11 +407,13 @@ class CacheService:
                 "cache_ttl": CacheService.EPISODE_CACHE_TTL
             }
             
-            redis_client.setex(
-                key, 
-                CacheService.EPISODE_CACHE_TTL, 
-                json.dumps(cache_data)
+            CacheService._write_entry(
+                key,
+                CacheService.EPISODE_CACHE_TTL,
+                json.dumps(cache_data),
+                "episode"
             )
+            CacheService._publish_invalidation(key)
             
             print(f"💾 Cached episode {episode_id} for {summary_type}")
             return True
@@ -96,7 +427,8 @@ class CacheService:
         """Invalidate a specific episode cache entry"""
         try:
             key = CacheService._generate_episode_key(platform, episode_id, summary_type)
-            result = redis_client.delete(key)
+            result = CacheService._delete_entries([key])
+            CacheService._publish_invalidation(key)
             if result:
                 print(f"🗑️ Invalidated cache for episode {episode_id} ({summary_type})")
             return bool(result)
@@ -108,16 +440,34 @@ class CacheService:
     def get_cache_stats() -> Dict[str, Any]:
         """Get cache statistics"""
         try:
-            # Count episode cache keys
-            episode_keys = len(redis_client.keys(f"{CacheService.EPISODE_CACHE_PREFIX}:*"))
-            transcript_keys = len(redis_client.keys(f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:*"))
-            file_hash_keys = len(redis_client.keys(f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:file:*"))
+            counts = {tier: 0 for tier in CacheService.STATS_TIERS}
+            # Buckets are filed by the Redis clock, so they're aged by it too
+            now, _ = redis_client.time()
+            current_bucket = int(now) // CacheService.STATS_BUCKET_SECONDS
+            expired_fields = []
+            
+            for field, value in redis_client.hgetall(CacheService.STATS_KEY).items():
+                tier, _, bucket = field.rpartition(":")
+                if int(bucket) < current_bucket:
+                    expired_fields.append(field)
+                elif tier in counts:
+                    counts[tier] += int(value)
+            
+            # Buckets in the past only hold entries Redis has already expired
+            if expired_fields:
+                redis_client.hdel(CacheService.STATS_KEY, *expired_fields)
+            
+            episode_keys = max(counts["episode"], 0)
+            file_hash_keys = max(counts["file_hash"], 0)
+            summary_keys = max(counts["summary"], 0)
+            transcript_keys = max(counts["transcript"], 0) + file_hash_keys
             
             return {
                 "episode_cache_count": episode_keys,
                 "transcript_cache_count": transcript_keys,
                 "file_hash_cache_count": file_hash_keys,
-                "total_cached_items": episode_keys + transcript_keys
+                "summary_cache_count": summary_keys,
+                "total_cached_items": episode_keys + transcript_keys + summary_keys
             }
             
         except Exception as e:
@@ -126,7 +476,7 @@ class CacheService:
     
     @staticmethod
     def _generate_transcript_key(transcript_hash: str) -> str:
-        """Generate cache key for transcript-level caching"""
+        """Generate cache key for the content-addressed transcript blob"""
         return f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:{transcript_hash}"
     
     @staticmethod
@@ -134,20 +484,58 @@ class CacheService:
         """Generate hash for transcript content"""
         return hashlib.sha256(transcript.encode('utf-8')).hexdigest()
     
+    @staticmethod
+    def get_transcript_id(transcript: str) -> str:
+        """Get the content-addressed id a transcript is stored under"""
+        return CacheService._generate_transcript_hash(transcript)
+    
     @staticmethod
     def _generate_file_hash_key(file_hash: str) -> str:
-        """Generate cache key for file hash-based transcript caching"""
+        """Generate cache key for the file hash -> transcript id index"""
         return f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:file:{file_hash}"
     
+    @staticmethod
+    def _generate_summary_key(transcript_id: str, summary_type: str) -> str:
+        """Generate cache key for one summary type of a transcript"""
+        return f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:summary:{transcript_id}:{summary_type}"
+    
+    @staticmethod
+    def _is_transcript_id(value: bytes) -> bool:
+        """Check whether a file hash index value is a transcript id (vs. a legacy full document)"""
+        return len(value) == 64 and all(c in b"0123456789abcdef" for c in value)
+    
+    @staticmethod
+    def _write_transcript_blob(transcript_id: str, data: Dict[str, Any]) -> None:
+        """Write the transcript document without its summaries"""
+        cache_data = {
+            **{k: v for k, v in data.items() if k != "summaries"},
+            "cached_at": time.time(),
+            "cache_ttl": CacheService.TRANSCRIPT_CACHE_TTL,
+            "transcript_hash": transcript_id
+        }
+        CacheService._write_entry(
+            CacheService._generate_transcript_key(transcript_id),
+            CacheService.TRANSCRIPT_CACHE_TTL,
+            cache_codec.encode(cache_data),
+            "transcript",
+            redis_binary_client
+        )
+        for summary_type, summary in (data.get("summaries") or {}).items():
+            CacheService.set_cached_summary(transcript_id, summary_type, summary)
+    
     @staticmethod
     def get_cached_transcript_by_hash(file_hash: str) -> Optional[Dict[str, Any]]:
         """Get cached transcript data by file hash"""
         try:
             key = CacheService._generate_file_hash_key(file_hash)
-            cached_data = redis_client.get(key)
+            cached_data = redis_binary_client.get(key)
+            
+            if cached_data and CacheService._is_transcript_id(cached_data):
+                transcript_id = cached_data.decode("ascii")
+                cached_data = redis_binary_client.get(CacheService._generate_transcript_key(transcript_id))
             
             if cached_data:
-                data = json.loads(cached_data)
+                data = cache_codec.decode(cached_data)
                 print(f"🎯 File Hash Cache HIT: Found cached transcript for file hash {file_hash[:8]}...")
                 return data
             
@@ -159,21 +547,19 @@ class CacheService:
             return None
     
     @staticmethod
-    def set_cached_transcript_by_hash(file_hash: str, data: Dict[str, Any]) -> bool:
+    def set_cached_transcript_by_hash(file_hash: str, data: Dict[str, Any], transcript_id: str = None) -> bool:
         """Cache transcript data by file hash"""
         try:
-            key = CacheService._generate_file_hash_key(file_hash)
-            cache_data = {
-                **data,
-                "cached_at": time.time(),
-                "cache_ttl": CacheService.TRANSCRIPT_CACHE_TTL,
-                "file_hash": file_hash
-            }
+            transcript_id = transcript_id or CacheService.get_transcript_id(data["transcript"])
+            CacheService._write_transcript_blob(transcript_id, {**data, "file_hash": file_hash})
             
-            redis_client.setex(
-                key, 
-                CacheService.TRANSCRIPT_CACHE_TTL, 
-                json.dumps(cache_data)
+            # The file hash key only points at the content-addressed blob
+            CacheService._write_entry(
+                CacheService._generate_file_hash_key(file_hash),
+                CacheService.TRANSCRIPT_CACHE_TTL,
+                transcript_id,
+                "file_hash",
+                redis_binary_client
             )
             
             print(f"💾 Cached transcript by file hash {file_hash[:8]}...")
@@ -183,16 +569,87 @@ class CacheService:
             print(f"⚠️ File hash cache set error: {e}")
             return False
     
+    @staticmethod
+    def link_file_hash_to_transcript(file_hash: str, transcript_id: str) -> bool:
+        """Point another file hash at an already cached transcript, leaving its blob untouched"""
+        try:
+            CacheService._write_entry(
+                CacheService._generate_file_hash_key(file_hash),
+                CacheService.TRANSCRIPT_CACHE_TTL,
+                transcript_id,
+                "file_hash",
+                redis_binary_client
+            )
+            print(f"🔗 Linked file hash {file_hash[:8]}... to transcript {transcript_id[:8]}...")
+            return True
+        except Exception as e:
+            print(f"⚠️ File hash link error: {e}")
+            return False
+    
+    @staticmethod
+    def get_cached_summary(transcript_id: str, summary_type: str) -> Optional[str]:
+        """Get one cached summary type for a transcript"""
+        try:
+            cached_data = redis_binary_client.get(CacheService._generate_summary_key(transcript_id, summary_type))
+            
+            if cached_data:
+                print(f"🎯 Summary Cache HIT: Found cached {summary_type} summary")
+                return cache_codec.decode(cached_data)
+            
+            print(f"❌ Summary Cache MISS: No cached {summary_type} summary")
+            return None
+            
+        except Exception as e:
+            print(f"⚠️ Summary cache error: {e}")
+            return None
+    
+    @staticmethod
+    def set_cached_summary(transcript_id: str, summary_type: str, summary: str) -> bool:
+        """Cache one summary type for a transcript without rewriting the transcript"""
+        try:
+            CacheService._write_entry(
+                CacheService._generate_summary_key(transcript_id, summary_type),
+                CacheService.TRANSCRIPT_CACHE_TTL,
+                cache_codec.encode(summary),
+                "summary",
+                redis_binary_client
+            )
+            print(f"💾 Cached {summary_type} summary")
+            return True
+            
+        except Exception as e:
+            print(f"⚠️ Summary cache set error: {e}")
+            return False
+    
+    @staticmethod
+    def has_cached_transcript(transcript_id: str) -> bool:
+        """Check whether a transcript blob is cached without fetching it"""
+        try:
+            return bool(redis_binary_client.exists(CacheService._generate_transcript_key(transcript_id)))
+        except Exception as e:
+            print(f"⚠️ Transcript cache error: {e}")
+            return False
+    
     @staticmethod
     def get_cached_transcript(transcript: str) -> Optional[Dict[str, Any]]:
-        """Get cached transcript data"""
+        """Get cached transcript data together with all cached summaries"""
         try:
             transcript_hash = CacheService._generate_transcript_hash(transcript)
             key = CacheService._generate_transcript_key(transcript_hash)
-            cached_data = redis_client.get(key)
+            summary_keys = [
+                CacheService._generate_summary_key(transcript_hash, summary_type)
+                for summary_type in CacheService.SUMMARY_TYPES
+            ]
+            cached_data, *cached_summaries = redis_binary_client.mget([key] + summary_keys)
             
             if cached_data:
-                data = json.loads(cached_data)
+                data = cache_codec.decode(cached_data)
+                # Blobs written before the split layout embed their summaries
+                summaries = dict(data.get("summaries") or {})
+                for summary_type, cached_summary in zip(CacheService.SUMMARY_TYPES, cached_summaries):
+                    if cached_summary:
+                        summaries[summary_type] = cache_codec.decode(cached_summary)
+                data["summaries"] = summaries
                 print(f"🎯 Transcript Cache HIT: Found cached transcript")
                 return data
             
@@ -204,23 +661,11 @@ class CacheService:
             return None
     
     @staticmethod
-    def set_cached_transcript(transcript: str, data: Dict[str, Any]) -> bool:
-        """Cache transcript data"""
+    def set_cached_transcript(transcript: str, data: Dict[str, Any], transcript_id: str = None) -> bool:
+        """Cache transcript data; any summaries in data are stored under their own keys"""
         try:
-            transcript_hash = CacheService._generate_transcript_hash(transcript)
-            key = CacheService._generate_transcript_key(transcript_hash)
-            cache_data = {
-                **data,
-                "cached_at": time.time(),
-                "cache_ttl": CacheService.TRANSCRIPT_CACHE_TTL,
-                "transcript_hash": transcript_hash
-            }
-            
-            redis_client.setex(
-                key, 
-                CacheService.TRANSCRIPT_CACHE_TTL, 
-                json.dumps(cache_data)
-            )
+            transcript_hash = transcript_id or CacheService._generate_transcript_hash(transcript)
+            CacheService._write_transcript_blob(transcript_hash, data)
             
             print(f"💾 Cached transcript")
             return True
@@ -231,11 +676,16 @@ class CacheService:
     
     @staticmethod
     def invalidate_specific_transcript(transcript: str) -> bool:
-        """Invalidate a specific transcript cache entry"""
+        """Invalidate a specific transcript cache entry and its summaries"""
         try:
             transcript_hash = CacheService._generate_transcript_hash(transcript)
             key = CacheService._generate_transcript_key(transcript_hash)
-            result = redis_client.delete(key)
+            result = CacheService._delete_entries([key], redis_binary_client)
+            for summary_type in CacheService.SUMMARY_TYPES:
+                CacheService._delete_entries(
+                    [CacheService._generate_summary_key(transcript_hash, summary_type)],
+                    redis_binary_client
+                )
             if result:
                 print(f"🗑️ Invalidated transcript cache")
             return bool(result)
@@ -243,29 +693,309 @@ class CacheService:
             print(f"⚠️ Transcript cache invalidation error: {e}")
             return False
     
+    @staticmethod
+    def _generate_feed_url_key(lookup: str, value: str) -> str:
+        """Generate cache key for a feed URL lookup (lookup is "title" or "itunes")"""
+        return f"{CacheService.FEED_URL_CACHE_PREFIX}:{lookup}:{value.strip().lower()}"
+    
+    @staticmethod
+    def get_cached_feed_url(lookup: str, value: str) -> Optional[Dict[str, Any]]:
+        """Get a cached feed URL lookup as {"url", "fetched_at"}; url is None for a cached miss"""
+        try:
+            cached = redis_client.get(CacheService._generate_feed_url_key(lookup, value))
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            print(f"⚠️ Feed URL cache error: {e}")
+            return None
+    
+    @staticmethod
+    def set_cached_feed_url(lookup: str, value: str, url: Optional[str]) -> bool:
+        """Cache a feed URL lookup result; url=None records that the show wasn't found"""
+        try:
+            ttl = CacheService.FEED_URL_CACHE_TTL if url else CacheService.FEED_URL_NEGATIVE_TTL
+            redis_client.setex(
+                CacheService._generate_feed_url_key(lookup, value),
+                ttl,
+                json.dumps({"url": url, "fetched_at": time.time()})
+            )
+            return True
+        except Exception as e:
+            print(f"⚠️ Feed URL cache set error: {e}")
+            return False
+    
+    @staticmethod
+    def _generate_rss_feed_keys(rss_url: str) -> Tuple[str, str]:
+        """Generate the (validators, index) keys for a cached RSS feed"""
+        feed_id = hashlib.md5(rss_url.encode()).hexdigest()
+        prefix = f"{CacheService.RSS_FEED_CACHE_PREFIX}:{feed_id}"
+        return f"{prefix}:meta", f"{prefix}:index"
+    
+    @staticmethod
+    def get_cached_rss_feed(rss_url: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Get a cached feed as (meta, index); meta holds fetched_at, etag,
+        last_modified and the index revision. The index is served from the
+        in-process copy while its revision matches the shared one.
+        """
+        try:
+            meta_key, index_key = CacheService._generate_rss_feed_keys(rss_url)
+            meta = redis_binary_client.get(meta_key)
+            if not meta:
+                return None
+            meta = json.loads(meta)
+            revision = meta.get("revision")
+            local = CacheService._rss_feed_l1.get(rss_url)
+            if revision and local and local[0] == revision:
+                return meta, local[1]
+            payload = redis_binary_client.get(index_key)
+            if not payload:
+                return None
+            index = cache_codec.decode(payload)
+            if revision:
+                CacheService._rss_feed_l1.put(rss_url, (revision, index), len(payload))
+            return meta, index
+        except Exception as e:
+            print(f"⚠️ RSS feed cache error: {e}")
+            return None
+    
+    @staticmethod
+    def set_cached_rss_feed(rss_url: str, index: Dict[str, Any], etag: Optional[str] = None,
+                            last_modified: Optional[str] = None) -> bool:
+        """Cache the index of a freshly downloaded feed along with its HTTP validators"""
+        try:
+            meta_key, index_key = CacheService._generate_rss_feed_keys(rss_url)
+            payload = cache_codec.encode(index)
+            revision = hashlib.md5(payload).hexdigest()
+            meta = {"fetched_at": time.time(), "etag": etag, "last_modified": last_modified, "revision": revision}
+            # MULTI, so a reader never pairs the new revision with the old index
+            pipe = redis_binary_client.pipeline()
+            pipe.setex(meta_key, CacheService.RSS_FEED_CACHE_TTL, json.dumps(meta))
+            pipe.setex(index_key, CacheService.RSS_FEED_CACHE_TTL, payload)
+            pipe.execute()
+            CacheService._rss_feed_l1.put(rss_url, (revision, index), len(payload))
+            return True
+        except Exception as e:
+            print(f"⚠️ RSS feed cache set error: {e}")
+            return False
+    
+    @staticmethod
+    def refresh_cached_rss_feed(rss_url: str, meta: Dict[str, Any]) -> bool:
+        """Mark a cached feed fresh again after a 304, without rewriting its index"""
+        try:
+            meta_key, index_key = CacheService._generate_rss_feed_keys(rss_url)
+            pipe = redis_binary_client.pipeline(transaction=False)
+            pipe.setex(meta_key, CacheService.RSS_FEED_CACHE_TTL, json.dumps({**meta, "fetched_at": time.time()}))
+            pipe.expire(index_key, CacheService.RSS_FEED_CACHE_TTL)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"⚠️ RSS feed cache refresh error: {e}")
+            return False
+    
+    @staticmethod
+    def get_cached_page_metadata(url: str) -> Optional[Dict[str, Any]]:
+        """Get titles previously scraped from an episode page"""
+        try:
+            key = f"{CacheService.PAGE_METADATA_CACHE_PREFIX}:{CacheService.get_platform(url)}:{CacheService.extract_episode_id(url)}"
+            cached = redis_client.get(key)
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            print(f"⚠️ Page metadata cache error: {e}")
+            return None
+    
+    @staticmethod
+    def set_cached_page_metadata(url: str, data: Dict[str, Any]) -> bool:
+        """Cache titles scraped from an episode page"""
+        try:
+            key = f"{CacheService.PAGE_METADATA_CACHE_PREFIX}:{CacheService.get_platform(url)}:{CacheService.extract_episode_id(url)}"
+            redis_client.setex(key, CacheService.PAGE_METADATA_CACHE_TTL, json.dumps(data))
+            return True
+        except Exception as e:
+            print(f"⚠️ Page metadata cache set error: {e}")
+            return False
+    
+    @staticmethod
+    def _generate_inflight_key(platform: str, episode_id: str, summary_type: str) -> str:
+        """Generate key naming the job currently processing an episode"""
+        return f"{CacheService.INFLIGHT_JOB_PREFIX}:{platform}:{episode_id}:{summary_type}"
+    
+    @staticmethod
+    def claim_inflight_job(platform: str, episode_id: str, summary_type: str, job_id: str) -> Optional[str]:
+        """Register job_id as the in-flight job for an episode.
+        
+        Returns None if job_id now owns the episode, or the job_id of the
+        request that got there first.
+        """
+        key = CacheService._generate_inflight_key(platform, episode_id, summary_type)
+        try:
+            for _ in range(2):
+                if redis_client.set(key, job_id, nx=True, ex=CacheService.INFLIGHT_JOB_TTL):
+                    return None
+                existing_job_id = redis_client.get(key)
+                if existing_job_id:
+                    print(f"🔗 Episode {episode_id} ({summary_type}) already in flight as job {existing_job_id}")
+                    return existing_job_id
+                # The owner released between SET and GET; try once more
+            return None
+        except Exception as e:
+            # Without Redis we can't coordinate, so process this request on its own
+            print(f"⚠️ In-flight job claim error: {e}")
+            return None
+    
+    @staticmethod
+    def release_inflight_job(platform: str, episode_id: str, summary_type: str, job_id: str) -> bool:
+        """Release an episode's in-flight key if it is still held by job_id"""
+        try:
+            key = CacheService._generate_inflight_key(platform, episode_id, summary_type)
+            return bool(redis_client.eval(CacheService._RELEASE_INFLIGHT_SCRIPT, 1, key, job_id))
+        except Exception as e:
+            print(f"⚠️ In-flight job release error: {e}")
+            return False
+    
+    @staticmethod
+    def refresh_inflight_jobs(jobs: List[Tuple[str, str, str, str]]) -> int:
+        """Restart the TTL of in-flight keys still held by their jobs.
+        
+        jobs holds (platform, episode_id, summary_type, job_id) tuples of jobs
+        that are still being worked on. Returns how many keys were extended.
+        """
+        if not jobs:
+            return 0
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for platform, episode_id, summary_type, job_id in jobs:
+                key = CacheService._generate_inflight_key(platform, episode_id, summary_type)
+                pipe.eval(CacheService._REFRESH_INFLIGHT_SCRIPT, 1, key, job_id, CacheService.INFLIGHT_JOB_TTL)
+            return sum(1 for extended in pipe.execute() if extended)
+        except Exception as e:
+            print(f"⚠️ In-flight job refresh error: {e}")
+            return 0
+    
+    @staticmethod
+    def set_job_data(job_id: str, data: Dict[str, Any]) -> bool:
+        """Store the resolved request data of a job for requests that attach to it"""
+        try:
+            redis_client.setex(f"{CacheService.JOB_PREFIX}:{job_id}:data", CacheService.JOB_TTL, json.dumps(data))
+            return True
+        except Exception as e:
+            print(f"⚠️ Job data set error: {e}")
+            return False
+    
+    @staticmethod
+    def get_job_data(job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the resolved request data of a job, if it got that far"""
+        try:
+            data = redis_client.get(f"{CacheService.JOB_PREFIX}:{job_id}:data")
+            return json.loads(data) if data else None
+        except Exception as e:
+            print(f"⚠️ Job data get error: {e}")
+            return None
+    
+    @staticmethod
+    def set_job_result(job_id: str, payload: Dict[str, Any]) -> bool:
+        """Store the final WebSocket payload of a job"""
+        try:
+            redis_client.setex(f"{CacheService.JOB_PREFIX}:{job_id}:result", CacheService.JOB_TTL, json.dumps(payload))
+            return True
+        except Exception as e:
+            print(f"⚠️ Job result set error: {e}")
+            return False
+    
+    @staticmethod
+    def get_job_result(job_id: str) -> Optional[Dict[str, Any]]:
+        """Get the final WebSocket payload of a job that already finished"""
+        try:
+            payload = redis_client.get(f"{CacheService.JOB_PREFIX}:{job_id}:result")
+            return json.loads(payload) if payload else None
+        except Exception as e:
+            print(f"⚠️ Job result get error: {e}")
+            return None
+    
+    @staticmethod
+    def get_inflight_file_paths() -> Optional[Set[str]]:
+        """Audio file paths of jobs that are still in flight, or None if Redis can't be read"""
+        try:
+            inflight_keys = list(redis_client.scan_iter(
+                match=f"{CacheService.INFLIGHT_JOB_PREFIX}:*", count=CacheService.CLEAR_BATCH_SIZE
+            ))
+            if not inflight_keys:
+                return set()
+            job_ids = [job_id for job_id in redis_client.mget(inflight_keys) if job_id]
+            if not job_ids:
+                return set()
+            job_data = redis_client.mget([f"{CacheService.JOB_PREFIX}:{job_id}:data" for job_id in job_ids])
+            return {
+                data["file_path"]
+                for data in (json.loads(raw) for raw in job_data if raw)
+                if data.get("file_path")
+            }
+        except Exception as e:
+            print(f"⚠️ In-flight file lookup error: {e}")
+            return None
+    
+    @staticmethod
+    def get_audio_fingerprint_candidates(bands: List[str], limit: int) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Fingerprints sharing the most bands with these, as {file_hash: {"transcript_id", "items"}}"""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for band in bands:
+                pipe.smembers(f"{CacheService.FINGERPRINT_CACHE_PREFIX}:band:{band}")
+            shared = Counter(file_hash for members in pipe.execute() for file_hash in members)
+            file_hashes = [file_hash for file_hash, _ in shared.most_common(limit)]
+            if not file_hashes:
+                return {}
+            payloads = redis_binary_client.mget(
+                [f"{CacheService.FINGERPRINT_CACHE_PREFIX}:{file_hash}" for file_hash in file_hashes]
+            )
+            return {
+                file_hash: cache_codec.decode(payload)
+                for file_hash, payload in zip(file_hashes, payloads) if payload
+            }
+        except Exception as e:
+            print(f"⚠️ Audio fingerprint lookup error: {e}")
+            return None
+    
+    @staticmethod
+    def set_audio_fingerprint(file_hash: str, transcript_id: str, items: List[int], bands: List[str]) -> bool:
+        """Store the fingerprint of a transcribed file under its MinHash bands"""
+        try:
+            ttl = CacheService.TRANSCRIPT_CACHE_TTL
+            redis_binary_client.setex(
+                f"{CacheService.FINGERPRINT_CACHE_PREFIX}:{file_hash}", ttl,
+                cache_codec.encode({"transcript_id": transcript_id, "items": items})
+            )
+            pipe = redis_client.pipeline(transaction=False)
+            for band in bands:
+                band_key = f"{CacheService.FINGERPRINT_CACHE_PREFIX}:band:{band}"
+                pipe.sadd(band_key, file_hash)
+                pipe.expire(band_key, ttl)
+            pipe.execute()
+            return True
+        except Exception as e:
+            print(f"⚠️ Audio fingerprint set error: {e}")
+            return False
+    
     @staticmethod
     def clear_cache() -> bool:
         """Clear all cache - ADMIN ONLY"""
         try:
-            episode_keys = redis_client.keys(f"{CacheService.EPISODE_CACHE_PREFIX}:*")
-            transcript_keys = redis_client.keys(f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:*")
+            episodes_cleared = CacheService._unlink_matching(f"{CacheService.EPISODE_CACHE_PREFIX}:*")
+            if episodes_cleared:
+                print(f"🧹 Cleared {episodes_cleared} cached episodes")
             
-            total_cleared = 0
-            if episode_keys:
-                redis_client.delete(*episode_keys)
-                total_cleared += len(episode_keys)
-                print(f"🧹 Cleared {len(episode_keys)} cached episodes")
+            transcripts_cleared = CacheService._unlink_matching(f"{CacheService.TRANSCRIPT_CACHE_PREFIX}:*")
+            if transcripts_cleared:
+                print(f"🧹 Cleared {transcripts_cleared} cached transcripts")
             
-            if transcript_keys:
-                redis_client.delete(*transcript_keys)
-                total_cleared += len(transcript_keys)
-                print(f"🧹 Cleared {len(transcript_keys)} cached transcripts")
+            # No stats reset: every unlink above already took back its own count,
+            # and entries written while the clear ran keep theirs
+            CacheService._publish_invalidation(CacheService.INVALIDATE_ALL)
             
-            if total_cleared == 0:
+            if episodes_cleared + transcripts_cleared == 0:
                 print("🧹 No cached items to clear")
             
             return True
             
         except Exception as e:
             print(f"⚠️ Cache clear error: {e}")
-            return False 
\ No newline at end of file
+            return False
@@ -0,0 +1,25 @@
+import hashlib
+import os
+
+# Audio files are hashed this many bytes at a time. Each read lands in one
+# reused buffer, so memory stays flat however large the file is, and hashlib
+# releases the GIL while digesting a buffer this size.
+HASH_BUFFER_BYTES = int(os.getenv("HASH_BUFFER_KB", "1024")) * 1024
+
+def hash_file(file_path: str) -> str:
+    """
+    MD5 of a file's contents, the key transcripts are cached under. MD5
+    rather than a faster hash because cached transcripts and streamed
+    uploads (see assemblyai_transcriber.upload_stream) are keyed by it.
+    Blocks on disk I/O; call it from a worker thread, never an event loop.
+    """
+    digest = hashlib.md5()
+    buffer = bytearray(HASH_BUFFER_BYTES)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
@@ -1,38 +1,31 @@
-import requests
-from bs4 import BeautifulSoup
+from podcast_audio_resolver_service.html_extract import fetch_page_text
+from cache_service import CacheService
 
-def get_episode_title(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        print(f"Failed to fetch page. Status code: {response.status_code}")
-        return None
-    
-    response.encoding = 'utf-8'
+# The episode title is the <span> inside <h1 class="headings__title">
+TITLE_TARGETS = {"episode_title": ("h1", "class", "headings__title", "span")}
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Find the <h1> tag with class 'headings__title'
-    h1_tag = soup.find('h1', class_='headings__title')
+def get_episode_title(url):
+    cached = CacheService.get_cached_page_metadata(url)
+    if cached and cached.get("episode_title"):
+        print(f"🎯 Using cached episode title: {cached['episode_title']}")
+        return cached["episode_title"]
 
-    if not h1_tag:
-        print("Could not find the h1 with class 'headings__title'")
+    headers = {"User-Agent": "Mozilla/5.0"}
+    found = fetch_page_text(url, TITLE_TARGETS, headers=headers)
+    if found is None:
         return None
 
-    # Find the <span> inside the <h1>
-    span_tag = h1_tag.find('span')
-
-    if not span_tag:
-        print("No <span> found inside the <h1> tag.")
+    if "episode_title" not in found:
+        print("Could not find the <span> inside the h1 with class 'headings__title'")
         return None
 
-    title = span_tag.text.strip()
+    title = found["episode_title"].strip()
     print(f"Extracted Title: {title}")
+    CacheService.set_cached_page_metadata(url, {"episode_title": title})
     return title
 
 # Example usage:
 # url = "https://podcasts.apple.com/us/podcast/episode-3-the-chief/id1789644662?i=1000699606683"
 # scrape_episode_title(url)
 
-# get_episode_title("https://podcasts.apple.com/us/podcast/the-climate-movement-needs-new-stories-heres-mine/id160904630?i=1000705000078")
\ No newline at end of file
+# get_episode_title("https://podcasts.apple.com/us/podcast/the-climate-movement-needs-new-stories-heres-mine/id160904630?i=1000705000078")
@@ -2,99 +2,132 @@ import os
 import requests
 import feedparser
 import hashlib
-import json
 from pathlib import Path
 import time
+from concurrent.futures import Future
+import xml.etree.ElementTree as ET
+from podcast_audio_resolver_service import http_client, download_index, audio_store, downloader
+from podcast_audio_resolver_service.feed_index import (
+    FEED_INDEX_VERSION, build_feed_index, parse_feed_index, index_covers,
+    find_entry_by_title, find_entry_by_episode_id
+)
+from cache_service import CacheService
+import file_hashing
 
-# Cache file to store audio URL to local file mappings
-CACHE_FILE = "audio_files/download_cache.json"
-RSS_CACHE_DIR = "rss_cache"
+# Cached feeds younger than this are used without contacting the publisher
 RSS_CACHE_TTL = 3600  # 1 hour
+# Feeds are parsed as they stream in, this many bytes at a time
+RSS_CHUNK_SIZE = 64 * 1024
+# How the transcription service gets an episode's audio:
+#   file   - downloaded here and handed over by path
+#   stream - not downloaded here; the transcription service pipes the
+#            enclosure straight into an AssemblyAI upload, so the services
+#            don't need a shared disk
+#   url    - AssemblyAI fetches the enclosure itself, and the transcript cache
+#            is keyed by enclosure_key instead of the file's content
+AUDIO_SOURCE = os.getenv("AUDIO_SOURCE", "file").lower()
 
-def load_download_cache():
-    """Load the download cache from file"""
+def enclosure_key(audio_url, guid):
+    """
+    Transcript cache key for an episode's audio that needs no download: a
+    hash of its feed guid, enclosure URL, ETag and size. Returns None when
+    the enclosure can't be probed from here.
+    """
     try:
-        if os.path.exists(CACHE_FILE):
-            with open(CACHE_FILE, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"⚠️ Error loading download cache: {e}")
-    return {}
-
-def save_download_cache(cache):
-    """Save the download cache to file"""
-    try:
-        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(cache, f, indent=2)
-    except Exception as e:
-        print(f"⚠️ Error saving download cache: {e}")
+        info = downloader.probe(audio_url)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ Could not probe {audio_url}: {e}")
+        return None
+    identity = "\n".join([
+        guid or "", audio_url.split('?')[0], info["etag"] or "", str(info["size"] or "")
+    ])
+    return hashlib.md5(identity.encode()).hexdigest()
 
 def find_existing_audio_file(audio_url, episode_title):
     """
     Check if audio file already exists locally.
     Returns (file_path, file_hash) if found, (None, None) if not found.
     """
-    # Clean the audio URL for comparison
-    clean_url = audio_url.split('?')[0]
-    
-    # Load existing cache
-    cache = load_download_cache()
-    
-    # Check if URL exists in cache
-    if clean_url in cache:
-        cached_file_path = cache[clean_url]["file_path"]
-        cached_file_hash = cache[clean_url]["file_hash"]
+    # Check if URL exists in the download index
+    cached = download_index.get_download(audio_url)
+    if cached:
+        cached_file_path = cached["file_path"]
+        cached_file_hash = cached["file_hash"]
         
         # Verify file still exists
         if os.path.exists(cached_file_path):
             print(f"🎯 Found existing audio file: {cached_file_path}")
             print(f"🎯 Using cached file hash: {cached_file_hash[:8]}...")
+            download_index.touch_file(cached_file_path)
+            audio_store.record("hits")
             return cached_file_path, cached_file_hash
         else:
             print(f"⚠️ Cached file not found, removing from cache: {cached_file_path}")
-            del cache[clean_url]
-            save_download_cache(cache)
+            download_index.remove_download(audio_url)
     
     # Fallback: Check by episode title (for files downloaded before cache was implemented)
-    folder = 'audio_files'
-    if os.path.exists(folder):
-        for filename in os.listdir(folder):
-            if filename.endswith(('.mp3', '.m4a', '.wav')):
-                # Check if episode title is in filename
-                if episode_title.lower().replace(' ', '_').replace('/', '-') in filename.lower():
-                    file_path = os.path.join(folder, filename)
-                    print(f"🎯 Found existing audio file by title: {file_path}")
-                    
-                    # Compute hash for the existing file
-                    print(f"🔄 Computing hash for existing file...")
-                    hash_md5 = hashlib.md5()
-                    with open(file_path, 'rb') as f:
-                        for chunk in iter(lambda: f.read(8192), b""):
-                            hash_md5.update(chunk)
-                    file_hash = hash_md5.hexdigest()
-                    
-                    # Add to cache for future use
-                    cache[clean_url] = {
-                        "file_path": file_path,
-                        "file_hash": file_hash,
-                        "episode_title": episode_title
-                    }
-                    save_download_cache(cache)
-                    
-                    print(f"💾 Added existing file to cache")
-                    return file_path, file_hash
+    found = download_index.find_file_by_title(episode_title)
+    if found:
+        file_path, file_hash = found
+        print(f"🎯 Found existing audio file by title: {file_path}")
+        
+        # Add to cache for future use
+        download_index.record_download(audio_url, file_path, file_hash, episode_title)
+        print(f"💾 Added existing file to cache")
+        audio_store.record("hits")
+        return file_path, file_hash
     
     print(f"❌ No existing audio file found for: {episode_title}")
+    audio_store.record("misses")
     return None, None
 
-def get_episode_audio_file_with_episode_title(episode_entry, episode_title):
+def download_to_store(audio_url, episode_title, on_progress=None):
+    """
+    Download audio into the content-addressed store and record it in the
+    download index. Returns (file_path, file_hash).
+    on_progress(downloaded_bytes, total_bytes) is called periodically while
+    downloading; total_bytes is None when the server doesn't send a length.
+    """
+    # Detect file extension from URL
+    ext = os.path.splitext(audio_url.split('?')[0])[1]  # Gets '.m4a' or '.mp3'
+    if not ext:
+        ext = '.mp3'  # Default fallback
+    
+    part_path = audio_store.partial_path(audio_url, ext)
+    with downloader.exclusive(part_path):
+        # Another request may have finished this download while we waited
+        existing = download_index.get_download(audio_url)
+        if existing and os.path.exists(existing["file_path"]):
+            return existing["file_path"], existing["file_hash"]
+        
+        print(f"Downloading {audio_url} ...")
+        # A failed download keeps its partial file so the next attempt resumes it
+        downloader.fetch(audio_url, part_path, on_progress)
+        
+        # Only complete files are hashed and published
+        file_hash = file_hashing.hash_file(part_path)
+        file_path = audio_store.publish(part_path, file_hash, ext)
+        downloader.discard(part_path)
+    
+    print(f"Download complete: {file_path}")
+    print(f"File hash: {file_hash}")
+    
+    # Add to download cache; continue even if the save fails
+    if download_index.record_download(audio_url, file_path, file_hash, episode_title):
+        print(f"💾 Added to download cache")
+    audio_store.evict_in_background()
+    
+    return file_path, file_hash
+
+def get_episode_audio_file_with_episode_title(episode_entry, episode_title, on_progress=None):
+    """
+    Download an episode's audio (or reuse a local copy).
+    on_progress(downloaded_bytes, total_bytes) is called periodically while
+    downloading; total_bytes is None when the server doesn't send a length.
+    """
     try:
         # Check for audio enclosure
-        if not hasattr(episode_entry, 'enclosures') or not episode_entry.enclosures:
-            return None, None
-            
-        audio_url = episode_entry.enclosures[0]['href']
+        audio_url = episode_entry.get("audio_url")
         if not audio_url:
             return None, None
             
@@ -107,143 +140,38 @@ def get_episode_audio_file_with_episode_title(episode_entry, episode_title):
             return existing_file_path, existing_file_hash
         
         # File doesn't exist, proceed with download
-        # Detect file extension from URL
-        ext = os.path.splitext(audio_url)[1]  # Gets '.m4a' or '.mp3'
-        if not ext:
-            ext = '.mp3'  # Default fallback
-        
-        # Generate safe filename
-        filename = episode_title.strip().replace(' ', '_').replace('/', '-') + ext
-        folder = 'audio_files'
-        
         try:
-            os.makedirs(folder, exist_ok=True)
-        except OSError as e:
-            print(f"Error creating audio directory: {e}")
-            return None, None
-            
-        file_path = os.path.join(folder, filename)
-        
-        # Download the audio file and compute hash simultaneously
-        print(f"Downloading to {file_path} ...")
-        hash_md5 = hashlib.md5()
-        
-        try:
-            with requests.get(audio_url, stream=True, timeout=30) as r:
-                r.raise_for_status()
-                with open(file_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        if chunk:  # Filter out keep-alive chunks
-                            f.write(chunk)
-                            hash_md5.update(chunk)  # Compute hash during download
+            return download_to_store(audio_url, episode_title, on_progress)
         except requests.exceptions.RequestException as e:
             print(f"Download failed: {e}")
-            # Clean up partial file if it exists
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except OSError:
-                    pass
             return None, None
         except OSError as e:
             print(f"File system error during download: {e}")
             return None, None
         
-        file_hash = hash_md5.hexdigest()
-        print(f"Download complete: {file_path}")
-        print(f"File hash: {file_hash}")
-        
-        # Add to download cache
-        try:
-            cache = load_download_cache()
-            cache[audio_url] = {
-                "file_path": file_path,
-                "file_hash": file_hash,
-                "episode_title": episode_title
-            }
-            save_download_cache(cache)
-            print(f"💾 Added to download cache")
-        except Exception as e:
-            print(f"Warning: Failed to save to download cache: {e}")
-            # Continue even if cache save fails
-        
-        return file_path, file_hash
-        
     except Exception as e:
         print(f"Error in get_episode_audio_file_with_episode_title: {e}")
         return None, None
 
 def download_episode_audio_with_episode_id(rss_url, apple_episode_id):
     """
-    Parse RSS feed, find the episode by Episode ID, and download the audio file.
+    Look up the episode by Episode ID in the feed index, and download the audio file.
     """
-    feed = get_cached_feed(rss_url)
-
-    for entry in feed.entries:
-        guid = entry.get('guid', '')
-        link = entry.get('link', '')
-
-        if apple_episode_id in guid or apple_episode_id in link:
-            audio_url = entry.enclosures[0]['href']
-            episode_title = entry.title
-
-            # Check if file already exists locally
-            existing_file_path, existing_file_hash = find_existing_audio_file(audio_url, episode_title)
-            if existing_file_path and existing_file_hash:
-                return existing_file_path, existing_file_hash
-
-            # File doesn't exist, proceed with download
-            # Get file extension from URL
-            ext = os.path.splitext(audio_url)[1]
-            if not ext:
-                ext = '.mp3'
-
-            # Prepare filename and folder
-            safe_title = entry.title.strip().replace(' ', '_').replace('/', '-')
-            filename = f"{safe_title}{ext}"
-            folder = 'audio_files'
-            os.makedirs(folder, exist_ok=True)
-            file_path = os.path.join(folder, filename)
-
-            # Download audio file and compute hash simultaneously
-            print(f"Downloading audio to {file_path} ...")
-            hash_md5 = hashlib.md5()
-            
-            with requests.get(audio_url, stream=True) as r:
-                r.raise_for_status()
-                with open(file_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                        hash_md5.update(chunk)  # Compute hash during download
-
-            file_hash = hash_md5.hexdigest()
-            print(f"Download complete: {file_path}")
-            print(f"File hash: {file_hash}")
-            
-            # Add to download cache
-            cache = load_download_cache()
-            cache[audio_url] = {
-                "file_path": file_path,
-                "file_hash": file_hash,
-                "episode_title": episode_title
-            }
-            save_download_cache(cache)
-            print(f"💾 Added to download cache")
-            
-            return file_path, file_hash
-
-    print("Episode ID not found in RSS feed.")
-    return None, None
+    entry = find_entry_by_episode_id(get_feed_index(rss_url, episode_id=apple_episode_id), apple_episode_id)
+    if not entry or not entry["audio_url"]:
+        print("Episode ID not found in RSS feed.")
+        return None, None
 
-def get_show_title(feed):
-    return feed.feed.title
+    audio_url = entry["audio_url"]
+    episode_title = entry["title"]
 
-def get_show_summary(feed):
-    try:
-        return feed.feed.summary
-    except :
-        return ""
+    # Check if file already exists locally
+    existing_file_path, existing_file_hash = find_existing_audio_file(audio_url, episode_title)
+    if existing_file_path and existing_file_hash:
+        return existing_file_path, existing_file_hash
 
+    # File doesn't exist, proceed with download
+    return download_to_store(audio_url, episode_title)
 
 def duration_to_seconds(duration_str: str) -> int:
     """
@@ -252,59 +180,113 @@ def duration_to_seconds(duration_str: str) -> int:
     hours, minutes, seconds = map(int, duration_str.split(':'))
     return hours * 3600 + minutes * 60 + seconds
 
-def get_cached_feed(rss_url):
-    os.makedirs(RSS_CACHE_DIR, exist_ok=True)
-    cache_key = hashlib.md5(rss_url.encode()).hexdigest()
-    cache_path = os.path.join(RSS_CACHE_DIR, f"{cache_key}.xml")
-    now = time.time()
+def _index_with_feedparser(rss_url):
+    """Fallback for feeds the streaming parser rejects (malformed XML, Atom)"""
+    resp = http_client.get(rss_url, timeout=10)
+    resp.raise_for_status()
+    return build_feed_index(feedparser.parse(resp.content))
 
-    # Check cache
-    if os.path.exists(cache_path):
-        mtime = os.path.getmtime(cache_path)
-        if now - mtime < RSS_CACHE_TTL:
-            with open(cache_path, "r", encoding="utf-8") as f:
-                xml = f.read()
-            return feedparser.parse(xml)
+def _scraped_title(title_future):
+    """The scraped title once it is in, None while it is pending or if scraping failed"""
+    if not title_future.done() or title_future.exception():
+        return None
+    return title_future.result()
 
-    # Fetch and parse
-    resp = requests.get(rss_url, timeout=10)
-    resp.raise_for_status()
-    xml = resp.text
-    with open(cache_path, "w", encoding="utf-8") as f:
-        f.write(xml)
-    return feedparser.parse(xml)
+def get_feed_index(rss_url, episode_title=None, episode_id=None):
+    """
+    Return the feed's episode index (see feed_index), served from the shared
+    Redis feed cache while it is younger than RSS_CACHE_TTL. Older copies are
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged feed
+    costs a 304 and is never parsed again.
 
-def download_audio_and_get_metadata(rss_url, episode_title):
+    Given the wanted episode's title or guid, the first download of a feed
+    stops as soon as that episode is parsed; the partial index is cached and
+    reused for lookups it covers. Any later download reads the whole feed,
+    so a complete index is never replaced by a partial one and partial
+    indexes for different episodes don't keep replacing each other. The
+    title may be a Future still being scraped: the download starts right
+    away and stops at the episode once the title is known.
+    """
+    title_future = episode_title if isinstance(episode_title, Future) else None
+    cached = CacheService.get_cached_rss_feed(rss_url)
+    if cached and cached[1].get("version") != FEED_INDEX_VERSION:
+        # Built by an older layout; rebuild from a full download
+        cached = None
+    stop_early = cached is None
+    if cached and not cached[1]["complete"]:
+        # Only the title can tell whether a partial index covers this lookup
+        if title_future:
+            episode_title = title_future.result()
+        if not index_covers(cached[1], episode_title, episode_id):
+            # Stopped before this episode; a 304 would not help
+            cached = None
+
+    headers = {}
+    if cached:
+        meta, index = cached
+        if time.time() - meta["fetched_at"] < RSS_CACHE_TTL:
+            return index
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    with http_client.get(rss_url, headers=headers, stream=True, timeout=10) as resp:
+        if resp.status_code == 304 and cached:
+            print(f"🎯 RSS feed not modified: {rss_url}")
+            CacheService.refresh_cached_rss_feed(rss_url, meta)
+            return index
+
+        resp.raise_for_status()
+        try:
+            if not stop_early:
+                episode_title = episode_id = None
+            elif title_future:
+                episode_title = lambda: _scraped_title(title_future)
+            index = parse_feed_index(resp.iter_content(chunk_size=RSS_CHUNK_SIZE), episode_title, episode_id)
+        except ET.ParseError as e:
+            print(f"⚠️ Streaming parse failed for {rss_url}: {e}")
+            index = None
+
+    if index is None:
+        index = _index_with_feedparser(rss_url)
+    CacheService.set_cached_rss_feed(
+        rss_url, index,
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified")
+    )
+    return index
+
+def download_audio_and_get_metadata(rss_url, episode_title, on_progress=None, feed_index=None):
     try:
         print("Processing RSS URL...")
-        feed = get_cached_feed(rss_url)
+        # Callers that already fetched the feed (e.g. speculatively) pass its index in
+        if feed_index and index_covers(feed_index, episode_title):
+            index = feed_index
+        else:
+            index = get_feed_index(rss_url, episode_title)
         
-        if not feed.entries:
+        if not index["entries"]:
             return {
                 "error": "No episodes found in RSS feed."
             }
         
-        episode_entry = None
-        for entry in feed.entries:
-            if episode_title.lower() in entry.title.lower():
-                episode_entry = entry
-                break
-                
+        episode_entry = find_entry_by_title(index, episode_title)
         if not episode_entry:
             return {
                 "error": f"Episode '{episode_title}' not found in RSS feed."
             }
         
-        print(f"Found episode: {episode_entry.title}")
+        print(f"Found episode: {episode_entry['title']}")
         
         # Check for audio enclosure
-        if not hasattr(episode_entry, 'enclosures') or not episode_entry.enclosures:
+        if not episode_entry["audio_url"]:
             return {
                 "error": "No audio file found for this episode."
             }
         
         # Duration check
-        duration = getattr(episode_entry, 'itunes_duration', None)
+        duration = episode_entry["duration"]
         if duration:
             try:
                 duration = duration_to_seconds(duration)
@@ -321,29 +303,33 @@ def download_audio_and_get_metadata(rss_url, episode_title):
                 "error": "Episode is longer than 30 minutes. Only shorter episodes are supported currently."
             }
         
-        # Download audio file
-        file_path, file_hash = get_episode_audio_file_with_episode_title(episode_entry, episode_title)
+        audio_source = AUDIO_SOURCE
+        file_path = file_hash = None
+        if audio_source == "url":
+            file_hash = enclosure_key(episode_entry["audio_url"], episode_entry["guid"])
+            if not file_hash:
+                # Unreachable from here, so probably from AssemblyAI too
+                audio_source = "file"
         
-        if not file_path or not file_hash:
-            return {
-                "error": "Audio file could not be downloaded or processed."
-            }
+        if audio_source == "stream":
+            # Still hand over a local copy if we happen to have one
+            file_path, file_hash = find_existing_audio_file(episode_entry["audio_url"], episode_title)
+        elif audio_source != "url":
+            # Download audio file
+            file_path, file_hash = get_episode_audio_file_with_episode_title(episode_entry, episode_title, on_progress)
+            
+            if not file_path or not file_hash:
+                return {
+                    "error": "Audio file could not be downloaded or processed."
+                }
         
         # Extract metadata with fallbacks
-        summary = getattr(episode_entry, 'summary', '') or ''
-        show_title = get_show_title(feed) or 'Unknown Show'
-        show_summary = get_show_summary(feed) or ''
-        
-        # Image URL with fallbacks
-        image_url = None
-        if hasattr(episode_entry, 'image') and episode_entry.image:
-            image_url = getattr(episode_entry.image, 'href', None)
-        
-        if not image_url and hasattr(episode_entry, 'feedImage'):
-            image_url = episode_entry.feedImage
+        summary = episode_entry["summary"]
+        show_title = index["show_title"] or 'Unknown Show'
+        show_summary = index["show_summary"]
         
-        if not image_url and hasattr(feed.feed, 'image') and feed.feed.image:
-            image_url = getattr(feed.feed.image, 'href', None)
+        # Image URL with fallbacks (episode image, then show image)
+        image_url = episode_entry["image_url"] or index["show_image"]
         
         # Default fallback image
         if not image_url:
@@ -352,6 +338,8 @@ def download_audio_and_get_metadata(rss_url, episode_title):
         return {
             "file_path": file_path,
             "file_hash": file_hash,
+            "audio_url": episode_entry["audio_url"],
+            "audio_source": audio_source,
             "metadata": {
                 "summary": summary,
                 "show_title": show_title,
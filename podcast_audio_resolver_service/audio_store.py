@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from podcast_audio_resolver_service import download_index
+from cache_service import CacheService
+
+# Downloads are stored by content: AUDIO_FOLDER/store/<hash[:2]>/<hash><ext>.
+# Identical audio is kept once, and episodes that share a title can't overwrite
+# each other's files.
+AUDIO_STORE_QUOTA_BYTES = int(os.getenv("AUDIO_STORE_QUOTA_MB", "5120")) * 1024 * 1024
+# Files unused for longer than this are evicted even under the quota; 0 disables
+AUDIO_STORE_MAX_AGE_SECONDS = int(os.getenv("AUDIO_STORE_MAX_AGE_DAYS", "30")) * 24 * 3600
+# Files used more recently than this are never evicted, which also covers a
+# job between its download and its data reaching Redis
+AUDIO_STORE_MIN_IDLE_SECONDS = int(os.getenv("AUDIO_STORE_MIN_IDLE_SECONDS", "300"))
+# Partial downloads live here until they are complete and hashed
+TEMP_SUBDIR = "tmp"
+# Partial downloads untouched for this long are removed at startup instead of resumed
+STALE_TEMP_SECONDS = 24 * 3600
+
+_metrics = {
+    "hits": 0,
+    "misses": 0,
+    "downloads": 0,
+    "deduplicated": 0,
+    "evictions": 0,
+    "evicted_bytes": 0
+}
+_metrics_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+def record(event: str, amount: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[event] += amount
+
+def partial_path(audio_url: str, ext: str) -> str:
+    """Where a URL is downloaded to; stable, so an interrupted download can be resumed"""
+    folder = os.path.join(download_index.store_folder(), TEMP_SUBDIR)
+    os.makedirs(folder, exist_ok=True)
+    url_hash = hashlib.md5(audio_url.split('?')[0].encode()).hexdigest()
+    return os.path.join(folder, f"{url_hash}{ext}.part")
+
+def object_path(file_hash: str, ext: str) -> str:
+    return os.path.join(download_index.store_folder(), file_hash[:2], f"{file_hash}{ext}")
+
+def publish(temp_file: str, file_hash: str, ext: str) -> str:
+    """Move a finished download to its content address and return the new path"""
+    final_path = object_path(file_hash, ext)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    if os.path.exists(final_path):
+        # Same audio under another URL; keep the copy we already have
+        os.remove(temp_file)
+        record("deduplicated")
+    else:
+        os.replace(temp_file, final_path)
+    record("downloads")
+    return final_path
+
+def _remove_stale_temp_files() -> None:
+    folder = os.path.join(download_index.store_folder(), TEMP_SUBDIR)
+    if not os.path.isdir(folder):
+        return
+    cutoff = time.time() - STALE_TEMP_SECONDS
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError as e:
+                print(f"⚠️ Could not remove stale download {entry.path}: {e}")
+
+def evict() -> int:
+    """
+    Delete least recently used files until the store is within its quota,
+    plus any file unused for longer than AUDIO_STORE_MAX_AGE_SECONDS.
+    Files of in-flight jobs and recently used files are kept. Returns the
+    number of files evicted.
+    """
+    # Another thread already evicting will get the same result
+    if not _evict_lock.acquire(blocking=False):
+        return 0
+    try:
+        download_index.sync_audio_folder()
+        _, used = download_index.file_usage()
+        candidates = download_index.least_recently_used()
+        now = time.time()
+
+        def expired(last_used):
+            return AUDIO_STORE_MAX_AGE_SECONDS and now - last_used > AUDIO_STORE_MAX_AGE_SECONDS
+
+        if used <= AUDIO_STORE_QUOTA_BYTES and not (candidates and expired(candidates[0][2])):
+            return 0
+
+        protected = CacheService.get_inflight_file_paths()
+        if protected is None:
+            print("⚠️ Skipping audio eviction: in-flight jobs are unknown")
+            return 0
+
+        evicted = 0
+        for file_path, size, last_used in candidates:
+            # Candidates are oldest first, so nothing after these checks qualifies either
+            if used <= AUDIO_STORE_QUOTA_BYTES and not expired(last_used):
+                break
+            if now - last_used < AUDIO_STORE_MIN_IDLE_SECONDS:
+                break
+            if file_path in protected:
+                continue
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Could not evict {file_path}: {e}")
+                continue
+            download_index.forget_file(file_path)
+            used -= size
+            evicted += 1
+            record("evictions")
+            record("evicted_bytes", size)
+
+        if evicted:
+            print(f"🧹 Evicted {evicted} audio files, {used / 1024 / 1024:.1f} MB in use")
+        return evicted
+    finally:
+        _evict_lock.release()
+
+def evict_in_background() -> None:
+    threading.Thread(target=evict, daemon=True).start()
+
+def prepare() -> None:
+    """Index the audio folder, drop abandoned partial downloads and apply the quota"""
+    try:
+        _remove_stale_temp_files()
+    except OSError as e:
+        print(f"⚠️ Error cleaning partial downloads: {e}")
+    evict()
+
+def get_metrics() -> Dict[str, Any]:
+    files, used = download_index.file_usage()
+    with _metrics_lock:
+        counters = dict(_metrics)
+    return {
+        "files": files,
+        "bytes": used,
+        "quota_bytes": AUDIO_STORE_QUOTA_BYTES,
+        "max_age_seconds": AUDIO_STORE_MAX_AGE_SECONDS,
+        **counters
+    }
@@ -1,11 +1,11 @@
-from redis_stream_client import redis_client, AUDIO_UPLOADED_STREAM
+from redis_stream_client import redis_client, AUDIO_UPLOADED_STREAM, trim_consumed
 import json
 
 def emit_audio_uploaded(data: dict):
     try:
         redis_client.xadd(AUDIO_UPLOADED_STREAM, {"data": json.dumps(data)})
-        redis_client.xtrim(AUDIO_UPLOADED_STREAM, maxlen="500")
-        print(f"✅ Event emitted: audio_uploaded for {data['file_path']}")
+        trim_consumed(AUDIO_UPLOADED_STREAM)
+        print(f"✅ Event emitted: audio_uploaded for {data.get('file_path') or data.get('audio_url')}")
     except Exception as err:
         print("Unable to post message:", err)
 
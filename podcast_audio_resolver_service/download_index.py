@@ -0,0 +1,332 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import file_hashing
+
+# Maps audio URLs to the files downloaded for them. Files live on this
+# machine's disk, so the index sits next to them rather than in shared Redis.
+DOWNLOAD_INDEX_PATH = os.getenv("DOWNLOAD_INDEX_PATH", "audio_files/download_index.db")
+# The JSON file the index replaced; imported once when the index is created
+LEGACY_CACHE_FILE = "audio_files/download_cache.json"
+# Audio files found here are indexed by title so they can be reused without a URL match
+AUDIO_FOLDER = "audio_files"
+AUDIO_EXTENSIONS = ('.mp3', '.m4a', '.wav')
+# Content-addressed downloads (see audio_store) live under AUDIO_FOLDER/STORE_SUBDIR
+STORE_SUBDIR = "store"
+SCHEMA_VERSION = 3
+
+_lock = threading.Lock()
+_conn: Optional[sqlite3.Connection] = None
+# Read-through copy of the rows seen so far, keyed by clean URL
+_entries: Dict[str, Dict[str, str]] = {}
+# The audio folder is scanned once per process; afterwards the files table
+# is kept current by record_download/remove_download
+_sync_lock = threading.Lock()
+_synced = False
+
+def _clean_url(audio_url: str) -> str:
+    return audio_url.split('?')[0]
+
+def title_key(episode_title: str) -> str:
+    """The filename stem downloads are saved under, lowercased"""
+    return episode_title.strip().replace(' ', '_').replace('/', '-').lower()
+
+def store_folder() -> str:
+    return os.path.join(AUDIO_FOLDER, STORE_SUBDIR)
+
+def _file_key(file_path: str) -> str:
+    """Title key for files saved under their title; store objects are named by hash and get none"""
+    if os.path.dirname(file_path) != AUDIO_FOLDER:
+        return ""
+    return os.path.splitext(os.path.basename(file_path))[0].lower()
+
+def _import_legacy_cache(conn: sqlite3.Connection) -> None:
+    if not os.path.exists(LEGACY_CACHE_FILE):
+        return
+    try:
+        with open(LEGACY_CACHE_FILE, 'r') as f:
+            legacy = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read legacy download cache: {e}")
+        return
+    conn.executemany(
+        "INSERT OR IGNORE INTO downloads (audio_url, file_path, file_hash, episode_title, updated_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (_clean_url(url), info["file_path"], info["file_hash"], info.get("episode_title"), time.time())
+            for url, info in legacy.items()
+            if info.get("file_path") and info.get("file_hash")
+        ]
+    )
+    print(f"💾 Imported {len(legacy)} entries from {LEGACY_CACHE_FILE}")
+
+def _connection() -> sqlite3.Connection:
+    """Open the index on first use (caller holds _lock)"""
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(DOWNLOAD_INDEX_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; every write below is a single atomic statement or an
+        # explicit transaction. WAL lets other processes read while we write.
+        conn = sqlite3.connect(DOWNLOAD_INDEX_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS downloads ("
+                    "audio_url TEXT PRIMARY KEY, file_path TEXT NOT NULL, file_hash TEXT NOT NULL, "
+                    "episode_title TEXT, updated_at REAL NOT NULL)"
+                )
+                _import_legacy_cache(conn)
+            if version < 2:
+                # One row per audio file on disk; file_hash is filled in once
+                # and kept while size and mtime are unchanged
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS files ("
+                    "file_path TEXT PRIMARY KEY, title_key TEXT NOT NULL, file_hash TEXT, "
+                    "size INTEGER NOT NULL, mtime REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS files_by_title ON files (title_key)")
+            if version < 3:
+                # NULL until the file is used; eviction then falls back to mtime
+                conn.execute("ALTER TABLE files ADD COLUMN last_access REAL")
+            if version < SCHEMA_VERSION:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            conn.close()
+            raise
+        _conn = conn
+    return _conn
+
+def get_download(audio_url: str) -> Optional[Dict[str, str]]:
+    """Return {file_path, file_hash, episode_title} recorded for the URL, if any"""
+    key = _clean_url(audio_url)
+    try:
+        with _lock:
+            if key in _entries:
+                return dict(_entries[key])
+            row = _connection().execute(
+                "SELECT file_path, file_hash, episode_title FROM downloads WHERE audio_url = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            _entries[key] = {"file_path": row[0], "file_hash": row[1], "episode_title": row[2]}
+            return dict(_entries[key])
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error reading download index: {e}")
+        return None
+
+def _upsert_file(conn: sqlite3.Connection, file_path: str, file_hash: Optional[str]) -> None:
+    """Record a file on disk (caller holds _lock); no-op if it doesn't exist"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return
+    conn.execute(
+        "INSERT INTO files (file_path, title_key, file_hash, size, mtime, last_access) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(file_path) DO UPDATE SET file_hash = excluded.file_hash, "
+        "size = excluded.size, mtime = excluded.mtime, last_access = excluded.last_access",
+        (file_path, _file_key(file_path), file_hash, stat.st_size, stat.st_mtime, time.time())
+    )
+
+def record_download(audio_url: str, file_path: str, file_hash: str, episode_title: Optional[str]) -> bool:
+    """Insert or replace the file recorded for a URL"""
+    key = _clean_url(audio_url)
+    try:
+        with _lock:
+            conn = _connection()
+            _upsert_file(conn, file_path, file_hash)
+            conn.execute(
+                "INSERT INTO downloads (audio_url, file_path, file_hash, episode_title, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(audio_url) DO UPDATE SET file_path = excluded.file_path, "
+                "file_hash = excluded.file_hash, episode_title = excluded.episode_title, "
+                "updated_at = excluded.updated_at",
+                (key, file_path, file_hash, episode_title, time.time())
+            )
+            _entries[key] = {"file_path": file_path, "file_hash": file_hash, "episode_title": episode_title}
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error saving to download index: {e}")
+        return False
+
+def remove_download(audio_url: str) -> bool:
+    """Forget a URL's download, and its file if that is gone from disk"""
+    key = _clean_url(audio_url)
+    try:
+        with _lock:
+            conn = _connection()
+            row = conn.execute("SELECT file_path FROM downloads WHERE audio_url = ?", (key,)).fetchone()
+            if row and not os.path.exists(row[0]):
+                conn.execute("DELETE FROM files WHERE file_path = ?", (row[0],))
+            conn.execute("DELETE FROM downloads WHERE audio_url = ?", (key,))
+            _entries.pop(key, None)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error removing from download index: {e}")
+        return False
+
+def list_downloads() -> Dict[str, Dict[str, str]]:
+    """All recorded downloads, keyed by URL (reads the index, not the in-memory copy)"""
+    try:
+        with _lock:
+            rows = _connection().execute(
+                "SELECT audio_url, file_path, file_hash, episode_title FROM downloads ORDER BY updated_at"
+            ).fetchall()
+        return {
+            url: {"file_path": file_path, "file_hash": file_hash, "episode_title": episode_title}
+            for url, file_path, file_hash, episode_title in rows
+        }
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error reading download index: {e}")
+        return {}
+
+def sync_audio_folder() -> None:
+    """
+    Bring the files table in line with the audio folder: add new files,
+    drop deleted ones and forget hashes of files that changed. Runs once per
+    process (normally at startup); only directory entries are read here,
+    never file contents.
+    """
+    global _synced
+    with _sync_lock:
+        if _synced:
+            return
+        on_disk = {}
+        try:
+            _scan_folder(AUDIO_FOLDER, on_disk)
+            if os.path.isdir(store_folder()):
+                with os.scandir(store_folder()) as shards:
+                    for shard in shards:
+                        if shard.is_dir() and len(shard.name) == 2:
+                            _scan_folder(shard.path, on_disk)
+        except OSError as e:
+            print(f"⚠️ Error scanning {AUDIO_FOLDER}: {e}")
+            return
+        try:
+            with _lock:
+                conn = _connection()
+                known = {
+                    path: (size, mtime)
+                    for path, size, mtime in conn.execute("SELECT file_path, size, mtime FROM files")
+                }
+                conn.execute("BEGIN")
+                try:
+                    conn.executemany(
+                        "DELETE FROM files WHERE file_path = ?",
+                        [(path,) for path in known if path not in on_disk]
+                    )
+                    conn.executemany(
+                        "INSERT INTO files (file_path, title_key, file_hash, size, mtime) VALUES (?, ?, NULL, ?, ?) "
+                        "ON CONFLICT(file_path) DO UPDATE SET file_hash = NULL, size = excluded.size, mtime = excluded.mtime",
+                        [
+                            (path, _file_key(path), size, mtime)
+                            for path, (size, mtime) in on_disk.items()
+                            if known.get(path) != (size, mtime)
+                        ]
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+        except (sqlite3.Error, OSError) as e:
+            print(f"⚠️ Error syncing download index with {AUDIO_FOLDER}: {e}")
+            return
+        _synced = True
+        print(f"📁 Indexed {len(on_disk)} audio files in {AUDIO_FOLDER}")
+
+def _scan_folder(folder: str, on_disk: Dict[str, Tuple[int, float]]) -> None:
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(AUDIO_EXTENSIONS):
+                    stat = entry.stat()
+                    on_disk[os.path.join(folder, entry.name)] = (stat.st_size, stat.st_mtime)
+    except FileNotFoundError:
+        pass
+
+def find_file_by_title(episode_title: str) -> Optional[Tuple[str, str]]:
+    """
+    Return (file_path, file_hash) of an audio file saved under this episode
+    title, or None. The hash is computed the first time a file is matched
+    and stored, so each file is read at most once.
+    """
+    key = title_key(episode_title)
+    if not key:
+        return None
+    sync_audio_folder()
+    try:
+        with _lock:
+            row = _connection().execute(
+                "SELECT file_path, file_hash FROM files WHERE title_key = ? ORDER BY file_path LIMIT 1",
+                (key,)
+            ).fetchone()
+        if not row:
+            return None
+        file_path, file_hash = row
+        if not os.path.exists(file_path):
+            # Deleted since the folder was scanned
+            with _lock:
+                _connection().execute("DELETE FROM files WHERE file_path = ?", (file_path,))
+            return None
+        if file_hash:
+            return file_path, file_hash
+        print(f"🔄 Computing hash for existing file...")
+        file_hash = file_hashing.hash_file(file_path)
+        with _lock:
+            _upsert_file(_connection(), file_path, file_hash)
+        return file_path, file_hash
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error looking up {episode_title!r} in download index: {e}")
+        return None
+
+def touch_file(file_path: str) -> None:
+    """Mark a file as just used, for least-recently-used eviction"""
+    try:
+        with _lock:
+            _connection().execute("UPDATE files SET last_access = ? WHERE file_path = ?", (time.time(), file_path))
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error updating download index: {e}")
+
+def file_usage() -> Tuple[int, int]:
+    """(number of files, total bytes) of the audio files on disk"""
+    try:
+        with _lock:
+            count, total = _connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files").fetchone()
+        return count, total
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error reading download index: {e}")
+        return 0, 0
+
+def least_recently_used() -> List[Tuple[str, int, float]]:
+    """(file_path, size, last used) of every file, least recently used first"""
+    try:
+        with _lock:
+            return _connection().execute(
+                "SELECT file_path, size, COALESCE(last_access, mtime) AS last_used FROM files ORDER BY last_used"
+            ).fetchall()
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error reading download index: {e}")
+        return []
+
+def forget_file(file_path: str) -> None:
+    """Drop a deleted file and every download recorded for it"""
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute("DELETE FROM files WHERE file_path = ?", (file_path,))
+            conn.execute("DELETE FROM downloads WHERE file_path = ?", (file_path,))
+            for key in [key for key, entry in _entries.items() if entry["file_path"] == file_path]:
+                del _entries[key]
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Error removing from download index: {e}")
@@ -0,0 +1,295 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from podcast_audio_resolver_service import http_client
+
+# Enclosures at least this large are fetched as parallel Range segments
+DOWNLOAD_PARALLEL_MIN_BYTES = int(os.getenv("DOWNLOAD_PARALLEL_MIN_MB", "16")) * 1024 * 1024
+DOWNLOAD_SEGMENT_BYTES = int(os.getenv("DOWNLOAD_SEGMENT_MB", "8")) * 1024 * 1024
+DOWNLOAD_SEGMENT_WORKERS = int(os.getenv("DOWNLOAD_SEGMENT_WORKERS", "4"))
+DOWNLOAD_BUFFER_BYTES = 256 * 1024
+DOWNLOAD_READ_TIMEOUT = float(os.getenv("DOWNLOAD_READ_TIMEOUT", "30"))
+# Attempts per segment (or per sequential download) after a dropped connection,
+# each resuming where the previous one stopped
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+# Minimum seconds between progress callbacks
+PROGRESS_INTERVAL = 1.0
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+class EnclosureChanged(requests.exceptions.RequestException):
+    """The file changed on the server while a partial copy was being resumed"""
+
+class _Progress:
+    """Byte counter shared by segment workers, reporting at most once per interval"""
+
+    def __init__(self, on_progress: Optional[ProgressCallback], total: Optional[int], done: int = 0):
+        self.on_progress = on_progress
+        self.total = total
+        self.done = done
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, count: int) -> None:
+        with self._lock:
+            self.done += count
+            if not self.on_progress or time.time() - self._last < PROGRESS_INTERVAL:
+                return
+            self._last = time.time()
+            done = self.done
+        self.on_progress(done, self.total)
+
+    def finish(self) -> None:
+        if self.on_progress:
+            self.on_progress(self.done, self.total)
+
+_active = set()
+_active_changed = threading.Condition()
+
+@contextmanager
+def exclusive(part_path: str):
+    """Serialize downloads into the same partial file within this process"""
+    with _active_changed:
+        while part_path in _active:
+            _active_changed.wait()
+        _active.add(part_path)
+    try:
+        yield
+    finally:
+        with _active_changed:
+            _active.discard(part_path)
+            _active_changed.notify_all()
+
+def _state_path(part_path: str) -> str:
+    return part_path + ".json"
+
+def _load_state(part_path: str) -> Dict[str, Any]:
+    if not os.path.exists(part_path):
+        return {}
+    try:
+        with open(_state_path(part_path), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(part_path: str, state: Dict[str, Any]) -> None:
+    temp = _state_path(part_path) + ".tmp"
+    with open(temp, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp, _state_path(part_path))
+
+def discard(part_path: str) -> None:
+    """Remove a partial download and its resume state"""
+    for path in (part_path, _state_path(part_path)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _get(url: str, headers: Dict[str, str]) -> requests.Response:
+    return http_client.get(
+        url, client=http_client.download_session, headers=headers, stream=True,
+        timeout=(http_client.HTTP_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT)
+    )
+
+def _content_range_total(response: requests.Response) -> Optional[int]:
+    # e.g. "bytes 0-0/48213004"
+    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+def _describe(probe: requests.Response) -> Dict[str, Any]:
+    """Size and validators of the file behind a "bytes=0-0" probe response"""
+    ranged = probe.status_code == 206
+    size = _content_range_total(probe) if ranged else (int(probe.headers.get("Content-Length") or 0) or None)
+    return {
+        "ranged": ranged,
+        "size": size,
+        "etag": probe.headers.get("ETag"),
+        "last_modified": probe.headers.get("Last-Modified"),
+        # Later requests go straight to the final host instead of
+        # repeating tracking redirects
+        "url": probe.url
+    }
+
+def probe(url: str) -> Dict[str, Any]:
+    """
+    Look up an enclosure's size, ETag and Last-Modified without downloading
+    it. Uses a one-byte Range request, which CDNs answer more reliably than
+    HEAD. Raises requests exceptions like fetch().
+    """
+    with _get(url, {"Range": "bytes=0-0"}) as response:
+        response.raise_for_status()
+        return _describe(response)
+
+def _if_range_validator(state: Dict[str, Any]) -> Optional[str]:
+    # A weak ETag never matches If-Range (RFC 9110 13.1.5), so servers would
+    # answer every ranged request with the whole file
+    etag = state.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return state.get("last_modified")
+
+def _write_from(response: requests.Response, f, progress: _Progress) -> int:
+    written = 0
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_BYTES):
+        if chunk:  # Filter out keep-alive chunks
+            f.write(chunk)
+            written += len(chunk)
+            progress.add(len(chunk))
+    return written
+
+def _fetch_segment(url: str, part_path: str, start: int, end: int, validator: Optional[str],
+                   progress: _Progress) -> None:
+    position = start
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        headers = {"Range": f"bytes={position}-{end}"}
+        if validator:
+            headers["If-Range"] = validator
+        try:
+            with _get(url, headers) as response:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    raise EnclosureChanged(f"Expected a partial response for bytes {position}-{end}")
+                with open(part_path, 'r+b') as f:
+                    f.seek(position)
+                    # Track the position per chunk so a retry resumes exactly here
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_BUFFER_BYTES):
+                        if chunk:
+                            f.write(chunk)
+                            position += len(chunk)
+                            progress.add(len(chunk))
+            if position > end:
+                return
+        except EnclosureChanged:
+            raise
+        except requests.exceptions.RequestException:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+        print(f"🔁 Resuming segment at byte {position} of {url}")
+    raise requests.exceptions.ConnectionError(f"Segment {start}-{end} of {url} ended early")
+
+def _fetch_segments(url: str, part_path: str, size: int, state: Dict[str, Any],
+                    on_progress: Optional[ProgressCallback]) -> None:
+    segments = [
+        (index * DOWNLOAD_SEGMENT_BYTES, min(size, (index + 1) * DOWNLOAD_SEGMENT_BYTES) - 1)
+        for index in range(math.ceil(size / DOWNLOAD_SEGMENT_BYTES))
+    ]
+    done = set(state.get("done", []))
+    if done:
+        print(f"🔁 Resuming {url}: {len(done)}/{len(segments)} segments already downloaded")
+    progress = _Progress(on_progress, size, sum(segments[i][1] - segments[i][0] + 1 for i in done))
+    with open(part_path, 'r+b' if os.path.exists(part_path) else 'w+b') as f:
+        f.truncate(size)
+
+    validator = _if_range_validator(state)
+    state_lock = threading.Lock()
+
+    def fetch(index):
+        start, end = segments[index]
+        _fetch_segment(url, part_path, start, end, validator, progress)
+        with state_lock:
+            done.add(index)
+            _save_state(part_path, {**state, "done": sorted(done)})
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_SEGMENT_WORKERS, thread_name_prefix="segment") as pool:
+        futures = [pool.submit(fetch, index) for index in range(len(segments)) if index not in done]
+        for future in futures:
+            future.result()
+    progress.finish()
+
+def _fetch_sequential(url: str, part_path: str, size: Optional[int], state: Dict[str, Any],
+                      on_progress: Optional[ProgressCallback]) -> None:
+    validator = _if_range_validator(state)
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is not None and offset >= size:
+            return
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if validator:
+                headers["If-Range"] = validator
+        progress = _Progress(on_progress, size, offset)
+        try:
+            with _get(url, headers) as response:
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    # Changed or no longer resumable; the server sent the whole file
+                    offset = 0
+                    progress.done = 0
+                with open(part_path, 'r+b' if offset else 'wb') as f:
+                    f.seek(offset)
+                    f.truncate()
+                    _write_from(response, f, progress)
+            if size is None or os.path.getsize(part_path) >= size:
+                progress.finish()
+                return
+        except requests.exceptions.RequestException:
+            if attempt == DOWNLOAD_RETRIES:
+                raise
+        print(f"🔁 Resuming {url} at byte {os.path.getsize(part_path)}")
+    raise requests.exceptions.ConnectionError(f"Download of {url} ended early")
+
+def fetch(url: str, part_path: str, on_progress: Optional[ProgressCallback] = None) -> None:
+    """
+    Download url into part_path. Servers that accept Range requests have
+    large files fetched as parallel segments, and a part_path left by an
+    earlier failed attempt is resumed if the file is unchanged (same size,
+    ETag and Last-Modified). Other servers get one streamed request.
+
+    The partial file is kept when the download fails so the next attempt
+    can resume it; discard() it once it has been published.
+    """
+    state = _load_state(part_path)
+    with _get(url, {"Range": "bytes=0-0"}) as response:
+        response.raise_for_status()
+        info = _describe(response)
+        size = info["size"]
+        current = {
+            "size": size,
+            "etag": info["etag"],
+            "last_modified": info["last_modified"],
+            # Segmented partial files are preallocated, so their length says nothing
+            "segmented": size is not None and size >= DOWNLOAD_PARALLEL_MIN_BYTES
+        }
+        final_url = info["url"] or url
+        if not info["ranged"]:
+            # No Range support: this response already is the whole file
+            discard(part_path)
+            with open(part_path, 'wb') as f:
+                progress = _Progress(on_progress, size)
+                _write_from(response, f, progress)
+            progress.finish()
+            return
+
+    resuming = {key: state.get(key) for key in current} == current
+    if not resuming:
+        # Nothing to resume, or the enclosure changed since the partial download started
+        discard(part_path)
+        state = {}
+    state.update(current)
+    _save_state(part_path, state)
+
+    try:
+        if current["segmented"]:
+            _fetch_segments(final_url, part_path, size, state, on_progress)
+        else:
+            _fetch_sequential(final_url, part_path, size, state, on_progress)
+    except EnclosureChanged:
+        discard(part_path)
+        if resuming or not current["segmented"]:
+            raise
+        # Nothing was resumed, so the file can't have changed under us: the
+        # server just won't serve these ranges. Fetch it in one stream.
+        print(f"⚠️ {final_url} refused segment requests, downloading sequentially")
+        state = {**current, "segmented": False}
+        _save_state(part_path, state)
+        _fetch_sequential(final_url, part_path, size, state, on_progress)
@@ -0,0 +1,189 @@
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+# Bump when the index layout changes so cached indexes are rebuilt
+FEED_INDEX_VERSION = 2
+
+ITUNES_NS = "{http://www.itunes.com/dtds/podcast-1.0.dtd}"
+
+def normalize_title(title: str) -> str:
+    return " ".join((title or "").lower().split())
+
+def _clean_url(url: Optional[str]) -> Optional[str]:
+    return url.split('?')[0] if url else None
+
+def _entry_image(entry) -> Optional[str]:
+    if hasattr(entry, 'image') and entry.image:
+        image_url = getattr(entry.image, 'href', None)
+        if image_url:
+            return image_url
+    return getattr(entry, 'feedImage', None)
+
+def _new_index(show_title=None, show_summary="", show_image=None) -> Dict[str, Any]:
+    return {
+        "version": FEED_INDEX_VERSION,
+        "show_title": show_title,
+        "show_summary": show_summary,
+        "show_image": show_image,
+        # False when parsing stopped at a wanted episode; see index_covers
+        "complete": True,
+        "entries": [],
+        "by_title": {},
+        "by_guid": {},
+        "by_audio_url": {}
+    }
+
+def _add_entry(index: Dict[str, Any], item: Dict[str, Any]) -> None:
+    position = len(index["entries"])
+    index["entries"].append(item)
+    # First occurrence wins, matching the old linear scans
+    index["by_title"].setdefault(normalize_title(item["title"]), position)
+    if item["guid"]:
+        index["by_guid"].setdefault(item["guid"], position)
+    if item["audio_url"]:
+        index["by_audio_url"].setdefault(_clean_url(item["audio_url"]), position)
+
+def build_feed_index(feed) -> Dict[str, Any]:
+    """
+    Reduce a feedparser result to what episode resolution needs, plus lookup
+    tables from normalized title, guid and enclosure URL to the entry's position.
+    """
+    try:
+        show_summary = feed.feed.summary
+    except AttributeError:
+        show_summary = ""
+    show_image = None
+    if hasattr(feed.feed, 'image') and feed.feed.image:
+        show_image = getattr(feed.feed.image, 'href', None)
+
+    index = _new_index(feed.feed.get("title"), show_summary or "", show_image)
+    for entry in feed.entries:
+        enclosures = getattr(entry, 'enclosures', None) or []
+        _add_entry(index, {
+            "title": entry.get('title', ''),
+            "summary": getattr(entry, 'summary', '') or '',
+            "guid": entry.get('guid', ''),
+            "link": entry.get('link', ''),
+            "audio_url": enclosures[0].get('href') if enclosures else None,
+            "duration": getattr(entry, 'itunes_duration', None),
+            "image_url": _entry_image(entry)
+        })
+    return index
+
+def _child_text(elem, tag: str) -> str:
+    child = elem.find(tag)
+    return (child.text or "").strip() if child is not None else ""
+
+def _item_entry(item) -> Dict[str, Any]:
+    enclosure = item.find("enclosure")
+    image = item.find(f"{ITUNES_NS}image")
+    return {
+        "title": _child_text(item, "title"),
+        "summary": _child_text(item, "description") or _child_text(item, f"{ITUNES_NS}summary"),
+        "guid": _child_text(item, "guid"),
+        "link": _child_text(item, "link"),
+        "audio_url": (enclosure.get("url") or None) if enclosure is not None else None,
+        "duration": _child_text(item, f"{ITUNES_NS}duration") or None,
+        "image_url": image.get("href") if image is not None else None
+    }
+
+def _set_channel_field(index: Dict[str, Any], elem) -> None:
+    if elem.tag == "title" and index["show_title"] is None:
+        index["show_title"] = (elem.text or "").strip()
+    elif elem.tag == f"{ITUNES_NS}summary":
+        index["show_summary"] = (elem.text or "").strip()
+    elif elem.tag == f"{ITUNES_NS}image" and elem.get("href"):
+        # iTunes artwork takes precedence over the RSS <image>
+        index["show_image"] = elem.get("href")
+    elif elem.tag == "image" and not index["show_image"]:
+        index["show_image"] = _child_text(elem, "url") or None
+
+def parse_feed_index(chunks: Iterable[bytes],
+                     episode_title: Union[str, Callable[[], Optional[str]], None] = None,
+                     episode_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build a feed index from raw RSS bytes as they arrive, without a full
+    document tree: each <item> is reduced to its index entry and dropped.
+
+    Given an episode title or guid, parsing stops once the entries so far
+    answer that lookup the way the whole feed would (see _prefix_answers)
+    and the index is marked incomplete. Channel fields that come after that
+    item are not seen.
+    episode_title may be a callable returning None until the title is
+    known (e.g. while it is still being scraped); it is asked again after
+    each item. Returns None when the document is not an RSS channel.
+    Raises ET.ParseError on malformed XML.
+    """
+    title_source = episode_title if callable(episode_title) else (lambda: episode_title)
+    wanted_title = None
+    parser = ET.XMLPullParser(events=("start", "end"))
+    index = _new_index()
+    seen_channel = False
+    stack = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+                seen_channel = seen_channel or elem.tag == "channel"
+                continue
+            stack.pop()
+            if not stack or stack[-1].tag != "channel":
+                continue
+            if elem.tag != "item":
+                _set_channel_field(index, elem)
+                continue
+            _add_entry(index, _item_entry(elem))
+            # Keep memory flat regardless of how many items the feed has
+            stack[-1].remove(elem)
+            if wanted_title is None:
+                wanted_title = title_source()
+            # Items parsed before the title was known are checked too
+            if _prefix_answers(index, wanted_title, episode_id):
+                index["complete"] = False
+                return index
+    parser.close()
+    return index if seen_channel else None
+
+def _prefix_answers(index: Dict[str, Any], episode_title: Optional[str],
+                    episode_id: Optional[str]) -> bool:
+    """
+    Whether find_entry_by_title / find_entry_by_episode_id give the same
+    answer on these leading entries as on the whole feed. Only an exact
+    match does: the first exact match is the first in the whole feed too,
+    while a substring match may be followed by an exact one.
+    """
+    return bool(
+        (episode_title and normalize_title(episode_title) in index["by_title"])
+        or (episode_id and episode_id in index["by_guid"])
+    )
+
+def index_covers(index: Dict[str, Any], episode_title: Optional[str] = None,
+                 episode_id: Optional[str] = None) -> bool:
+    """Whether an index (possibly one that stopped early) can answer this lookup"""
+    return index["complete"] or _prefix_answers(index, episode_title, episode_id)
+
+def find_entry_by_title(index: Dict[str, Any], episode_title: str) -> Optional[Dict[str, Any]]:
+    """Exact (normalized) title match, falling back to the first title containing it"""
+    needle = normalize_title(episode_title)
+    position = index["by_title"].get(needle)
+    if position is not None:
+        return index["entries"][position]
+    for entry in index["entries"]:
+        if needle in normalize_title(entry["title"]):
+            return entry
+    return None
+
+def find_entry_by_episode_id(index: Dict[str, Any], episode_id: str) -> Optional[Dict[str, Any]]:
+    """Match an Apple episode id against entry guids, then guid/link substrings"""
+    position = index["by_guid"].get(episode_id)
+    if position is not None:
+        return index["entries"][position]
+    for entry in index["entries"]:
+        if episode_id in entry["guid"] or episode_id in entry["link"]:
+            return entry
+    return None
+
+def find_entry_by_audio_url(index: Dict[str, Any], audio_url: str) -> Optional[Dict[str, Any]]:
+    position = index["by_audio_url"].get(_clean_url(audio_url))
+    return index["entries"][position] if position is not None else None
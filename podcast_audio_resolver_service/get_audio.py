@@ -1,14 +1,36 @@
 from podcast_audio_resolver_service.spotify_scraper import get_show_and_episode_title
 from podcast_audio_resolver_service import apple_scraper
 from podcast_audio_resolver_service.rss_fetcher import get_rss_feed_url, get_rss_from_apple_link
-from podcast_audio_resolver_service.audio_extractor import download_audio_and_get_metadata
+from podcast_audio_resolver_service.audio_extractor import download_audio_and_get_metadata, get_feed_index
 from podcast_audio_resolver_service.duration_checker import get_duration_from_episode
 from podcast_audio_resolver_service.podcast_index_episode_byfeedurl import get_episode_from_title
 from podcast_audio_resolver_service.get_image import get_image_url_from_episode
 
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
 
-def get_episode_audio_from_spotify(episode_url):
+# Independent lookups within one resolution (page scrape, Podcast Index, feed
+# fetch) run here concurrently instead of back to back
+LOOKUP_WORKERS = int(os.getenv("RESOLVER_LOOKUP_WORKERS", "16"))
+_lookup_executor = ThreadPoolExecutor(max_workers=LOOKUP_WORKERS, thread_name_prefix="lookup")
+
+def _fetch_feed_for_apple_link(apple_episode_url, title_future):
+    """
+    Look up the RSS URL and start fetching the feed while the page title is
+    still being scraped; parsing stops at the episode once the title is in
+    """
+    rss_url = get_rss_from_apple_link(apple_episode_url)
+    if not rss_url:
+        return None, None
+    try:
+        return rss_url, get_feed_index(rss_url, title_future)
+    except Exception as e:
+        # Leave it to download_audio_and_get_metadata to retry and report
+        print(f"⚠️ Speculative feed fetch failed for {rss_url}: {e}")
+        return rss_url, None
+
+def get_episode_audio_from_spotify(episode_url, on_progress=None):
     try:
         print("Fetching episode and show titles...")
         titles = get_show_and_episode_title(episode_url)
@@ -30,7 +52,7 @@ def get_episode_audio_from_spotify(episode_url):
             }
 
         print("Extracting audio URL...")
-        data = download_audio_and_get_metadata(rss_url, titles[0])
+        data = download_audio_and_get_metadata(rss_url, titles[0], on_progress)
 
         if data and "error" not in data:
             return data
@@ -47,7 +69,7 @@ def get_episode_audio_from_spotify(episode_url):
             "error": f"Failed to process Spotify episode: {str(e)}"
         }
 
-def get_episode_audio_from_apple(apple_episode_url):
+def get_episode_audio_from_apple(apple_episode_url, on_progress=None):
     try:
         # Extract Episode ID
         episode_id_match = re.search(r'[?&]i=(\d+)', apple_episode_url)
@@ -58,7 +80,14 @@ def get_episode_audio_from_apple(apple_episode_url):
                 "error": "Invalid Apple Podcast Episode URL format."
             }
 
-        episode_name = apple_scraper.get_episode_title(apple_episode_url)
+        # The page title and the RSS URL are independent lookups; run them
+        # side by side and fetch the feed as soon as its URL is known. The
+        # title task is queued first, so the feed task never waits on one that
+        # hasn't started
+        title_future = _lookup_executor.submit(apple_scraper.get_episode_title, apple_episode_url)
+        feed_future = _lookup_executor.submit(_fetch_feed_for_apple_link, apple_episode_url, title_future)
+
+        episode_name = title_future.result()
         if not episode_name:
             return {
                 "error": "Could not extract episode title from Apple Podcast URL."
@@ -66,15 +95,14 @@ def get_episode_audio_from_apple(apple_episode_url):
             
         print(f"Extracted Episode Name: {episode_name}")
 
-        # Get RSS Feed URL
-        rss_url = get_rss_from_apple_link(apple_episode_url)
+        rss_url, feed_index = feed_future.result()
         if not rss_url:
             return {
                 "error": "Failed to retrieve RSS feed from Apple Podcast link."
             }
 
         # Download Audio File
-        data = download_audio_and_get_metadata(rss_url, episode_name)
+        data = download_audio_and_get_metadata(rss_url, episode_name, on_progress, feed_index)
         
         if data and "error" not in data:
             return data
@@ -0,0 +1,87 @@
+from html.parser import HTMLParser
+from typing import Dict, Iterable, Optional, Tuple
+
+from podcast_audio_resolver_service import http_client
+
+# A target names the element whose text we want:
+# (tag, attribute, value the attribute must contain, optional child tag).
+# With a child tag, the text of the first such child inside the element is used.
+Target = Tuple[str, str, str, Optional[str]]
+
+PAGE_CHUNK_SIZE = 16 * 1024
+
+class _TargetTextParser(HTMLParser):
+    """Collects the text of the first element matching each target"""
+
+    def __init__(self, targets: Dict[str, Target]):
+        super().__init__(convert_charrefs=True)
+        self.targets = targets
+        self.results: Dict[str, str] = {}
+        # name -> [phase, depth, text parts]; phase is "outer" while looking
+        # for the child tag and "text" while capturing
+        self._open: Dict[str, list] = {}
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) == len(self.targets)
+
+    def handle_starttag(self, tag, attrs):
+        for name, state in self._open.items():
+            capture_tag = self._capture_tag(name, state)
+            if state[0] == "outer" and tag == capture_tag:
+                state[0], state[1] = "text", 1
+            elif tag == capture_tag:
+                state[1] += 1
+        for name, (target_tag, attr, value, child_tag) in self.targets.items():
+            if name in self.results or name in self._open or tag != target_tag:
+                continue
+            attr_value = dict(attrs).get(attr) or ""
+            if value in attr_value.split():
+                self._open[name] = ["outer" if child_tag else "text", 1, []]
+
+    def handle_endtag(self, tag):
+        for name, state in list(self._open.items()):
+            target_tag, _, _, child_tag = self.targets[name]
+            if state[0] == "outer":
+                # The element closed without the child we wanted
+                if tag == target_tag:
+                    del self._open[name]
+                continue
+            if tag != self._capture_tag(name, state):
+                continue
+            state[1] -= 1
+            if state[1] == 0:
+                self.results[name] = "".join(state[2])
+                del self._open[name]
+
+    def handle_data(self, data):
+        for state in self._open.values():
+            if state[0] == "text":
+                state[2].append(data)
+
+    def _capture_tag(self, name, state):
+        target_tag, _, _, child_tag = self.targets[name]
+        return child_tag if child_tag else target_tag
+
+def extract_text(chunks: Iterable[str], targets: Dict[str, Target]) -> Dict[str, str]:
+    """Feed HTML chunks to the parser, stopping as soon as every target is found"""
+    parser = _TargetTextParser(targets)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    return parser.results
+
+def fetch_page_text(url: str, targets: Dict[str, Target], headers: Optional[dict] = None) -> Optional[Dict[str, str]]:
+    """Stream a page and return the text of the given targets (missing ones are left out).
+
+    Stops downloading once every target has been seen, so the rest of the
+    page is never transferred or parsed. Returns None on a non-200 response.
+    """
+    with http_client.get(url, headers=headers, stream=True) as response:
+        if response.status_code != 200:
+            print(f"Failed to fetch page. Status code: {response.status_code}")
+            return None
+        response.encoding = 'utf-8'
+        chunks = response.iter_content(chunk_size=PAGE_CHUNK_SIZE, decode_unicode=True)
+        return extract_text(chunks, targets)
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One pooled keep-alive session shared by every scraper and API client in the
+# resolver, so repeat calls to the same host skip DNS, TCP and TLS setup
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "20"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Enclosure downloads use their own session, so parallel segment fetches
+# can't hold every pooled connection to a host (podcast hosts often serve
+# feeds and audio from one domain) and stall feed and API lookups. Its pool
+# never blocks: connections beyond this many per host are opened and closed
+# instead of waited for.
+DOWNLOAD_POOL_MAXSIZE = int(os.getenv("DOWNLOAD_POOL_MAXSIZE", "10"))
+
+# Upper bounds (ms) of the per-host latency histogram buckets; the last
+# bucket catches everything slower
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+def _build_session(pool_maxsize: int = HTTP_POOL_MAXSIZE, pool_block: bool = True) -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        # Every call we make is a lookup, including the Podcast Index search POST
+        allowed_methods=frozenset(["GET", "HEAD", "POST"]),
+        respect_retry_after_header=True,
+        # Hand the last response back so callers keep their status handling
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_HOSTS,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+session = _build_session()
+download_session = _build_session(DOWNLOAD_POOL_MAXSIZE, pool_block=False)
+
+_latency: Dict[str, Dict[str, Any]] = {}
+_latency_lock = threading.Lock()
+
+def _record(host: str, elapsed_ms: float, failed: bool) -> None:
+    with _latency_lock:
+        stats = _latency.setdefault(host, {
+            "count": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        })
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["buckets"][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if failed:
+            stats["errors"] += 1
+
+def request(method: str, url: str, client: Optional[requests.Session] = None, **kwargs) -> requests.Response:
+    """Send a request through client (the shared session by default) with default timeouts.
+
+    Latency is recorded per host, including retries. For stream=True it
+    covers the time to the response headers, not the body.
+    """
+    kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+    host = urlsplit(url).hostname or "unknown"
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = (client or session).request(method, url, **kwargs)
+        failed = response.status_code >= 500
+        return response
+    finally:
+        _record(host, (time.perf_counter() - start) * 1000, failed)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+def get_latency_stats() -> Dict[str, Any]:
+    """Per-host request counts, errors and latency histograms (ms)"""
+    labels = [f"le_{bound}" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+    with _latency_lock:
+        return {
+            host: {
+                "count": stats["count"],
+                "errors": stats["errors"],
+                "avg_ms": round(stats["total_ms"] / stats["count"], 1),
+                "max_ms": round(stats["max_ms"], 1),
+                "histogram": dict(zip(labels, stats["buckets"]))
+            }
+            for host, stats in _latency.items()
+        }
@@ -1,5 +1,7 @@
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,7 +9,9 @@ from pydantic import BaseModel
 
 import podcast_audio_resolver_service.get_audio as get_audio
 import podcast_audio_resolver_service.audio_upload_producer as audio_upload_producer
+from podcast_audio_resolver_service import http_client, audio_store
 from cache_service import CacheService
+from redis_stream_client import publish_job_update
 
 load_dotenv()
 
@@ -17,8 +21,22 @@ frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000" if ENV == "test
 if not frontend_url and ENV != "test":
     raise RuntimeError("Missing FRONTEND_URL environment variable.")
 
+# Scraping, feed lookups and audio downloads are blocking; they run here so
+# the event loop stays free for other requests (including cache hits)
+RESOLVER_WORKERS = int(os.getenv("RESOLVER_WORKERS", "8"))
+_resolver_executor = ThreadPoolExecutor(max_workers=RESOLVER_WORKERS, thread_name_prefix="resolver")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hot episodes are served from the in-process L1 cache once invalidations are flowing
+    CacheService.start_invalidation_listener()
+    # Index the audio folder up front so the first lookups don't pay for the
+    # scan, and bring the store back within its quota
+    _resolver_executor.submit(audio_store.prepare)
+    yield
+
 # Create FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS setup
 origins = [frontend_url]
@@ -36,6 +54,126 @@ class PodcastRequest(BaseModel):
     url: str
     summary_type: str  # ts, ns, bs
 
+def _error_response(message: str):
+    return {
+        "message": message,
+        "error": True,
+        "data": None,
+        "cached": False
+    }
+
+def _resolve_and_emit(url: str, platform: str, episode_id: str, summary_type: str, job_id: str):
+    """Scrape and download the episode, then emit its audio_uploaded event"""
+    def on_progress(downloaded_bytes, total_bytes):
+        _send_update(job_id, {
+            "job_id": job_id,
+            "status": "downloading",
+            "downloaded_bytes": downloaded_bytes,
+            "total_bytes": total_bytes
+        })
+
+    data = None
+    if "podcasts.apple.com" in url:
+        data = get_audio.get_episode_audio_from_apple(url, on_progress)
+    elif "open.spotify.com" in url:
+        data = get_audio.get_episode_audio_from_spotify(url, on_progress)
+    else:
+        return _error_response("Unsupported podcast platform. Only Apple Podcasts and Spotify are supported.")
+
+    # Handle errors from audio resolver
+    if data is None:
+        return _error_response("Failed to process podcast URL. Please check the URL and try again.")
+
+    if "error" in data:
+        return _error_response(data["error"])
+
+    # Validate required fields
+    # In stream and url modes only the enclosure URL is handed over
+    if not data.get("file_path") and not data.get("audio_url"):
+        return _error_response("Audio file not found or could not be downloaded.")
+
+    if not data.get("metadata"):
+        return _error_response("Episode metadata not found.")
+
+    # Enrich with metadata
+    data["summary_type"] = summary_type
+    data["job_id"] = job_id
+    data["platform"] = platform
+    data["episode_id"] = episode_id
+
+    # Emit event for processing
+    try:
+        audio_upload_producer.emit_audio_uploaded(data)
+    except Exception as e:
+        print(f"Error emitting audio_uploaded event: {e}")
+        return _error_response("Failed to start processing. Please try again.")
+
+    # Requests attaching to this job get the same response data
+    CacheService.set_job_data(job_id, data)
+    return {
+        "message": "Download successful",
+        "data": data,
+        "error": False,
+        "cached": False
+    }
+
+def _attach_to_job(job_id: str, platform: str, episode_id: str, summary_type: str):
+    """Respond with an in-flight job's id so the client follows its WebSocket"""
+    data = CacheService.get_job_data(job_id) or {
+        "job_id": job_id,
+        "platform": platform,
+        "episode_id": episode_id,
+        "summary_type": summary_type
+    }
+    return {
+        "message": "Joined in-progress job",
+        "data": data,
+        "error": False,
+        "cached": False
+    }
+
+def _send_update(job_id: str, payload: dict):
+    """Push a job status update to the job's WebSocket clients"""
+    try:
+        publish_job_update(job_id, payload)
+    except Exception as e:
+        print(f"⚠️ Failed to publish update for job {job_id}: {e}")
+
+def _fail_job(job_id: str, message: str):
+    """Tell the job's clients that it will not produce a summary"""
+    payload = {
+        "job_id": job_id,
+        "status": "error",
+        "error": message
+    }
+    CacheService.set_job_result(job_id, payload)
+    _send_update(job_id, payload)
+
+def _process_job(url: str, platform: str, episode_id: str, summary_type: str, job_id: str):
+    """Resolve and emit a job in the background, reporting progress over the WebSocket"""
+    response = None
+    try:
+        _send_update(job_id, {
+            "job_id": job_id,
+            "status": "resolving",
+            "message": "Finding episode audio..."
+        })
+        response = _resolve_and_emit(url, platform, episode_id, summary_type, job_id)
+    except Exception as e:
+        print(f"[Server Error] {e}")
+
+    if response is None or response["error"]:
+        CacheService.release_inflight_job(platform, episode_id, summary_type, job_id)
+        _fail_job(job_id, response["message"] if response else "Internal server error. Please try again later.")
+        return
+
+    _send_update(job_id, {
+        "job_id": job_id,
+        "status": "transcribing",
+        "message": "Audio downloaded. Transcribing..." if response["data"].get("file_path") else "Episode found. Transcribing...",
+        "data": response["data"]
+    })
+
 # Route
 @app.post("/submit")
 async def download_episode(request: PodcastRequest):
@@ -77,70 +215,25 @@ async def download_episode(request: PodcastRequest):
                 "processing_time": 0
             }
         
-        # If not cached, proceed with normal flow
-        data = None
-        if "podcasts.apple.com" in url:
-            data = get_audio.get_episode_audio_from_apple(url)
-        elif "open.spotify.com" in url:
-            data = get_audio.get_episode_audio_from_spotify(url)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported podcast platform. Only Apple Podcasts and Spotify are supported.")
-
-        # Handle errors from audio resolver
-        if data is None:
-            return {
-                "message": "Failed to process podcast URL. Please check the URL and try again.",
-                "error": True,
-                "data": None,
-                "cached": False
-            }
-
-        if "error" in data:
-            return {
-                "message": data["error"],
-                "error": True,
-                "data": None,
-                "cached": False
-            }
-
-        # Validate required fields
-        if not data.get("file_path"):
-            return {
-                "message": "Audio file not found or could not be downloaded.",
-                "error": True,
-                "data": None,
-                "cached": False
-            }
-
-        if not data.get("metadata"):
-            return {
-                "message": "Episode metadata not found.",
-                "error": True,
-                "data": None,
-                "cached": False
-            }
-
-        # Enrich with metadata
-        data["summary_type"] = summary_type
-        data["job_id"] = str(uuid.uuid4())
-        data["platform"] = platform
-        data["episode_id"] = episode_id
-
-        # Emit event for processing
-        try:
-            audio_upload_producer.emit_audio_uploaded(data)
-        except Exception as e:
-            print(f"Error emitting audio_uploaded event: {e}")
-            return {
-                "message": "Failed to start processing. Please try again.",
-                "error": True,
-                "data": None,
-                "cached": False
-            }
+        # Single-flight: identical requests share one scrape/download/transcription
+        # and follow the first request's job over the WebSocket. The summarizer
+        # releases the key once the summary is cached.
+        job_id = str(uuid.uuid4())
+        inflight_job_id = CacheService.claim_inflight_job(platform, episode_id, summary_type, job_id)
+        if inflight_job_id:
+            return _attach_to_job(inflight_job_id, platform, episode_id, summary_type)
 
+        # Respond right away; progress, errors and the summary arrive over the
+        # job's WebSocket
+        _resolver_executor.submit(_process_job, url, platform, episode_id, summary_type, job_id)
         return {
-            "message": "Download successful",
-            "data": data,
+            "message": "Processing started",
+            "data": {
+                "job_id": job_id,
+                "platform": platform,
+                "episode_id": episode_id,
+                "summary_type": summary_type
+            },
             "error": False,
             "cached": False
         }
@@ -162,6 +255,21 @@ async def get_cache_stats():
     """Get cache statistics"""
     return CacheService.get_cache_stats()
 
+@app.get("/cache/tiers")
+async def get_cache_tier_stats():
+    """Get per-tier (in-process L1 / Redis) hit and miss counters"""
+    return CacheService.get_tier_stats()
+
+@app.get("/http/stats")
+async def get_http_stats():
+    """Get per-host outbound request counts and latency histograms"""
+    return http_client.get_latency_stats()
+
+@app.get("/audio/stats")
+async def get_audio_stats():
+    """Get downloaded audio store occupancy, hit and eviction counters"""
+    return audio_store.get_metrics()
+
 @app.delete("/cache/clear")
 async def clear_cache(admin_key: str = None):
     """Clear all episode cache - requires admin authentication"""
@@ -3,6 +3,7 @@ import time
 import hashlib
 import requests
 from dotenv import load_dotenv
+from podcast_audio_resolver_service import http_client
 
 load_dotenv()
 
@@ -36,7 +37,7 @@ def _get_auth_headers():
 
 def get_episode_from_title(feed_url, episode_title):
     try:
-        response = requests.get(
+        response = http_client.get(
             f"{PODCAST_INDEX_BASE_URL}/episodes/byfeedurl",
             params={"url": feed_url},
             headers=_get_auth_headers(),
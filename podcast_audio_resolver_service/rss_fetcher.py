@@ -2,8 +2,10 @@ import os
 import re
 import time
 import hashlib
-import requests
+import threading
 from dotenv import load_dotenv
+from podcast_audio_resolver_service import http_client
+from cache_service import CacheService
 
 load_dotenv()
 
@@ -16,6 +18,10 @@ if ENV != "test" and (not API_KEY or not API_SECRET):
 
 PODCAST_INDEX_BASE_URL = "https://api.podcastindex.org/api/1.0"
 
+# (lookup, value) pairs with a background refresh already running
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
 
 def _get_auth_headers():
     epoch_time = int(time.time())
@@ -30,22 +36,84 @@ def _get_auth_headers():
     }
 
 
+def _fetch_feed_url_by_title(podcast_title):
+    """
+    Search Podcast Index by title. Returns None if no feed matches; raises on
+    API or network errors so those aren't cached as misses.
+    """
+    url = f"{PODCAST_INDEX_BASE_URL}/search/bytitle?q={podcast_title}"
+    response = http_client.post(url, headers=_get_auth_headers(), timeout=5)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text}")
+
+    feeds = response.json().get('feeds', [])
+    if feeds:
+        return feeds[0].get('url')
+    print(f"[PodcastIndex] No feeds found for title: {podcast_title}")
+    return None
+
+
+def _fetch_feed_url_by_itunes_id(podcast_id):
+    """
+    Look up a feed by iTunes id. Returns None if Podcast Index doesn't know
+    it; raises on API or network errors.
+    """
+    url = f"{PODCAST_INDEX_BASE_URL}/podcasts/byitunesid?id={podcast_id}"
+    response = http_client.get(url, headers=_get_auth_headers(), timeout=5)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+
+    feed_data = response.json().get('feed')
+    if feed_data:
+        return feed_data.get('url')
+    print("[PodcastIndex] No feed data found for this Podcast ID.")
+    return None
+
+
+def _refresh_in_background(lookup, value, fetch):
+    """Re-fetch a stale feed URL without making the current request wait"""
+    with _refreshing_lock:
+        if (lookup, value) in _refreshing:
+            return
+        _refreshing.add((lookup, value))
+
+    def _refresh():
+        try:
+            rss_url = fetch(value)
+            # A show that disappeared keeps its last known URL until it expires
+            if rss_url:
+                CacheService.set_cached_feed_url(lookup, value, rss_url)
+        except Exception as e:
+            print(f"[PodcastIndex] Background refresh failed for {lookup} {value}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard((lookup, value))
+
+    threading.Thread(target=_refresh, name="feed-url-refresh", daemon=True).start()
+
+
+def _cached_lookup(lookup, value, fetch):
+    """Serve a feed URL lookup from cache (stale-while-revalidate), fetching on a miss"""
+    cached = CacheService.get_cached_feed_url(lookup, value)
+    if cached:
+        age = time.time() - cached["fetched_at"]
+        if cached["url"] and age >= CacheService.FEED_URL_FRESH_SECONDS:
+            _refresh_in_background(lookup, value, fetch)
+        return cached["url"]
+
+    rss_url = fetch(value)
+    CacheService.set_cached_feed_url(lookup, value, rss_url)
+    return rss_url
+
+
 def get_rss_feed_url(podcast_title):
     """
     Search for RSS feed by podcast title using Podcast Index API.
     """
     try:
-        url = f"{PODCAST_INDEX_BASE_URL}/search/bytitle?q={podcast_title}"
-        response = requests.post(url, headers=_get_auth_headers(), timeout=5)
-
-        if response.status_code == 200:
-            feeds = response.json().get('feeds', [])
-            if feeds:
-                return feeds[0].get('url')
-            else:
-                print(f"[PodcastIndex] No feeds found for title: {podcast_title}")
-        else:
-            print(f"[PodcastIndex] HTTP {response.status_code}: {response.text}")
+        return _cached_lookup("title", podcast_title, _fetch_feed_url_by_title)
     except Exception as e:
         print(f"[PodcastIndex] Error fetching feed URL: {e}")
 
@@ -65,19 +133,10 @@ def get_rss_from_apple_link(apple_episode_url):
     print(f"[PodcastIndex] Extracted Podcast ID: {podcast_id}")
 
     try:
-        url = f"{PODCAST_INDEX_BASE_URL}/podcasts/byitunesid?id={podcast_id}"
-        response = requests.get(url, headers=_get_auth_headers(), timeout=5)
-
-        if response.status_code == 200:
-            feed_data = response.json().get('feed')
-            if feed_data:
-                rss_url = feed_data.get('url')
-                print(f"[PodcastIndex] RSS Feed URL: {rss_url}")
-                return rss_url
-            else:
-                print("[PodcastIndex] No feed data found for this Podcast ID.")
-        else:
-            print(f"[PodcastIndex] API Error: {response.status_code} - {response.text}")
+        rss_url = _cached_lookup("itunes", podcast_id, _fetch_feed_url_by_itunes_id)
+        if rss_url:
+            print(f"[PodcastIndex] RSS Feed URL: {rss_url}")
+        return rss_url
     except Exception as e:
         print(f"[PodcastIndex] Error fetching RSS from Apple link: {e}")
 
@@ -1,9 +1,16 @@
-import requests
+from podcast_audio_resolver_service import http_client
+from podcast_audio_resolver_service.html_extract import fetch_page_text
+from cache_service import CacheService
 from bs4 import BeautifulSoup
 
+TITLE_TARGETS = {
+    "episode_title": ("h1", "data-testid", "episodeTitle", None),
+    "show_title": ("p", "data-testid", "entity-header-entity-subtitle", None),
+}
+
 def get_podcast_title(show_url):
     headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(show_url, headers=headers)
+    response = http_client.get(show_url, headers=headers)
 
     if response.status_code != 200:
         print(f"Failed to fetch page. Status code: {response.status_code}")
@@ -16,24 +23,23 @@ def get_podcast_title(show_url):
     return raw_title.replace(" | Podcast on Spotify", "").strip()
 
 def get_show_and_episode_title(episode_url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    response = requests.get(episode_url, headers=headers)
+    cached = CacheService.get_cached_page_metadata(episode_url)
+    if cached and cached.get("episode_title") and cached.get("show_title"):
+        print(f"🎯 Using cached titles for {episode_url}")
+        return [cached["episode_title"], cached["show_title"]]
 
-    if response.status_code != 200:
-        print(f"Failed to fetch page. Status code: {response.status_code}")
+    headers = {"User-Agent": "Mozilla/5.0"}
+    found = fetch_page_text(episode_url, TITLE_TARGETS, headers=headers)
+    if found is None:
         return None
-    
-    response.encoding = 'utf-8'
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # print(soup)
-
-    episode_title_span = soup.find('h1', {'data-testid': 'episodeTitle'})
-    episode_title = episode_title_span.text if episode_title_span else None
 
-    show_title_span = soup.find('p', {'data-testid': 'entity-header-entity-subtitle'})
-    show_title = show_title_span.text if show_title_span else None
+    episode_title = found.get("episode_title")
+    show_title = found.get("show_title")
+    if episode_title and show_title:
+        CacheService.set_cached_page_metadata(episode_url, {
+            "episode_title": episode_title,
+            "show_title": show_title
+        })
 
     return [episode_title, show_title]
 
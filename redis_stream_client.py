@@ -1,4 +1,9 @@
 import os
+import json
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Set
 import redis
 from dotenv import load_dotenv
 
@@ -29,6 +34,196 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# Binary client for cache payloads written by cache_codec (not valid UTF-8)
+redis_binary_client = redis.Redis(
+    host=upstash_redis_host,
+    port=upstash_redis_port,
+    password=upstash_redis_password,
+    ssl=(ENV != "test"),
+    decode_responses=False
+)
+
 # Stream names
 AUDIO_UPLOADED_STREAM = "audio_uploaded"
 TRANSCRIPTION_COMPLETE_STREAM = "transcription_complete"
+
+# Pub/sub channel relaying per-job status updates to whichever summarization
+# replica holds the job's WebSocket connections
+JOB_UPDATES_CHANNEL = "job_updates"
+
+
+def default_consumer_name() -> str:
+    """Unique consumer name for this replica/process within a consumer group"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def ensure_consumer_group(stream: str, group: str):
+    """Create the consumer group (and stream) if it doesn't exist yet.
+
+    New groups start at "$" so a first deployment doesn't replay history;
+    afterwards the group's position survives restarts.
+    """
+    try:
+        redis_client.xgroup_create(stream, group, id="$", mkstream=True)
+        print(f"✅ Created consumer group {group} on {stream}")
+    except redis.exceptions.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def claim_stale_messages(stream: str, group: str, consumer: str, min_idle_ms: int, count: int):
+    """Take over up to count messages left pending by crashed consumers"""
+    claimed = []
+    start_id = "0-0"
+    while len(claimed) < count:
+        result = redis_client.xautoclaim(
+            stream, group, consumer,
+            min_idle_time=min_idle_ms, start_id=start_id, count=count - len(claimed)
+        )
+        start_id, entries = result[0], result[1]
+        claimed.extend(entries)
+        if start_id in ("0-0", b"0-0") or not entries:
+            break
+    if claimed:
+        print(f"♻️ Reclaimed {len(claimed)} stale {stream} messages")
+    return claimed
+
+
+def heartbeat_pending(stream: str, group: str, consumer: str, message_ids):
+    """Reset the idle time of messages this consumer is still working on.
+
+    Keeps long-running jobs from looking abandoned to claim_stale_messages.
+    """
+    if message_ids:
+        redis_client.xclaim(
+            stream, group, consumer,
+            min_idle_time=0, message_ids=list(message_ids), justid=True
+        )
+
+
+def acquire_free_slots(slots: threading.Semaphore, capacity: int, timeout: float) -> int:
+    """Wait up to timeout for a free slot, then grab every other free slot too.
+
+    Returns 0 if all slots stayed busy, so the caller can keep heartbeating.
+    """
+    if not slots.acquire(timeout=timeout):
+        return 0
+    free = 1
+    while free < capacity and slots.acquire(blocking=False):
+        free += 1
+    return free
+
+
+def consume_group(stream: str, group: str, consumer: str, slots: threading.Semaphore, capacity: int,
+                  in_flight: Set[str], in_flight_lock: threading.Lock,
+                  handle_entry: Callable[[str, Dict[str, Any]], None], claim_min_idle_ms: int,
+                  claim_interval_seconds: float = 30, read_block_ms: int = 5000,
+                  read_error_backoff_seconds: float = 5, on_heartbeat: Optional[Callable[[], None]] = None):
+    """Read stream as consumer of group forever, one free slot per entry.
+
+    Entries are only read or reclaimed while slots are free; the rest stay
+    in the stream for other replicas. Each entry is added to in_flight and
+    passed to handle_entry, which then owns its slot: whatever finishes the
+    entry must ack it, drop it from in_flight and release the slot. If
+    handle_entry raises, the entry is left pending and its slot is freed.
+
+    Every claim_interval_seconds the in_flight entries are heartbeated,
+    on_heartbeat is called so the consumer can keep its jobs' own leases
+    alive, and entries idle on crashed consumers for claim_min_idle_ms are
+    reclaimed. Redis errors never end the loop: a failed heartbeat or claim
+    is retried at the next interval, a failed read after
+    read_error_backoff_seconds.
+    """
+    last_claim = 0.0
+    while True:
+        # Pause reading while every slot is busy; wake up periodically so
+        # in-flight entries keep being heartbeated
+        free = acquire_free_slots(slots, capacity, claim_interval_seconds)
+        entries = []
+        try:
+            if time.time() - last_claim >= claim_interval_seconds:
+                last_claim = time.time()
+                with in_flight_lock:
+                    message_ids = list(in_flight)
+                try:
+                    heartbeat_pending(stream, group, consumer, message_ids)
+                    if free:
+                        entries.extend(claim_stale_messages(stream, group, consumer, claim_min_idle_ms, free))
+                except Exception as e:
+                    print(f"⚠️ Failed to reclaim pending {stream} messages: {e}")
+                if on_heartbeat:
+                    try:
+                        on_heartbeat()
+                    except Exception as e:
+                        print(f"⚠️ Failed to refresh in-flight {stream} jobs: {e}")
+
+            if free and len(entries) < free:
+                try:
+                    messages = redis_client.xreadgroup(
+                        group, consumer, {stream: ">"},
+                        count=free - len(entries), block=read_block_ms
+                    )
+                except Exception as e:
+                    # A Redis blip must not stop this replica consuming for good
+                    print(f"⚠️ Failed to read {stream}, retrying in {read_error_backoff_seconds}s: {e}")
+                    time.sleep(read_error_backoff_seconds)
+                    messages = None
+                for _, stream_entries in messages or []:
+                    entries.extend(stream_entries)
+        finally:
+            # Give back the slots we won't use this round
+            for _ in range(free - len(entries)):
+                slots.release()
+
+        for msg_id, data in entries:
+            with in_flight_lock:
+                in_flight.add(msg_id)
+            try:
+                handle_entry(msg_id, data or {})
+            except Exception as e:
+                print(f"❌ Failed to dispatch {msg_id}, leaving it pending: {e}")
+                with in_flight_lock:
+                    in_flight.discard(msg_id)
+                slots.release()
+
+
+def _stream_id(entry_id: str):
+    milliseconds, _, sequence = entry_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def trim_consumed(stream: str):
+    """Drop entries every consumer group has delivered and acked.
+
+    Trimming by count would also delete entries still waiting to be read
+    or pending on a consumer, so the cut-off is the oldest entry any group
+    still needs: its oldest pending entry, or its last delivered one.
+    """
+    try:
+        keep_from = None
+        for info in redis_client.xinfo_groups(stream):
+            oldest = redis_client.xpending(stream, info["name"]).get("min") or info["last-delivered-id"]
+            if keep_from is None or _stream_id(oldest) < _stream_id(keep_from):
+                keep_from = oldest
+        if keep_from and _stream_id(keep_from) > (0, 0):
+            redis_client.xtrim(stream, minid=keep_from, approximate=True)
+    except Exception as e:
+        # Untrimmed entries only cost memory; the event itself was published
+        print(f"⚠️ Failed to trim {stream}: {e}")
+
+
+def publish_job_update(job_id: str, payload: dict):
+    """Publish a status update for job_id to every summarization replica"""
+    redis_client.publish(JOB_UPDATES_CHANNEL, json.dumps({"job_id": job_id, "payload": payload}))
+
+
+
+def consumer_group_backlog(stream: str, group: str) -> dict:
+    """Pending (delivered, unacked) and lag (not yet delivered) counts for a group.
+
+    lag is None when the server can't compute it (Redis < 7 or after trimming).
+    """
+    for info in redis_client.xinfo_groups(stream):
+        if info.get("name") == group:
+            return {"pending": info.get("pending", 0), "lag": info.get("lag")}
+    return {"pending": 0, "lag": None}
@@ -5,10 +5,13 @@ import asyncio
 
 from summarization_service.transcription_complete_consumer import consume_transcription_completed
 from summarization_service.ws_manager import manager
+from cache_service import CacheService
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     loop = asyncio.get_running_loop()
+    # relay job updates from every replica to the sockets connected to this one
+    manager.start_relay(loop)
     # launch your blocking consumer in a thread, passing the loop
     asyncio.create_task(asyncio.to_thread(consume_transcription_completed, loop))
     yield
@@ -22,6 +25,10 @@ app = FastAPI(lifespan=lifespan)
 async def ws_summary(websocket: WebSocket, job_id: str):
     await websocket.accept()                           # Must accept the handshake :contentReference[oaicite:2]{index=2}
     await manager.connect(job_id, websocket)
+    # Requests that joined a shared job may connect after it already finished
+    result = CacheService.get_job_result(job_id)
+    if result:
+        await websocket.send_json(result)
     try:
         while True:
             await websocket.receive_text()
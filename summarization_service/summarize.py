@@ -1,6 +1,7 @@
 import os
 import time
 import re
+import threading
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
@@ -24,16 +25,19 @@ OPENROUTER_MODEL = "deepseek/deepseek-r1-distill-llama-70b:free"
 # Rate limiting: ensure at least 60 seconds between calls
 _t_last_request_time = 0.0
 _api_key_usage_counter = 0  # Track which API key to use next
+# Summaries run on a worker pool; the cooldown must hold across workers
+_rate_limit_lock = threading.Lock()
 
 def _rate_limit():
     global _t_last_request_time
-    now = time.time()
-    elapsed = now - _t_last_request_time
-    if elapsed < 60:
-        wait = 60 - elapsed
-        print(f"[Summarizer] Rate limit in effect, sleeping for {wait:.1f}s...")
-        time.sleep(wait)
-    _t_last_request_time = time.time()
+    with _rate_limit_lock:
+        now = time.time()
+        elapsed = now - _t_last_request_time
+        if elapsed < 60:
+            wait = 60 - elapsed
+            print(f"[Summarizer] Rate limit in effect, sleeping for {wait:.1f}s...")
+            time.sleep(wait)
+        _t_last_request_time = time.time()
 
 def _get_next_api_key():
     """Alternate between API keys to distribute load"""
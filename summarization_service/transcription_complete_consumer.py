@@ -1,152 +1,187 @@
 # summarization_service/transcription_complete_consumer.py
-from redis_stream_client import redis_client, TRANSCRIPTION_COMPLETE_STREAM
+from redis_stream_client import (
+    redis_client, TRANSCRIPTION_COMPLETE_STREAM, ensure_consumer_group, default_consumer_name,
+    consume_group, publish_job_update
+)
 from summarization_service import summarize
 from summarization_service.ws_manager import manager
 from cache_service import CacheService
-import json, asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json, asyncio, os, threading
 
-def consume_transcription_completed(loop):
-    print("🎧 Starting consumer…")
-    redis_client.xtrim(TRANSCRIPTION_COMPLETE_STREAM, maxlen=0)
-    last_id = "0"
+# Consumer group settings: summarization replicas share the stream, and each
+# replica runs up to WORKER_COUNT jobs at once so one slow LLM call doesn't
+# stall every job queued behind it
+CONSUMER_GROUP = os.getenv("SUMMARIZATION_CONSUMER_GROUP", "summarization_service")
+CONSUMER_NAME = os.getenv("SUMMARIZATION_CONSUMER_NAME", default_consumer_name())
+WORKER_COUNT = int(os.getenv("SUMMARIZATION_WORKERS", "4"))
+READ_BLOCK_MS = 5000
+CLAIM_MIN_IDLE_MS = int(os.getenv("SUMMARIZATION_CLAIM_MIN_IDLE_MS", str(5 * 60 * 1000)))
+CLAIM_INTERVAL_SECONDS = 30
+# Pause after a failed stream read before trying again
+READ_ERROR_BACKOFF_SECONDS = 5
+
+_executor = ThreadPoolExecutor(max_workers=WORKER_COUNT, thread_name_prefix="summarizer")
+# One slot per worker; the read loop only pulls as many messages as there are free slots
+_slots = threading.BoundedSemaphore(WORKER_COUNT)
+_in_flight: set = set()
+_in_flight_lock = threading.Lock()
+# In-flight job claim (platform, episode_id, summary_type, job_id) per message,
+# refreshed on every heartbeat so slow summaries keep it
+_in_flight_jobs: dict = {}
 
+def _send_update(loop, job_id, payload):
+    """Send a job update to every replica; fall back to local sockets if Redis is unavailable"""
     try:
-        while True:
-            messages = redis_client.xread(
-                {TRANSCRIPTION_COMPLETE_STREAM: last_id},
-                block=60000, count=1
+        publish_job_update(job_id, payload)
+    except Exception as e:
+        print(f"⚠️ Failed to relay update for {job_id}, broadcasting locally: {e}")
+        loop.call_soon_threadsafe(
+            asyncio.create_task,
+            manager.broadcast(job_id, payload)
+        )
+
+def _summarize(parsed):
+    """Generate (or fetch) the requested summary, cache it, and build the final payload"""
+    # Extract episode title from metadata
+    episode_title = None
+    duration = None
+    if "metadata" in parsed and parsed["metadata"]:
+        episode_title = parsed["metadata"].get("episode_title")
+        duration = parsed["metadata"].get("duration")
+    
+    # Check the per-type summary cache for this transcript first.
+    # Messages from older producers don't carry the id; hash as a fallback
+    transcript_id = parsed.get("transcript_id") or CacheService.get_transcript_id(parsed["transcript"])
+    summary = CacheService.get_cached_summary(transcript_id, parsed["summary_type"])
+    if summary is not None:
+        print(f"🎯 Found cached summary for {parsed['summary_type']}")
+    else:
+        # Generate new summary for this type
+        summary = summarize.get_summary(
+            parsed["summary_type"],
+            parsed["transcript"],
+            parsed["metadata"]["summary"],
+            parsed["metadata"]["show_title"],
+            parsed["metadata"]["show_summary"],
+            episode_title,
+            duration
+        )
+        # Only the new summary is written; the transcript blob is shared
+        CacheService.set_cached_summary(transcript_id, parsed["summary_type"], summary)
+        if not CacheService.has_cached_transcript(transcript_id):
+            transcript_data = {
+                "transcript": parsed["transcript"],
+                "metadata": parsed["metadata"],
+                "transcript_length": len(parsed["transcript"]),
+                "processing_time": parsed.get("processing_time", 0),
+                "file_path": parsed.get("file_path", "")
+            }
+            CacheService.set_cached_transcript(
+                parsed["transcript"],
+                transcript_data,
+                transcript_id
             )
-            for _, entries in messages:
-                for msg_id, data in entries:
-                    last_id = msg_id
-                    raw = data.get("data")
-                    if not raw:
-                        continue
-                    if isinstance(raw, bytes):
-                        raw = raw.decode()
-                    parsed = json.loads(raw)
+    # Cache the episode result
+    cached_at = None
+    if "platform" in parsed and "episode_id" in parsed:
+        episode_data = {
+            "summary": summary,
+            "metadata": parsed["metadata"],
+            "summary_type": parsed["summary_type"],
+            "transcript_length": len(parsed["transcript"]),
+            "processing_time": parsed.get("processing_time", 0),
+            "file_path": parsed.get("file_path", "")
+        }
+        CacheService.set_cached_episode(
+            parsed["platform"],
+            parsed["episode_id"],
+            parsed["summary_type"],
+            episode_data
+        )
+        # Try to get the cached episode to retrieve cached_at
+        cached_episode = CacheService.get_cached_episode(
+            parsed["platform"],
+            parsed["episode_id"],
+            parsed["summary_type"]
+        )
+        if cached_episode and "cached_at" in cached_episode:
+            cached_at = cached_episode["cached_at"]
+    return {
+        "job_id": parsed["job_id"],
+        "status": "done",
+        "summary": summary,
+        "cached_at": cached_at
+    }
 
-                    try:
-                        # Send immediate acknowledgement to frontend BEFORE any summary/caching work
-                        ack_payload = {
-                            "job_id": parsed["job_id"],
-                            "status": "summarization_received",
-                            "message": "Received for summarization. Generating summary..."
-                        }
-                        loop.call_soon_threadsafe(
-                            asyncio.create_task,
-                            manager.broadcast(parsed["job_id"], ack_payload)
-                        )
-                        # Now proceed with summary/caching logic
-                        # Extract episode title from metadata
-                        episode_title = None
-                        duration = None
-                        if "metadata" in parsed and parsed["metadata"]:
-                            episode_title = parsed["metadata"].get("episode_title")
-                            duration = parsed["metadata"].get("duration")
-                        
-                        # Check transcript-level cache first
-                        cached_transcript = CacheService.get_cached_transcript(parsed["transcript"])
-                        if cached_transcript:
-                            # Use cached transcript data - generate summary for the requested type
-                            print(f"🎯 Using cached transcript data for {parsed['summary_type']}")
-                            # Check if we already have this summary type cached
-                            if "summaries" in cached_transcript and parsed["summary_type"] in cached_transcript["summaries"]:
-                                summary = cached_transcript["summaries"][parsed["summary_type"]]
-                                print(f"🎯 Found cached summary for {parsed['summary_type']}")
-                            else:
-                                # Generate new summary for this type
-                                summary = summarize.get_summary(
-                                    parsed["summary_type"],
-                                    parsed["transcript"],
-                                    parsed["metadata"]["summary"],
-                                    parsed["metadata"]["show_title"],
-                                    parsed["metadata"]["show_summary"],
-                                    episode_title,
-                                    duration
-                                )
-                                # Update the cached transcript with the new summary type
-                                if "summaries" not in cached_transcript:
-                                    cached_transcript["summaries"] = {}
-                                cached_transcript["summaries"][parsed["summary_type"]] = summary
-                                # Update the cache with the new summary
-                                CacheService.set_cached_transcript(
-                                    parsed["transcript"],
-                                    cached_transcript
-                                )
-                        else:
-                            # Generate new summary
-                            summary = summarize.get_summary(
-                                parsed["summary_type"],
-                                parsed["transcript"],
-                                parsed["metadata"]["summary"],
-                                parsed["metadata"]["show_title"],
-                                parsed["metadata"]["show_summary"],
-                                episode_title,
-                                duration
-                            )
-                            # Cache the transcript data with the first summary
-                            transcript_data = {
-                                "transcript": parsed["transcript"],
-                                "metadata": parsed["metadata"],
-                                "transcript_length": len(parsed["transcript"]),
-                                "processing_time": parsed.get("processing_time", 0),
-                                "file_path": parsed.get("file_path", ""),
-                                "summaries": {
-                                    parsed["summary_type"]: summary
-                                }
-                            }
-                            CacheService.set_cached_transcript(
-                                parsed["transcript"],
-                                transcript_data
-                            )
-                        # Cache the episode result
-                        cached_at = None
-                        if "platform" in parsed and "episode_id" in parsed:
-                            episode_data = {
-                                "summary": summary,
-                                "metadata": parsed["metadata"],
-                                "summary_type": parsed["summary_type"],
-                                "transcript_length": len(parsed["transcript"]),
-                                "processing_time": parsed.get("processing_time", 0),
-                                "file_path": parsed.get("file_path", "")
-                            }
-                            CacheService.set_cached_episode(
-                                parsed["platform"],
-                                parsed["episode_id"],
-                                parsed["summary_type"],
-                                episode_data
-                            )
-                            # Try to get the cached episode to retrieve cached_at
-                            cached_episode = CacheService.get_cached_episode(
-                                parsed["platform"],
-                                parsed["episode_id"],
-                                parsed["summary_type"]
-                            )
-                            if cached_episode and "cached_at" in cached_episode:
-                                cached_at = cached_episode["cached_at"]
-                        payload = {
-                            "job_id": parsed["job_id"],
-                            "status": "done",
-                            "summary": summary,
-                            "cached_at": cached_at
-                        }
-                    except Exception as err:
-                        print("[Error] Failed to generate or cache summary:", err)
-                        payload = {
-                            "job_id": parsed.get("job_id", None),
-                            "status": "error",
-                            "error": str(err)
-                        }
-                    # schedule the async broadcast on the main loop
-                    loop.call_soon_threadsafe(
-                        asyncio.create_task,
-                        manager.broadcast(parsed["job_id"], payload)
-                    )
+def _handle_entry(loop, msg_id, data):
+    try:
+        raw = data.get("data")
+        if not raw:
+            return
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        parsed = json.loads(raw)
+        if "platform" in parsed and "episode_id" in parsed:
+            with _in_flight_lock:
+                _in_flight_jobs[msg_id] = (
+                    parsed["platform"], parsed["episode_id"], parsed["summary_type"], parsed["job_id"]
+                )
 
+        # Send immediate acknowledgement to frontend BEFORE any summary/caching work
+        ack_payload = {
+            "job_id": parsed["job_id"],
+            "status": "summarization_received",
+            "message": "Received for summarization. Generating summary..."
+        }
+        _send_update(loop, parsed["job_id"], ack_payload)
 
+        try:
+            payload = _summarize(parsed)
+        except Exception as err:
+            print("[Error] Failed to generate or cache summary:", err)
+            payload = {
+                "job_id": parsed.get("job_id", None),
+                "status": "error",
+                "error": str(err)
+            }
+        # Stored first so clients that attach or reconnect later still get it
+        CacheService.set_job_result(parsed["job_id"], payload)
+        _send_update(loop, parsed["job_id"], payload)
+        if "platform" in parsed and "episode_id" in parsed:
+            # New identical requests now hit the episode cache (or retry on error)
+            CacheService.release_inflight_job(
+                parsed["platform"], parsed["episode_id"], parsed["summary_type"], parsed["job_id"]
+            )
     except Exception as e:
-        print("Consumer error:", e)
+        print(f"❌ Failed to process {msg_id}: {e}")
+    finally:
+        # Ack only after the final update went out, so a crash mid-job
+        # leaves the message pending for another replica to reclaim
+        try:
+            redis_client.xack(TRANSCRIPTION_COMPLETE_STREAM, CONSUMER_GROUP, msg_id)
+        except Exception as e:
+            print(f"⚠️ Failed to ack {msg_id}: {e}")
+        with _in_flight_lock:
+            _in_flight.discard(msg_id)
+            _in_flight_jobs.pop(msg_id, None)
+        _slots.release()
+
+def _refresh_inflight_jobs():
+    with _in_flight_lock:
+        jobs = list(_in_flight_jobs.values())
+    CacheService.refresh_inflight_jobs(jobs)
+
+def consume_transcription_completed(loop):
+    ensure_consumer_group(TRANSCRIPTION_COMPLETE_STREAM, CONSUMER_GROUP)
+    print(f"🎧 Starting consumer {CONSUMER_NAME} in group {CONSUMER_GROUP} with {WORKER_COUNT} workers…")
+    consume_group(
+        TRANSCRIPTION_COMPLETE_STREAM, CONSUMER_GROUP, CONSUMER_NAME,
+        _slots, WORKER_COUNT, _in_flight, _in_flight_lock,
+        lambda msg_id, data: _executor.submit(_handle_entry, loop, msg_id, data),
+        CLAIM_MIN_IDLE_MS, CLAIM_INTERVAL_SECONDS, READ_BLOCK_MS, READ_ERROR_BACKOFF_SECONDS,
+        on_heartbeat=_refresh_inflight_jobs
+    )
 
 if __name__ == "__main__":
     consume_transcription_completed()
\ No newline at end of file
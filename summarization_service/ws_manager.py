@@ -1,4 +1,7 @@
 from fastapi import WebSocket, WebSocketDisconnect
+import asyncio, json, threading, time
+
+from redis_stream_client import redis_client, JOB_UPDATES_CHANNEL
 
 class ConnectionManager:
     def __init__(self):
@@ -26,5 +29,39 @@ class ConnectionManager:
             except Exception:
                 self.disconnect(job_id, ws)
 
+    def start_relay(self, loop):
+        """Deliver job updates published by any replica to sockets connected here"""
+        def _listen():
+            backoff = 1
+            while True:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(JOB_UPDATES_CHANNEL)
+                    print("👂 Relaying job updates to local WebSockets...")
+                    backoff = 1
+                    for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        update = json.loads(message["data"])
+                        # Replicas without a socket for this job just ignore it
+                        if update["job_id"] in self.active:
+                            asyncio.run_coroutine_threadsafe(
+                                self.broadcast(update["job_id"], update["payload"]),
+                                loop
+                            )
+                except Exception as e:
+                    print(f"⚠️ Job update relay error: {e}")
+                finally:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+        thread = threading.Thread(target=_listen, name="job-update-relay", daemon=True)
+        thread.start()
+        return thread
+
 # instantiate a single manager for import
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
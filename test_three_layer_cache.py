@@ -16,7 +16,7 @@ from pathlib import Path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from cache_service import CacheService
-from podcast_audio_resolver_service.audio_extractor import load_download_cache, save_download_cache
+from podcast_audio_resolver_service import download_index
 from redis_stream_client import redis_client
 # from transcription_service.audio_upload_consumer import AudioUploadConsumer
 
@@ -61,12 +61,11 @@ def test_three_layer_caching():
     print(f"\n🔍 Layer 2: Local File Cache Check")
     print("-" * 30)
     
-    # Load download cache
-    download_cache = load_download_cache()
+    # Look up the download index
     clean_url = audio_url.split('?')[0]
+    cached_file_info = download_index.get_download(clean_url)
     
-    if clean_url in download_cache:
-        cached_file_info = download_cache[clean_url]
+    if cached_file_info:
         cached_file_path = cached_file_info["file_path"]
         cached_file_hash = cached_file_info["file_hash"]
         
@@ -78,8 +77,7 @@ def test_three_layer_caching():
             file_hash = cached_file_hash
         else:
             print(f"⚠️ Cached file not found, removing from cache")
-            del download_cache[clean_url]
-            save_download_cache(download_cache)
+            download_index.remove_download(clean_url)
             file_path = None
             file_hash = None
     else:
@@ -147,13 +145,8 @@ def test_three_layer_caching():
     print(f"   ✅ Cached episode summary for key: {episode_cache_key}")
     
     # Cache local file info (if not already cached)
-    if clean_url not in download_cache:
-        download_cache[clean_url] = {
-            "file_path": file_path,
-            "file_hash": file_hash,
-            "episode_title": episode_title
-        }
-        save_download_cache(download_cache)
+    if not cached_file_info:
+        download_index.record_download(clean_url, file_path, file_hash, episode_title)
         print(f"   ✅ Cached local file info for URL: {clean_url}")
     
     print(f"\n🎉 Three-layer caching test completed!")
@@ -177,7 +170,7 @@ def show_cache_status():
         print(f"   ... and {len(episode_keys) - 3} more")
     
     # Local file cache status
-    download_cache = load_download_cache()
+    download_cache = download_index.list_downloads()
     print(f"\n📁 Local File Cache: {len(download_cache)} entries")
     for url, info in list(download_cache.items())[:3]:  # Show first 3
         file_exists = "✅" if os.path.exists(info["file_path"]) else "❌"
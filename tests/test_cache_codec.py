@@ -0,0 +1,48 @@
+import json
+import pytest
+import cache_codec
+
+
+class TestCacheCodec:
+    """Test suite for versioned cache payload codecs"""
+
+    def test_round_trip_small_payload_is_uncompressed(self):
+        """Test that small payloads skip zstd but keep a version byte"""
+        data = {"summary": "Short", "summaries": {"ts": "x"}}
+        payload = cache_codec.encode(data)
+        
+        assert payload[0] == cache_codec.CODEC_ORJSON
+        assert cache_codec.decode(payload) == data
+
+    def test_round_trip_large_payload_is_compressed(self):
+        """Test that large payloads are zstd-compressed"""
+        data = {"transcript": "[Speaker A] Hello there. " * 500}
+        payload = cache_codec.encode(data)
+        
+        assert payload[0] == cache_codec.CODEC_ORJSON_ZSTD
+        assert len(payload) < len(json.dumps(data))
+        assert cache_codec.decode(payload) == data
+
+    def test_decode_legacy_json(self):
+        """Test that plain JSON written before versioning still decodes"""
+        data = {"transcript": "Legacy", "cached_at": 1234567890}
+        
+        assert cache_codec.decode(json.dumps(data)) == data
+        assert cache_codec.decode(json.dumps(data).encode("utf-8")) == data
+
+    def test_register_codec(self):
+        """Test that custom codecs can be plugged in under a new version byte"""
+        cache_codec.register_codec(
+            42,
+            lambda data: json.dumps(data).encode("utf-8"),
+            lambda body: json.loads(body)
+        )
+        payload = cache_codec.encode({"a": 1}, version=42)
+        
+        assert payload[0] == 42
+        assert cache_codec.decode(payload) == {"a": 1}
+
+    def test_register_codec_rejects_json_prefix(self):
+        """Test that the legacy JSON prefix byte cannot be claimed by a codec"""
+        with pytest.raises(ValueError):
+            cache_codec.register_codec(ord("{"), json.dumps, json.loads)
@@ -6,6 +6,14 @@ from podcast_audio_resolver_service.main import app
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def run_jobs_inline():
+    """Run /submit background jobs synchronously so their effects can be asserted"""
+    with patch('podcast_audio_resolver_service.main._resolver_executor.submit',
+               side_effect=lambda fn, *args: fn(*args)):
+        yield
+
 class TestCacheEndpoints:
     """Test suite for cache-related API endpoints"""
 
@@ -164,7 +172,7 @@ class TestCacheEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert data["cached"] is False
-        assert "Download successful" in data["message"]
+        assert "Processing started" in data["message"]
         assert "platform" in data["data"]
         assert "episode_id" in data["data"]
         
@@ -199,9 +207,10 @@ class TestCacheEndpoints:
         })
         assert response.status_code == 422
 
+    @patch('podcast_audio_resolver_service.main.publish_job_update')
     @patch('cache_service.CacheService.get_cached_episode')
     @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_apple')
-    def test_submit_audio_extraction_error(self, mock_get_audio, mock_get_cached):
+    def test_submit_audio_extraction_error(self, mock_get_audio, mock_get_cached, mock_publish):
         """Test /submit endpoint when audio extraction fails"""
         mock_get_cached.return_value = None
         mock_get_audio.return_value = {"error": "Episode not found"}
@@ -211,10 +220,73 @@ class TestCacheEndpoints:
             "summary_type": "ts"
         })
         
+        # The request itself is accepted; the failure arrives over the WebSocket
+        assert response.status_code == 200
+        data = response.json()
+        assert data["error"] is False
+        job_id = data["data"]["job_id"]
+        statuses = [call[0][1]["status"] for call in mock_publish.call_args_list]
+        assert statuses == ["resolving", "error"]
+        assert mock_publish.call_args[0][0] == job_id
+        assert mock_publish.call_args[0][1]["error"] == "Episode not found"
+
+    @patch('cache_service.CacheService.get_job_data')
+    @patch('cache_service.CacheService.claim_inflight_job')
+    @patch('cache_service.CacheService.get_cached_episode')
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_apple')
+    @patch('podcast_audio_resolver_service.audio_upload_producer.emit_audio_uploaded')
+    def test_submit_attaches_to_inflight_job(self, mock_emit, mock_get_audio, mock_get_cached,
+                                            mock_claim, mock_get_job_data):
+        """Test /submit joins an identical in-flight request instead of reprocessing"""
+        mock_get_cached.return_value = None
+        mock_claim.return_value = "job-in-flight"
+        mock_get_job_data.return_value = {
+            "job_id": "job-in-flight",
+            "file_path": "audio_files/test.mp3",
+            "metadata": {"title": "Test Episode"}
+        }
+        
+        response = client.post("/submit", json={
+            "url": "https://podcasts.apple.com/us/podcast/episode?id=123456",
+            "summary_type": "ts"
+        })
+        
         assert response.status_code == 200
         data = response.json()
-        assert data["error"] is True
-        assert "Episode not found" in data["message"]
+        assert data["error"] is False
+        assert data["cached"] is False
+        assert data["data"]["job_id"] == "job-in-flight"
+        assert data["data"]["metadata"]["title"] == "Test Episode"
+        mock_claim.assert_called_once()
+        assert mock_claim.call_args[0][:3] == ("apple", "123456", "ts")
+        mock_get_audio.assert_not_called()
+        mock_emit.assert_not_called()
+
+    @patch('podcast_audio_resolver_service.main.publish_job_update')
+    @patch('cache_service.CacheService.set_job_result')
+    @patch('cache_service.CacheService.release_inflight_job')
+    @patch('cache_service.CacheService.claim_inflight_job')
+    @patch('cache_service.CacheService.get_cached_episode')
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_apple')
+    def test_submit_failure_releases_inflight_job(self, mock_get_audio, mock_get_cached, mock_claim,
+                                                  mock_release, mock_set_result, mock_publish):
+        """Test a failed /submit frees the episode and notifies attached requests"""
+        mock_get_cached.return_value = None
+        mock_claim.return_value = None
+        mock_get_audio.return_value = {"error": "Episode not found"}
+        
+        response = client.post("/submit", json={
+            "url": "https://podcasts.apple.com/us/podcast/episode?id=123456",
+            "summary_type": "ts"
+        })
+        
+        job_id = response.json()["data"]["job_id"]
+        assert mock_claim.call_args[0][3] == job_id
+        mock_release.assert_called_once_with("apple", "123456", "ts", job_id)
+        failure = mock_publish.call_args[0][1]
+        assert failure["status"] == "error"
+        assert failure["error"] == "Episode not found"
+        mock_set_result.assert_called_once_with(job_id, failure)
 
     def test_cache_endpoints_cors_headers(self):
         """Test that cache endpoints include proper CORS headers"""
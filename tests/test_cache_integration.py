@@ -9,6 +9,14 @@ from cache_service import CacheService
 
 client = TestClient(app)
 
+
+@pytest.fixture(autouse=True)
+def run_jobs_inline():
+    """Run /submit background jobs synchronously so their effects can be asserted"""
+    with patch('podcast_audio_resolver_service.main._resolver_executor.submit',
+               side_effect=lambda fn, *args: fn(*args)):
+        yield
+
 class TestCacheIntegration:
     """Integration tests for complete cache flow"""
 
@@ -40,7 +48,7 @@ class TestCacheIntegration:
         assert response.status_code == 200
         data = response.json()
         assert data["cached"] is False
-        assert "Download successful" in data["message"]
+        assert "Processing started" in data["message"]
         
         # Verify cache was checked
         mock_redis.get.assert_called_once_with("episode:apple:123456:ts")
@@ -60,8 +68,8 @@ class TestCacheIntegration:
             "file_path": "audio_files/test.mp3"
         }
         
-        # Mock cache storage
-        mock_redis.setex.return_value = True
+        # Mock cache storage (the write script)
+        mock_redis.eval.return_value = 1
         
         # Simulate cache storage
         CacheService.set_cached_episode(
@@ -104,8 +112,10 @@ class TestCacheIntegration:
         # Verify cache was checked again
         assert mock_redis.get.call_count == 2
 
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_spotify', return_value={"error": "offline"})
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_apple', return_value={"error": "offline"})
     @patch('cache_service.redis_client')
-    def test_cache_different_summary_types(self, mock_redis):
+    def test_cache_different_summary_types(self, mock_redis, mock_apple, mock_spotify):
         """Test that different summary types are cached separately"""
         
         # Mock cache miss for both types
@@ -124,13 +134,15 @@ class TestCacheIntegration:
         })
         
         # Verify different cache keys were used
-        calls = mock_redis.get.call_args_list
+        calls = [call for call in mock_redis.get.call_args_list if call[0][0].startswith("episode:")]
         assert len(calls) == 2
         assert calls[0][0][0] == "episode:apple:123456:bs"
         assert calls[1][0][0] == "episode:apple:123456:ts"
 
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_spotify', return_value={"error": "offline"})
+    @patch('podcast_audio_resolver_service.get_audio.get_episode_audio_from_apple', return_value={"error": "offline"})
     @patch('cache_service.redis_client')
-    def test_cache_platform_isolation(self, mock_redis):
+    def test_cache_platform_isolation(self, mock_redis, mock_apple, mock_spotify):
         """Test that different platforms are cached separately"""
         
         # Mock cache miss
@@ -149,7 +161,7 @@ class TestCacheIntegration:
         })
         
         # Verify different cache keys were used
-        calls = mock_redis.get.call_args_list
+        calls = [call for call in mock_redis.get.call_args_list if call[0][0].startswith("episode:")]
         assert len(calls) == 2
         assert calls[0][0][0] == "episode:apple:123456:ts"
         assert calls[1][0][0] == "episode:spotify:123456:ts"
@@ -182,7 +194,7 @@ class TestCacheIntegration:
         assert response.status_code == 200
         data = response.json()
         assert data["cached"] is False
-        assert "Download successful" in data["message"]
+        assert "Processing started" in data["message"]
         
         # Verify audio processing was triggered
         mock_get_audio.assert_called_once()
@@ -248,31 +260,15 @@ class TestCacheIntegration:
     def test_cache_stats_integration(self, mock_redis):
         """Test cache statistics integration"""
         
-        # Mock cache keys for episode, transcript, and file hash caches
-        episode_keys = [
-            "episode:apple:123:ts",
-            "episode:spotify:456:bs",
-            "episode:apple:789:ns"
-        ]
-        transcript_keys = [
-            "transcript:abc123",
-            "transcript:def456"
-        ]
-        file_hash_keys = [
-            "transcript:file:hash1",
-            "transcript:file:hash2"
-        ]
-        
-        def mock_keys(pattern):
-            if pattern == "episode:*":
-                return episode_keys
-            elif pattern == "transcript:*":
-                return transcript_keys + file_hash_keys
-            elif pattern == "transcript:file:*":
-                return file_hash_keys
-            return []
-        
-        mock_redis.keys.side_effect = mock_keys
+        # Mock live-entry counters for episode, transcript, and file hash caches
+        mock_redis.time.return_value = (int(time.time()), 0)
+        bucket = int(time.time() // CacheService.STATS_BUCKET_SECONDS)
+        mock_redis.hgetall.return_value = {
+            f"episode:{bucket + 100}": "3",
+            f"transcript:{bucket + 100}": "2",
+            f"file_hash:{bucket + 50}": "1",
+            f"file_hash:{bucket + 100}": "1"
+        }
         
         # Get cache stats
         response = client.get("/cache/stats")
@@ -280,16 +276,17 @@ class TestCacheIntegration:
         assert response.status_code == 200
         data = response.json()
         assert data["episode_cache_count"] == 3
-        assert data["transcript_cache_count"] == 4  # transcript_keys + file_hash_keys
+        assert data["transcript_cache_count"] == 4  # transcript + file hash entries
         assert data["file_hash_cache_count"] == 2
-        assert data["total_cached_items"] == 7  # episode_keys + transcript_keys + file_hash_keys
+        assert data["total_cached_items"] == 7  # episode + transcript + file hash entries
+        mock_redis.keys.assert_not_called()
 
     @patch('cache_service.redis_client')
     def test_cache_invalidation_integration(self, mock_redis):
         """Test cache invalidation integration"""
         
         # Mock successful invalidation
-        mock_redis.delete.return_value = 1
+        mock_redis.eval.return_value = 1
         
         # Invalidate specific episode
         response = client.delete("/cache/invalidate/apple/123456/ts")
@@ -299,7 +296,8 @@ class TestCacheIntegration:
         assert data["success"] is True
         
         # Verify correct key was deleted
-        mock_redis.delete.assert_called_once_with("episode:apple:123456:ts")
+        mock_redis.eval.assert_called_once()
+        assert mock_redis.eval.call_args[0][3] == "episode:apple:123456:ts"
 
     @patch('cache_service.redis_client')
     def test_cache_clear_admin_integration(self, mock_redis):
@@ -309,15 +307,15 @@ class TestCacheIntegration:
         episode_keys = ["episode:apple:123:ts", "episode:spotify:456:bs"]
         transcript_keys = ["transcript:abc123", "transcript:def456"]
         
-        def mock_keys(pattern):
-            if pattern == "episode:*":
-                return episode_keys
-            elif pattern == "transcript:*":
-                return transcript_keys
-            return []
+        def mock_scan_iter(match=None, count=None):
+            if match == "episode:*":
+                return iter(episode_keys)
+            elif match == "transcript:*":
+                return iter(transcript_keys)
+            return iter([])
         
-        mock_redis.keys.side_effect = mock_keys
-        mock_redis.delete.return_value = 1
+        mock_redis.scan_iter.side_effect = mock_scan_iter
+        mock_redis.eval.side_effect = lambda script, numkeys, *args: numkeys - 1
         
         # Clear cache with admin key
         response = client.delete("/cache/clear?admin_key=default-admin-key")
@@ -326,9 +324,10 @@ class TestCacheIntegration:
         data = response.json()
         assert data["success"] is True
         
-        # Verify both episode and transcript keys were checked and deleted
-        assert mock_redis.keys.call_count == 2
-        assert mock_redis.delete.call_count == 2
+        # Verify both episode and transcript keys were scanned and unlinked
+        assert mock_redis.scan_iter.call_count == 2
+        assert mock_redis.eval.call_count == 2
+        mock_redis.keys.assert_not_called()
 
     def test_cache_key_generation_consistency(self):
         """Test that cache keys are generated consistently"""
@@ -389,7 +388,7 @@ class TestCacheIntegration:
         assert (end_time - start_time) < 0.01
         assert result is not None
 
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_transcript_cache_integration(self, mock_redis):
         """Test transcript cache integration"""
         
@@ -401,7 +400,7 @@ class TestCacheIntegration:
                 "bs": "Cached transcript summary for bs"
             }
         }
-        mock_redis.get.side_effect = [None, json.dumps(cached_data)]
+        mock_redis.mget.side_effect = [[None, None, None, None], [json.dumps(cached_data), None, None, None]]
         
         # Test transcript cache miss
         transcript = "This is a test transcript content"
@@ -417,6 +416,6 @@ class TestCacheIntegration:
         
         # Verify correct keys were used
         expected_key = f"transcript:{CacheService._generate_transcript_hash(transcript)}"
-        assert mock_redis.get.call_count == 2
-        assert mock_redis.get.call_args_list[0][0][0] == expected_key
-        assert mock_redis.get.call_args_list[1][0][0] == expected_key 
\ No newline at end of file
+        assert mock_redis.mget.call_count == 2
+        assert mock_redis.mget.call_args_list[0][0][0][0] == expected_key
+        assert mock_redis.mget.call_args_list[1][0][0][0] == expected_key 
\ No newline at end of file
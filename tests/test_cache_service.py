@@ -2,7 +2,16 @@ import pytest
 import json
 import time
 from unittest.mock import patch, MagicMock
-from cache_service import CacheService
+import cache_codec
+from cache_service import CacheService, LocalCache
+
+def _entry_writes(mock_redis):
+    """(key, ttl, payload) of every entry written through the write script"""
+    return [
+        (call[0][3], call[0][7], call[0][6])
+        for call in mock_redis.eval.call_args_list
+        if call[0][0] == CacheService._WRITE_ENTRY_SCRIPT
+    ]
 
 class TestCacheService:
     """Test suite for CacheService"""
@@ -97,15 +106,14 @@ class TestCacheService:
         result = CacheService.set_cached_episode("apple", "123456", "ts", episode_data)
         
         assert result is True
-        mock_redis.setex.assert_called_once()
+        (key, ttl, payload), = _entry_writes(mock_redis)
         
         # Verify the call arguments
-        call_args = mock_redis.setex.call_args
-        assert call_args[0][0] == "episode:apple:123456:ts"  # key
-        assert call_args[0][1] == CacheService.EPISODE_CACHE_TTL  # ttl
+        assert key == "episode:apple:123456:ts"
+        assert ttl == CacheService.EPISODE_CACHE_TTL
         
         # Verify the cached data includes additional fields
-        cached_data = json.loads(call_args[0][2])
+        cached_data = json.loads(payload)
         assert "summary" in cached_data
         assert "metadata" in cached_data
         assert "cached_at" in cached_data
@@ -114,7 +122,7 @@ class TestCacheService:
     @patch('cache_service.redis_client')
     def test_set_cached_episode_error(self, mock_redis):
         """Test cache storage with Redis error"""
-        mock_redis.setex.side_effect = Exception("Redis connection error")
+        mock_redis.eval.side_effect = Exception("Redis connection error")
         
         episode_data = {"summary": "Test summary"}
         result = CacheService.set_cached_episode("apple", "123456", "ts", episode_data)
@@ -124,27 +132,32 @@ class TestCacheService:
     @patch('cache_service.redis_client')
     def test_invalidate_specific_episode_success(self, mock_redis):
         """Test successful episode cache invalidation"""
-        mock_redis.delete.return_value = 1
+        mock_redis.eval.return_value = 1
         
         result = CacheService.invalidate_specific_episode("apple", "123456", "ts")
         
         assert result is True
-        mock_redis.delete.assert_called_once_with("episode:apple:123456:ts")
+        # The delete script also decrements the live-entry counter
+        args = mock_redis.eval.call_args[0]
+        assert args[0] == CacheService._DELETE_ENTRIES_SCRIPT
+        assert args[1:] == (
+            2, CacheService.STATS_KEY, "episode:apple:123456:ts", CacheService.STATS_BUCKET_SECONDS, "episode"
+        )
 
     @patch('cache_service.redis_client')
     def test_invalidate_specific_episode_not_found(self, mock_redis):
         """Test episode cache invalidation when key doesn't exist"""
-        mock_redis.delete.return_value = 0
+        mock_redis.eval.return_value = 0
         
         result = CacheService.invalidate_specific_episode("apple", "123456", "ts")
         
         assert result is False
-        mock_redis.delete.assert_called_once_with("episode:apple:123456:ts")
+        assert mock_redis.eval.call_args[0][3] == "episode:apple:123456:ts"
 
     @patch('cache_service.redis_client')
     def test_invalidate_specific_episode_error(self, mock_redis):
         """Test episode cache invalidation with Redis error"""
-        mock_redis.delete.side_effect = Exception("Redis connection error")
+        mock_redis.eval.side_effect = Exception("Redis connection error")
         
         result = CacheService.invalidate_specific_episode("apple", "123456", "ts")
         
@@ -153,85 +166,135 @@ class TestCacheService:
     @patch('cache_service.redis_client')
     def test_get_cache_stats_success(self, mock_redis):
         """Test successful cache statistics retrieval"""
-        # Mock keys for different cache entries
-        episode_keys = [
-            "episode:apple:123:ts",
-            "episode:spotify:456:bs",
-            "episode:apple:789:ns"
-        ]
-        transcript_keys = [
-            "transcript:abc123:ts",
-            "transcript:def456:bs"
-        ]
-        
-        # Mock keys method to return different results for different prefixes
-        def mock_keys(pattern):
-            if pattern == "episode:*":
-                return episode_keys
-            elif pattern == "transcript:*":
-                return transcript_keys
-            return []
-        
-        mock_redis.keys.side_effect = mock_keys
+        mock_redis.time.return_value = (int(time.time()), 0)
+        bucket = int(time.time() // CacheService.STATS_BUCKET_SECONDS)
+        mock_redis.hgetall.return_value = {
+            f"episode:{bucket + 10}": "2",
+            f"episode:{bucket + 20}": "1",
+            f"transcript:{bucket + 10}": "2",
+            f"file_hash:{bucket + 5}": "1"
+        }
         
         stats = CacheService.get_cache_stats()
         
         expected_stats = {
             "episode_cache_count": 3,
-            "transcript_cache_count": 2,
-            "file_hash_cache_count": 0,
-            "total_cached_items": 5
+            "transcript_cache_count": 3,
+            "file_hash_cache_count": 1,
+            "summary_cache_count": 0,
+            "total_cached_items": 6
         }
         assert stats == expected_stats
-        # Verify all three patterns were checked
-        assert mock_redis.keys.call_count == 3
+        # Stats come from the counter hash, never from a keyspace walk
+        mock_redis.hgetall.assert_called_once_with(CacheService.STATS_KEY)
+        mock_redis.keys.assert_not_called()
+        mock_redis.scan_iter.assert_not_called()
+
+    @patch('cache_service.redis_client')
+    def test_get_cache_stats_prunes_expired_buckets(self, mock_redis):
+        """Test that counters for already-expired entries are dropped"""
+        # Buckets are aged by the Redis clock, not this process's
+        server_now = int(time.time()) + 3 * CacheService.STATS_BUCKET_SECONDS
+        mock_redis.time.return_value = (server_now, 0)
+        bucket = server_now // CacheService.STATS_BUCKET_SECONDS
+        mock_redis.hgetall.return_value = {
+            f"episode:{bucket - 1}": "4",
+            f"episode:{bucket + 1}": "1"
+        }
+        
+        stats = CacheService.get_cache_stats()
+        
+        assert stats["episode_cache_count"] == 1
+        mock_redis.hdel.assert_called_once_with(CacheService.STATS_KEY, f"episode:{bucket - 1}")
 
     @patch('cache_service.redis_client')
     def test_get_cache_stats_error(self, mock_redis):
         """Test cache statistics retrieval with Redis error"""
-        mock_redis.keys.side_effect = Exception("Redis connection error")
+        mock_redis.hgetall.side_effect = Exception("Redis connection error")
         
         stats = CacheService.get_cache_stats()
         
         assert "error" in stats
 
+    @patch('cache_service.redis_client')
+    def test_set_cached_episode_updates_counters(self, mock_redis):
+        """Test that an entry and its tier counter are written by one script"""
+        CacheService.set_cached_episode("apple", "123456", "ts", {"summary": "Test summary"})
+        
+        mock_redis.eval.assert_called_once()
+        args = mock_redis.eval.call_args[0]
+        assert args[0] == CacheService._WRITE_ENTRY_SCRIPT
+        assert args[1:6] == (
+            2, CacheService.STATS_KEY, "episode:apple:123456:ts", CacheService.STATS_BUCKET_SECONDS, "episode"
+        )
+
+    def test_stats_tier_matches_write_tiers(self):
+        """Test that clears decrement the tier each key was written under"""
+        assert CacheService._stats_tier("episode:apple:123456:ts") == "episode"
+        assert CacheService._stats_tier(f"transcript:{'a' * 64}") == "transcript"
+        assert CacheService._stats_tier("transcript:file:abc") == "file_hash"
+        assert CacheService._stats_tier(f"transcript:summary:{'a' * 64}:ts") == "summary"
+        assert CacheService._stats_tier("transcript:fingerprint:abc") == ""
+        assert CacheService._stats_tier("transcript:fingerprint:band:1:3-4") == ""
+
     @patch('cache_service.redis_client')
     def test_clear_cache_success(self, mock_redis):
         """Test successful cache clearing"""
         episode_keys = ["episode:apple:123:ts", "episode:spotify:456:bs"]
         transcript_keys = ["transcript:abc123:ts"]
         
-        def mock_keys(pattern):
-            if pattern == "episode:*":
-                return episode_keys
-            elif pattern == "transcript:*":
-                return transcript_keys
-            return []
+        def mock_scan_iter(match=None, count=None):
+            if match == "episode:*":
+                return iter(episode_keys)
+            elif match == "transcript:*":
+                return iter(transcript_keys)
+            return iter([])
+        
+        mock_redis.scan_iter.side_effect = mock_scan_iter
+        mock_redis.eval.side_effect = lambda script, numkeys, *args: numkeys - 1
+        
+        result = CacheService.clear_cache()
+        
+        assert result is True
+        assert mock_redis.scan_iter.call_count == 2  # Called for both episode and transcript
+        assert mock_redis.eval.call_count == 2  # One batch each for episode and transcript
+        mock_redis.keys.assert_not_called()
+        # Each unlinked entry takes back its own count; the stats are never reset
+        mock_redis.delete.assert_not_called()
+
+    @patch('cache_service.redis_client')
+    def test_clear_cache_deletes_in_bounded_batches(self, mock_redis):
+        """Test that large keyspaces are unlinked in chunks of CLEAR_BATCH_SIZE"""
+        batch_size = CacheService.CLEAR_BATCH_SIZE
+        episode_keys = [f"episode:apple:{i}:ts" for i in range(batch_size * 2 + 1)]
+        
+        def mock_scan_iter(match=None, count=None):
+            return iter(episode_keys if match == "episode:*" else [])
         
-        mock_redis.keys.side_effect = mock_keys
-        mock_redis.delete.return_value = 1
+        mock_redis.scan_iter.side_effect = mock_scan_iter
+        mock_redis.eval.side_effect = lambda script, numkeys, *args: numkeys - 1
         
         result = CacheService.clear_cache()
         
         assert result is True
-        assert mock_redis.keys.call_count == 2  # Called for both episode and transcript
-        assert mock_redis.delete.call_count == 2  # Called for both episode and transcript
+        batch_sizes = [call[0][1] - 1 for call in mock_redis.eval.call_args_list]
+        assert batch_sizes == [batch_size, batch_size, 1]
 
     @patch('cache_service.redis_client')
     def test_clear_cache_empty(self, mock_redis):
         """Test cache clearing when cache is empty"""
-        mock_redis.keys.return_value = []
+        mock_redis.scan_iter.return_value = iter([])
         
         result = CacheService.clear_cache()
         
         assert result is True
-        assert mock_redis.keys.call_count == 2  # Called for both episode and transcript
-        mock_redis.delete.assert_not_called()
+        assert mock_redis.scan_iter.call_count == 2  # Called for both episode and transcript
+        mock_redis.eval.assert_not_called()
 
     @patch('cache_service.redis_client')
     def test_clear_cache_error(self, mock_redis):
         """Test cache clearing with Redis error"""
-        mock_redis.keys.side_effect = Exception("Redis connection error")
+        mock_redis.scan_iter.side_effect = Exception("Redis connection error")
         
         result = CacheService.clear_cache()
         
@@ -260,8 +323,8 @@ class TestCacheService:
         CacheService.set_cached_episode("apple", "123456", "ts", episode_data)
         
         # Get the cached data that was stored
-        call_args = mock_redis.setex.call_args
-        cached_data = json.loads(call_args[0][2])
+        (_, _, payload), = _entry_writes(mock_redis)
+        cached_data = json.loads(payload)
         
         # Verify all required fields are present
         assert "summary" in cached_data
@@ -277,7 +340,7 @@ class TestCacheService:
         assert cached_data["cache_ttl"] == CacheService.EPISODE_CACHE_TTL
 
     # Transcript Cache Tests
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_get_cached_transcript_success(self, mock_redis):
         """Test successful transcript cache retrieval"""
         transcript = "This is a test transcript content"
@@ -293,29 +356,43 @@ class TestCacheService:
             "transcript_hash": "abc123"
         }
         
-        mock_redis.get.return_value = json.dumps(cached_data)
+        # Legacy blob with embedded summaries, plus one per-type summary key
+        mock_redis.mget.return_value = [
+            json.dumps(cached_data),
+            None,
+            cache_codec.encode("Cached summary for ns"),
+            None
+        ]
         
         result = CacheService.get_cached_transcript(transcript)
         
-        assert result == cached_data
-        # Verify correct key was used
-        expected_key = f"transcript:{CacheService._generate_transcript_hash(transcript)}"
-        mock_redis.get.assert_called_once_with(expected_key)
-
-    @patch('cache_service.redis_client')
+        assert result == {
+            **cached_data,
+            "summaries": {**cached_data["summaries"], "ns": "Cached summary for ns"}
+        }
+        # Verify the blob and every summary type were fetched in one call
+        transcript_hash = CacheService._generate_transcript_hash(transcript)
+        mock_redis.mget.assert_called_once_with([
+            f"transcript:{transcript_hash}",
+            f"transcript:summary:{transcript_hash}:ts",
+            f"transcript:summary:{transcript_hash}:ns",
+            f"transcript:summary:{transcript_hash}:bs"
+        ])
+
+    @patch('cache_service.redis_binary_client')
     def test_get_cached_transcript_miss(self, mock_redis):
         """Test transcript cache miss"""
         transcript = "This is a test transcript content"
         
-        mock_redis.get.return_value = None
+        mock_redis.mget.return_value = [None, None, None, None]
         
         result = CacheService.get_cached_transcript(transcript)
         
         assert result is None
         expected_key = f"transcript:{CacheService._generate_transcript_hash(transcript)}"
-        mock_redis.get.assert_called_once_with(expected_key)
+        assert mock_redis.mget.call_args[0][0][0] == expected_key
 
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_set_cached_transcript_success(self, mock_redis):
         """Test successful transcript cache storage"""
         transcript = "This is a test transcript content"
@@ -331,23 +408,30 @@ class TestCacheService:
         result = CacheService.set_cached_transcript(transcript, data)
         
         assert result is True
-        expected_key = f"transcript:{CacheService._generate_transcript_hash(transcript)}"
-        mock_redis.setex.assert_called_once()
+        transcript_hash = CacheService._generate_transcript_hash(transcript)
+        expected_key = f"transcript:{transcript_hash}"
+        writes = _entry_writes(mock_redis)
+        assert len(writes) == 2  # transcript blob + one summary
         
         # Verify the stored data
-        call_args = mock_redis.setex.call_args
-        assert call_args[0][0] == expected_key
-        assert call_args[0][1] == CacheService.TRANSCRIPT_CACHE_TTL
+        key, ttl, payload = writes[0]
+        assert key == expected_key
+        assert ttl == CacheService.TRANSCRIPT_CACHE_TTL
         
-        stored_data = json.loads(call_args[0][2])
+        stored_data = cache_codec.decode(payload)
         assert stored_data["transcript"] == transcript
         assert stored_data["metadata"] == data["metadata"]
-        assert stored_data["summaries"] == data["summaries"]
+        assert "summaries" not in stored_data
         assert stored_data["transcript_hash"] == CacheService._generate_transcript_hash(transcript)
         assert "cached_at" in stored_data
         assert stored_data["cache_ttl"] == CacheService.TRANSCRIPT_CACHE_TTL
+        
+        # Summaries live under their own per-type keys
+        summary_key, _, summary_payload = writes[1]
+        assert summary_key == f"transcript:summary:{transcript_hash}:ts"
+        assert cache_codec.decode(summary_payload) == "Test summary for ts"
 
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_set_cached_transcript_error(self, mock_redis):
         """Test transcript cache storage with Redis error"""
         transcript = "This is a test transcript content"
@@ -356,31 +440,33 @@ class TestCacheService:
             "summaries": {"ts": "Test summary"}
         }
         
-        mock_redis.setex.side_effect = Exception("Redis connection error")
+        mock_redis.eval.side_effect = Exception("Redis connection error")
         
         result = CacheService.set_cached_transcript(transcript, data)
         
         assert result is False
 
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_invalidate_specific_transcript_success(self, mock_redis):
         """Test successful transcript cache invalidation"""
         transcript = "This is a test transcript content"
         
-        mock_redis.delete.return_value = 1
+        mock_redis.eval.return_value = 1
         
         result = CacheService.invalidate_specific_transcript(transcript)
         
         assert result is True
-        expected_key = f"transcript:{CacheService._generate_transcript_hash(transcript)}"
-        mock_redis.delete.assert_called_once_with(expected_key)
+        transcript_hash = CacheService._generate_transcript_hash(transcript)
+        deleted = [call[0][3] for call in mock_redis.eval.call_args_list]
+        assert f"transcript:{transcript_hash}" in deleted
+        assert f"transcript:summary:{transcript_hash}:ts" in deleted
 
-    @patch('cache_service.redis_client')
+    @patch('cache_service.redis_binary_client')
     def test_invalidate_specific_transcript_not_found(self, mock_redis):
         """Test transcript cache invalidation when key doesn't exist"""
         transcript = "This is a test transcript content"
         
-        mock_redis.delete.return_value = 0
+        mock_redis.eval.return_value = 0
         
         result = CacheService.invalidate_specific_transcript(transcript)
         
@@ -408,4 +494,276 @@ class TestCacheService:
         key = CacheService._generate_transcript_key(transcript_hash)
         
         assert key == f"transcript:{transcript_hash}"
-        assert key.startswith("transcript:") 
\ No newline at end of file
+        assert key.startswith("transcript:") 
+
+    # L1 (in-process) Cache Tests
+    def test_local_cache_evicts_least_recently_used_over_byte_budget(self):
+        """Test that the L1 cache stays within its byte budget"""
+        cache = LocalCache(max_bytes=100, ttl=60)
+        cache.put("a", {"v": 1}, 40)
+        cache.put("b", {"v": 2}, 40)
+        cache.get("a")  # "b" is now least recently used
+        cache.put("c", {"v": 3}, 40)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+        assert cache.get("c") == {"v": 3}
+        assert cache.size_bytes == 80
+
+    def test_local_cache_expires_entries(self):
+        """Test that L1 entries expire after their TTL"""
+        cache = LocalCache(max_bytes=100, ttl=0)
+        cache.put("a", {"v": 1}, 10)
+        
+        assert cache.get("a") is None
+        assert cache.size_bytes == 0
+
+    def test_local_cache_drops_fill_that_raced_an_invalidation(self):
+        """Test that a stale Redis read cannot repopulate L1 after an invalidation"""
+        cache = LocalCache(max_bytes=100, ttl=60)
+        generation = cache.generation
+        cache.discard("a")
+        cache.put("a", {"v": "stale"}, 10, generation)
+        
+        assert cache.get("a") is None
+
+    @patch('cache_service.redis_client')
+    def test_get_cached_episode_served_from_l1(self, mock_redis):
+        """Test that repeat lookups of a hot episode skip Redis"""
+        cached_data = {"summary": "Test summary"}
+        mock_redis.get.return_value = json.dumps(cached_data)
+        tier_stats = {"l1": {"hits": 0, "misses": 0}, "redis": {"hits": 0, "misses": 0}}
+        
+        with patch.object(CacheService, "_l1", LocalCache(1024, 60)), \
+             patch.object(CacheService, "_l1_enabled", True), \
+             patch.object(CacheService, "_tier_stats", tier_stats):
+            first = CacheService.get_cached_episode("apple", "123456", "ts")
+            first["platform"] = "apple"  # callers enrich results in place
+            second = CacheService.get_cached_episode("apple", "123456", "ts")
+            stats = CacheService.get_tier_stats()
+        
+        assert second == cached_data
+        mock_redis.get.assert_called_once_with("episode:apple:123456:ts")
+        assert stats["l1"]["hits"] == 1
+        assert stats["l1"]["misses"] == 1
+        assert stats["redis"]["hits"] == 1
+
+    @patch('cache_service.redis_client')
+    def test_l1_bypassed_without_invalidation_listener(self, mock_redis):
+        """Test that L1 is not used until the process receives invalidations"""
+        mock_redis.get.return_value = json.dumps({"summary": "Test summary"})
+        
+        with patch.object(CacheService, "_l1", LocalCache(1024, 60)) as l1:
+            CacheService.get_cached_episode("apple", "123456", "ts")
+            CacheService.get_cached_episode("apple", "123456", "ts")
+            assert len(l1) == 0
+        
+        assert mock_redis.get.call_count == 2
+
+    @patch('cache_service.redis_client')
+    def test_episode_writes_publish_invalidation(self, mock_redis):
+        """Test that episode writes and invalidations notify other processes"""
+        mock_redis.eval.return_value = 1
+        
+        CacheService.set_cached_episode("apple", "123456", "ts", {"summary": "Test summary"})
+        CacheService.invalidate_specific_episode("apple", "123456", "ts")
+        
+        published = [call[0] for call in mock_redis.publish.call_args_list]
+        assert published == [
+            (CacheService.INVALIDATION_CHANNEL, "episode:apple:123456:ts"),
+            (CacheService.INVALIDATION_CHANNEL, "episode:apple:123456:ts")
+        ]
+
+    def test_handle_invalidation_evicts_l1(self):
+        """Test that invalidation messages evict single keys or everything"""
+        with patch.object(CacheService, "_l1", LocalCache(1024, 60)) as l1:
+            l1.put("episode:apple:1:ts", {"v": 1}, 10)
+            l1.put("episode:apple:2:ts", {"v": 2}, 10)
+            
+            CacheService._handle_invalidation("episode:apple:1:ts")
+            assert l1.get("episode:apple:1:ts") is None
+            assert l1.get("episode:apple:2:ts") == {"v": 2}
+            
+            CacheService._handle_invalidation(CacheService.INVALIDATE_ALL)
+            assert len(l1) == 0
+
+    @patch('cache_service.redis_binary_client')
+    def test_set_cached_transcript_uses_binary_codec(self, mock_redis):
+        """Test that transcripts are stored as versioned, compressed payloads"""
+        transcript = "[Speaker A] " + "This is a long test transcript. " * 200
+        CacheService.set_cached_transcript(transcript, {"transcript": transcript, "summaries": {}})
+        
+        (_, _, payload), = _entry_writes(mock_redis)
+        assert isinstance(payload, bytes)
+        assert payload[0] == cache_codec.CODEC_ORJSON_ZSTD
+        assert len(payload) < len(transcript)
+
+    @patch('cache_service.redis_binary_client')
+    def test_get_cached_transcript_by_hash_decodes_legacy_json(self, mock_redis):
+        """Test that entries written as plain JSON before the codec layer still load"""
+        cached_data = {"transcript": "Legacy transcript", "summaries": {}}
+        mock_redis.get.return_value = json.dumps(cached_data).encode("utf-8")
+        
+        result = CacheService.get_cached_transcript_by_hash("abc123")
+        
+        assert result == cached_data
+        mock_redis.get.assert_called_once_with("transcript:file:abc123")
+
+    @patch('cache_service.redis_binary_client')
+    def test_set_cached_transcript_by_hash_writes_index(self, mock_redis):
+        """Test that the file hash key only stores the transcript id"""
+        transcript = "This is a test transcript content"
+        result = CacheService.set_cached_transcript_by_hash("abc123", {"transcript": transcript, "summaries": {}})
+        
+        assert result is True
+        transcript_id = CacheService.get_transcript_id(transcript)
+        writes = {key: payload for key, _, payload in _entry_writes(mock_redis)}
+        assert set(writes) == {f"transcript:{transcript_id}", "transcript:file:abc123"}
+        assert writes["transcript:file:abc123"] == transcript_id
+        assert cache_codec.decode(writes[f"transcript:{transcript_id}"])["file_hash"] == "abc123"
+
+    @patch('cache_service.redis_binary_client')
+    def test_link_file_hash_to_transcript_only_writes_index(self, mock_redis):
+        """Test that linking another file hash leaves the shared transcript blob alone"""
+        assert CacheService.link_file_hash_to_transcript("def456", "f" * 64) is True
+        
+        writes = {key: payload for key, _, payload in _entry_writes(mock_redis)}
+        assert writes == {"transcript:file:def456": "f" * 64}
+
+    @patch('cache_service.redis_binary_client')
+    def test_get_cached_transcript_by_hash_follows_index(self, mock_redis):
+        """Test that a file hash lookup resolves the content-addressed blob"""
+        transcript = "This is a test transcript content"
+        transcript_id = CacheService.get_transcript_id(transcript)
+        blob = cache_codec.encode({"transcript": transcript})
+        mock_redis.get.side_effect = [transcript_id.encode("ascii"), blob]
+        
+        result = CacheService.get_cached_transcript_by_hash("abc123")
+        
+        assert result == {"transcript": transcript}
+        assert [call[0][0] for call in mock_redis.get.call_args_list] == [
+            "transcript:file:abc123",
+            f"transcript:{transcript_id}"
+        ]
+
+    @patch('cache_service.redis_binary_client')
+    def test_set_cached_summary_writes_only_summary(self, mock_redis):
+        """Test that adding a summary type does not rewrite the transcript"""
+        result = CacheService.set_cached_summary("a" * 64, "ns", "Narrative summary")
+        
+        assert result is True
+        (key, _, _), = _entry_writes(mock_redis)
+        assert key == f"transcript:summary:{'a' * 64}:ns"
+
+    @patch('cache_service.redis_binary_client')
+    def test_get_cached_summary(self, mock_redis):
+        """Test per-type summary lookup"""
+        mock_redis.get.return_value = cache_codec.encode("Narrative summary")
+        
+        assert CacheService.get_cached_summary("a" * 64, "ns") == "Narrative summary"
+        mock_redis.get.assert_called_once_with(f"transcript:summary:{'a' * 64}:ns")
+
+    @patch('cache_service.redis_client')
+    def test_claim_inflight_job_first_request_owns_episode(self, mock_redis):
+        """Test that the first request for an episode becomes the in-flight job"""
+        mock_redis.set.return_value = True
+        
+        assert CacheService.claim_inflight_job("apple", "123", "ts", "job-1") is None
+        mock_redis.set.assert_called_once_with(
+            "inflight:apple:123:ts", "job-1", nx=True, ex=CacheService.INFLIGHT_JOB_TTL
+        )
+
+    @patch('cache_service.redis_client')
+    def test_claim_inflight_job_returns_existing_job(self, mock_redis):
+        """Test that identical requests get the in-flight job_id"""
+        mock_redis.set.return_value = None
+        mock_redis.get.return_value = "job-1"
+        
+        assert CacheService.claim_inflight_job("apple", "123", "ts", "job-2") == "job-1"
+
+    @patch('cache_service.redis_client')
+    def test_release_inflight_job_only_deletes_own_key(self, mock_redis):
+        """Test that release is a compare-and-delete on the job_id"""
+        mock_redis.eval.return_value = 0
+        
+        assert CacheService.release_inflight_job("apple", "123", "ts", "job-2") is False
+        mock_redis.eval.assert_called_once_with(
+            CacheService._RELEASE_INFLIGHT_SCRIPT, 1, "inflight:apple:123:ts", "job-2"
+        )
+
+    @patch('cache_service.redis_client')
+    def test_inflight_file_paths(self, mock_redis):
+        """Test that in-flight jobs are mapped to the audio files they use"""
+        mock_redis.scan_iter.return_value = iter(["inflight:apple:1:ts", "inflight:apple:2:ts"])
+        mock_redis.mget.side_effect = [
+            ["job-1", "job-2"],
+            [json.dumps({"file_path": "audio_files/store/ab/abc.mp3"}), None]
+        ]
+        
+        assert CacheService.get_inflight_file_paths() == {"audio_files/store/ab/abc.mp3"}
+        mock_redis.mget.assert_called_with(["job:job-1:data", "job:job-2:data"])
+        
+        mock_redis.scan_iter.side_effect = Exception("connection refused")
+        assert CacheService.get_inflight_file_paths() is None
+
+    @patch('cache_service.redis_binary_client')
+    @patch('cache_service.redis_client')
+    def test_audio_fingerprint_candidates_ranked_by_shared_bands(self, mock_redis, mock_binary_redis):
+        """Test that fingerprints sharing the most bands are returned first, decoded"""
+        assert CacheService.set_audio_fingerprint("abc", "t" * 64, [1, 2, 3], ["0:1-2", "1:3-4"]) is True
+        payload = mock_binary_redis.setex.call_args[0][2]
+        mock_redis.pipeline.return_value.sadd.assert_any_call("transcript:fingerprint:band:1:3-4", "abc")
+        
+        mock_redis.pipeline.return_value.execute.return_value = [{"abc", "def"}, {"abc"}]
+        mock_binary_redis.mget.return_value = [payload]
+        candidates = CacheService.get_audio_fingerprint_candidates(["0:1-2", "1:3-4"], limit=1)
+        
+        mock_binary_redis.mget.assert_called_once_with(["transcript:fingerprint:abc"])
+        assert candidates == {"abc": {"transcript_id": "t" * 64, "items": [1, 2, 3]}}
+
+    @patch('cache_service.redis_binary_client')
+    def test_rss_feed_round_trip(self, mock_redis):
+        """Test that feed indexes are stored compressed with their validators"""
+        pipe = mock_redis.pipeline.return_value
+        index = {"version": 1, "entries": [{"title": "Episode", "summary": "x" * 5000}]}
+        
+        assert CacheService.set_cached_rss_feed("http://example.com/feed.xml", index, etag='"v1"') is True
+        (meta_key, meta), (index_key, payload) = [
+            (call[0][0], call[0][2]) for call in pipe.setex.call_args_list
+        ]
+        assert meta_key.endswith(":meta") and index_key.endswith(":index")
+        assert len(payload) < 5000
+        
+        store = {meta_key: meta, index_key: payload}
+        mock_redis.get.side_effect = store.get
+        with patch.object(CacheService, "_rss_feed_l1", LocalCache(1024 * 1024, 60)):
+            cached_meta, cached_index = CacheService.get_cached_rss_feed("http://example.com/feed.xml")
+        assert cached_index == index
+        assert cached_meta["etag"] == '"v1"'
+
+    @patch('cache_service.redis_binary_client')
+    def test_rss_feed_index_reused_while_revision_matches(self, mock_redis):
+        """Test that only the meta key is read while the local index is current"""
+        pipe = mock_redis.pipeline.return_value
+        store = {}
+        pipe.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+        mock_redis.get.side_effect = store.get
+        
+        with patch.object(CacheService, "_rss_feed_l1", LocalCache(1024 * 1024, 60)) as l1:
+            CacheService.set_cached_rss_feed("http://example.com/feed.xml", {"version": 1, "entries": []})
+            l1.clear()
+            meta_key, index_key = CacheService._generate_rss_feed_keys("http://example.com/feed.xml")
+            
+            CacheService.get_cached_rss_feed("http://example.com/feed.xml")
+            assert [call[0][0] for call in mock_redis.get.call_args_list] == [meta_key, index_key]
+            
+            mock_redis.get.reset_mock()
+            _, cached_index = CacheService.get_cached_rss_feed("http://example.com/feed.xml")
+            assert cached_index == {"version": 1, "entries": []}
+            assert [call[0][0] for call in mock_redis.get.call_args_list] == [meta_key]
+            
+            # Another replica stores a new revision
+            store[index_key] = cache_codec.encode({"version": 1, "entries": [{"title": "New"}]})
+            store[meta_key] = json.dumps({"fetched_at": 0, "revision": "other"})
+            _, cached_index = CacheService.get_cached_rss_feed("http://example.com/feed.xml")
+            assert cached_index["entries"] == [{"title": "New"}]
@@ -0,0 +1,57 @@
+import time
+import pytest
+from unittest.mock import patch
+from cache_service import CacheService
+
+# The counter scripts run inside Redis, so these tests need a fake that
+# executes Lua (fakeredis[lua])
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+@pytest.fixture
+def fake_redis():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    binary_client = fakeredis.FakeRedis(server=server)
+    with patch("cache_service.redis_client", client), \
+         patch("cache_service.redis_binary_client", binary_client):
+        yield client
+
+
+def _live_counts(client):
+    return {field: int(value) for field, value in client.hgetall(CacheService.STATS_KEY).items() if int(value)}
+
+
+def test_write_overwrite_and_delete_keep_one_count(fake_redis):
+    """Test that an entry is counted once in its expiry bucket and uncounted on delete"""
+    assert CacheService.set_cached_episode("apple", "123456", "ts", {"summary": "First"})
+    assert CacheService.set_cached_episode("apple", "123456", "ts", {"summary": "Second"})
+
+    expires_at = time.time() + fake_redis.pttl("episode:apple:123456:ts") / 1000
+    bucket = int(expires_at // CacheService.STATS_BUCKET_SECONDS)
+    assert _live_counts(fake_redis) == {f"episode:{bucket}": 1}
+    assert CacheService.get_cache_stats()["episode_cache_count"] == 1
+
+    assert CacheService.invalidate_specific_episode("apple", "123456", "ts") is True
+    assert fake_redis.exists("episode:apple:123456:ts") == 0
+    assert _live_counts(fake_redis) == {}
+    # Deleting a missing entry changes nothing
+    assert CacheService.invalidate_specific_episode("apple", "123456", "ts") is False
+    assert _live_counts(fake_redis) == {}
+
+
+def test_clear_cache_takes_back_only_cleared_counts(fake_redis):
+    """Test that clearing decrements each entry's tier and leaves no drift behind"""
+    transcript = "This is a test transcript content"
+    CacheService.set_cached_episode("apple", "123456", "ts", {"summary": "Summary"})
+    CacheService.set_cached_transcript_by_hash("abc123", {"transcript": transcript, "summaries": {"ts": "Short"}})
+    CacheService.set_audio_fingerprint("abc123", "f" * 64, [1, 2, 3], ["0:1-2"])
+    stats = CacheService.get_cache_stats()
+    assert (stats["episode_cache_count"], stats["file_hash_cache_count"], stats["summary_cache_count"]) == (1, 1, 1)
+
+    assert CacheService.clear_cache() is True
+
+    assert fake_redis.keys("episode:*") == [] and fake_redis.keys("transcript:*") == []
+    assert _live_counts(fake_redis) == {}
+    assert CacheService.get_cache_stats()["total_cached_items"] == 0
@@ -0,0 +1,22 @@
+import hashlib
+import file_hashing
+
+
+class TestFileHashing:
+    """Test suite for chunked audio file hashing"""
+
+    def test_matches_md5_of_whole_file_across_buffer_boundaries(self, tmp_path, monkeypatch):
+        """Test that a file spanning several partial buffers hashes like a single read"""
+        monkeypatch.setattr(file_hashing, "HASH_BUFFER_BYTES", 1000)
+        data = bytes(range(256)) * 10  # 2560 bytes: two full buffers and a partial one
+        path = tmp_path / "episode.mp3"
+        path.write_bytes(data)
+
+        assert file_hashing.hash_file(str(path)) == hashlib.md5(data).hexdigest()
+
+    def test_empty_file(self, tmp_path):
+        """Test that an empty file hashes to the MD5 of no bytes"""
+        path = tmp_path / "empty.mp3"
+        path.write_bytes(b"")
+
+        assert file_hashing.hash_file(str(path)) == hashlib.md5(b"").hexdigest()
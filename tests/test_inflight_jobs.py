@@ -0,0 +1,41 @@
+import time
+import pytest
+from unittest.mock import patch
+from cache_service import CacheService
+
+# The compare-and-set scripts run inside Redis, so these tests need a fake
+# that executes Lua (fakeredis[lua])
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    with patch("cache_service.redis_client", client), \
+         patch.object(CacheService, "INFLIGHT_JOB_TTL", 1):
+        yield client
+
+
+def test_heartbeated_job_keeps_its_claim_past_the_ttl(fake_redis):
+    """Test that a job refreshed on every heartbeat outlives INFLIGHT_JOB_TTL"""
+    assert CacheService.claim_inflight_job("apple", "123", "ts", "job-1") is None
+
+    for _ in range(3):
+        time.sleep(0.5)
+        assert CacheService.refresh_inflight_jobs([("apple", "123", "ts", "job-1")]) == 1
+
+    # 1.5s in, a second request still attaches instead of starting a duplicate job
+    assert CacheService.claim_inflight_job("apple", "123", "ts", "job-2") == "job-1"
+
+
+def test_refresh_leaves_other_jobs_claims_alone(fake_redis):
+    """Test that a stale heartbeat can't extend a claim another job took over"""
+    assert CacheService.claim_inflight_job("apple", "123", "ts", "job-2") is None
+
+    assert CacheService.refresh_inflight_jobs([("apple", "123", "ts", "job-1")]) == 0
+    assert fake_redis.pttl("inflight:apple:123:ts") <= 1000
+
+    # Once nobody heartbeats it, the claim expires and the episode is free again
+    time.sleep(1.1)
+    assert CacheService.claim_inflight_job("apple", "123", "ts", "job-3") is None
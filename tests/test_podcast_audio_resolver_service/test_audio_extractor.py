@@ -0,0 +1,267 @@
+import time
+import feedparser
+import pytest
+from unittest.mock import patch, MagicMock
+from podcast_audio_resolver_service import audio_extractor
+from podcast_audio_resolver_service.feed_index import (
+    FEED_INDEX_VERSION, build_feed_index, parse_feed_index, index_covers,
+    find_entry_by_title, find_entry_by_episode_id, find_entry_by_audio_url
+)
+
+FEED_URL = "http://example.com/feed.xml"
+FEED_XML = """<?xml version="1.0"?>
+<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd"><channel>
+<title>Planet Voices</title><itunes:summary>Voices from the frontlines</itunes:summary>
+<image><url>http://example.com/show.jpg</url></image>
+<item><title>Episode 10: Oceans</title><guid>ep-1000010</guid><itunes:duration>00:20:00</itunes:duration>
+<enclosure url="http://example.com/ep10.mp3?ref=rss" type="audio/mpeg"/></item>
+<item><title>Episode 1</title><guid>ep-1000001</guid><description>First one</description>
+<enclosure url="http://example.com/ep1.mp3" type="audio/mpeg"/></item>
+</channel></rss>"""
+
+
+def _response(status_code, body="", headers=None):
+    resp = MagicMock(status_code=status_code, headers=headers or {})
+    resp.__enter__.return_value = resp
+    data = body.encode()
+    # Split mid-element to exercise incremental parsing
+    resp.iter_content.return_value = [data[i:i + 100] for i in range(0, len(data), 100)]
+    return resp
+
+
+def _chunks(xml):
+    return [xml.encode()[i:i + 50] for i in range(0, len(xml), 50)]
+
+
+@pytest.mark.parametrize("build", [
+    lambda: build_feed_index(feedparser.parse(FEED_XML)),
+    lambda: parse_feed_index(_chunks(FEED_XML))
+], ids=["feedparser", "streaming"])
+def test_feed_index_lookups(build):
+    index = build()
+
+    assert index["show_title"] == "Planet Voices"
+    assert index["show_summary"] == "Voices from the frontlines"
+    # Exact titles win over earlier entries that merely contain them
+    assert find_entry_by_title(index, "  episode 1 ")["guid"] == "ep-1000001"
+    assert find_entry_by_title(index, "Oceans")["title"] == "Episode 10: Oceans"
+    assert find_entry_by_title(index, "Missing") is None
+    assert find_entry_by_episode_id(index, "1000010")["audio_url"] == "http://example.com/ep10.mp3?ref=rss"
+    assert find_entry_by_audio_url(index, "http://example.com/ep10.mp3")["duration"] == "00:20:00"
+    assert find_entry_by_title(index, "Episode 1")["summary"] == "First one"
+    assert index["show_image"] == "http://example.com/show.jpg"
+    assert index["complete"] is True
+
+
+def test_streaming_parse_stops_at_wanted_episode():
+    chunks = iter(_chunks(FEED_XML))
+    index = parse_feed_index(chunks, episode_title="Episode 10:  OCEANS")
+
+    assert index["complete"] is False
+    assert [entry["title"] for entry in index["entries"]] == ["Episode 10: Oceans"]
+    assert index["show_title"] == "Planet Voices"
+    # The rest of the feed was never read
+    assert next(chunks, None) is not None
+    assert index_covers(index, "Episode 10: Oceans")
+    assert not index_covers(index, "Episode 1")
+    assert not index_covers(index, episode_id="ep-1000001")
+
+
+def test_streaming_parse_waits_for_pending_title_per_item():
+    # The title arrives only after the wanted episode has already been parsed
+    answers = iter([None, "Episode 10: Oceans"])
+    index = parse_feed_index(_chunks(FEED_XML), episode_title=lambda: next(answers))
+
+    assert index["complete"] is False
+    assert [entry["title"] for entry in index["entries"]] == ["Episode 10: Oceans", "Episode 1"]
+
+
+def test_streaming_parse_rejects_non_rss():
+    assert parse_feed_index([b'<feed xmlns="http://www.w3.org/2005/Atom"></feed>']) is None
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_fresh_cached_index_skips_network(mock_cache, mock_get):
+    index = {"version": FEED_INDEX_VERSION, "complete": True, "entries": []}
+    mock_cache.get_cached_rss_feed.return_value = ({"fetched_at": time.time()}, index)
+
+    assert audio_extractor.get_feed_index(FEED_URL) is index
+    mock_get.assert_not_called()
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_stale_feed_revalidated_with_conditional_get(mock_cache, mock_get):
+    meta = {
+        "fetched_at": time.time() - audio_extractor.RSS_CACHE_TTL - 1,
+        "etag": '"abc"',
+        "last_modified": "Wed, 01 Jan 2025 00:00:00 GMT"
+    }
+    index = {"version": FEED_INDEX_VERSION, "complete": True, "entries": []}
+    mock_cache.get_cached_rss_feed.return_value = (meta, index)
+    mock_get.return_value = _response(304)
+
+    assert audio_extractor.get_feed_index(FEED_URL) is index
+    headers = mock_get.call_args[1]["headers"]
+    assert headers == {"If-None-Match": '"abc"', "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"}
+    mock_cache.refresh_cached_rss_feed.assert_called_once_with(FEED_URL, meta)
+    mock_cache.set_cached_rss_feed.assert_not_called()
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_feed_miss_builds_and_stores_index(mock_cache, mock_get):
+    mock_cache.get_cached_rss_feed.return_value = None
+    mock_get.return_value = _response(200, FEED_XML, {"ETag": '"v2"', "Last-Modified": "Thu, 02 Jan 2025 00:00:00 GMT"})
+
+    index = audio_extractor.get_feed_index(FEED_URL)
+
+    assert [entry["title"] for entry in index["entries"]] == ["Episode 10: Oceans", "Episode 1"]
+    assert mock_get.call_args[1]["headers"] == {}
+    assert mock_get.call_args[1]["stream"] is True
+    mock_cache.set_cached_rss_feed.assert_called_once_with(
+        FEED_URL, index, etag='"v2"', last_modified="Thu, 02 Jan 2025 00:00:00 GMT"
+    )
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_outdated_index_version_rebuilt(mock_cache, mock_get):
+    meta = {"fetched_at": time.time(), "etag": '"abc"'}
+    mock_cache.get_cached_rss_feed.return_value = (meta, {"version": FEED_INDEX_VERSION - 1})
+    mock_get.return_value = _response(200, FEED_XML)
+
+    index = audio_extractor.get_feed_index(FEED_URL)
+
+    assert index["version"] == FEED_INDEX_VERSION
+    # No validators: a 304 would leave us without a usable index
+    assert mock_get.call_args[1]["headers"] == {}
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_partial_index_missing_episode_refetched_in_full(mock_cache, mock_get):
+    partial = parse_feed_index(_chunks(FEED_XML), episode_title="Episode 10: Oceans")
+    mock_cache.get_cached_rss_feed.return_value = ({"fetched_at": time.time(), "etag": '"abc"'}, partial)
+    mock_get.return_value = _response(200, FEED_XML)
+
+    assert audio_extractor.get_feed_index(FEED_URL, "Episode 10: Oceans") is partial
+    mock_get.assert_not_called()
+
+    index = audio_extractor.get_feed_index(FEED_URL, "Episode 1")
+    assert [entry["title"] for entry in index["entries"]] == ["Episode 10: Oceans", "Episode 1"]
+    assert mock_get.call_args[1]["headers"] == {}
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_revalidated_complete_index_never_replaced_by_partial(mock_cache, mock_get):
+    stale = {"fetched_at": time.time() - audio_extractor.RSS_CACHE_TTL - 1, "etag": '"abc"'}
+    cache = {"feed": (stale, parse_feed_index(_chunks(FEED_XML)))}
+    mock_cache.get_cached_rss_feed.side_effect = lambda url: cache.get("feed")
+    mock_cache.set_cached_rss_feed.side_effect = lambda url, index, **validators: cache.update(
+        feed=({"fetched_at": time.time(), **validators}, index)
+    )
+    mock_get.side_effect = lambda *args, **kwargs: _response(200, FEED_XML)
+
+    for title in ["Episode 10: Oceans", "Episode 1", "Episode 10: Oceans"]:
+        index = audio_extractor.get_feed_index(FEED_URL, title)
+        assert find_entry_by_title(index, title)["title"] == title
+
+    # The changed feed was read to the end once and served from cache after
+    assert mock_get.call_count == 1
+    assert cache["feed"][1]["complete"] is True
+
+
+def test_prefix_only_covers_lookups_it_answers_like_the_full_feed():
+    # "Episode 1" is a substring of the first title but an exact match later on
+    partial = parse_feed_index(_chunks(FEED_XML), episode_title="Oceans")
+    assert partial["complete"] is True
+
+    partial = parse_feed_index(_chunks(FEED_XML), episode_title="Episode 10: Oceans")
+    assert find_entry_by_title(partial, "Episode 1")["title"] == "Episode 10: Oceans"
+    assert not index_covers(partial, "Episode 1")
+    assert index_covers(partial, "episode 10:  oceans")
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_inexact_title_cached_after_one_full_download(mock_cache, mock_get):
+    partial = parse_feed_index(_chunks(FEED_XML), episode_title="Episode 10: Oceans")
+    cache = {"feed": ({"fetched_at": time.time()}, partial)}
+    mock_cache.get_cached_rss_feed.side_effect = lambda url: cache.get("feed")
+    mock_cache.set_cached_rss_feed.side_effect = lambda url, index, **validators: cache.update(
+        feed=({"fetched_at": time.time(), **validators}, index)
+    )
+    mock_get.side_effect = lambda *args, **kwargs: _response(200, FEED_XML)
+
+    # Apple's title only partly matches the feed's
+    for _ in range(2):
+        index = audio_extractor.get_feed_index(FEED_URL, "Oceans")
+        assert find_entry_by_title(index, "Oceans")["guid"] == "ep-1000010"
+
+    assert mock_get.call_count == 1
+    assert cache["feed"][1]["complete"] is True
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.http_client.get")
+@patch("podcast_audio_resolver_service.audio_extractor.CacheService")
+def test_malformed_feed_falls_back_to_feedparser(mock_cache, mock_get):
+    mock_cache.get_cached_rss_feed.return_value = None
+    broken = FEED_XML.replace("Episode 1<", "Episode&nbsp;1<")
+    streamed = _response(200, broken)
+    full = MagicMock(status_code=200, content=broken.encode())
+    mock_get.side_effect = [streamed, full]
+
+    index = audio_extractor.get_feed_index(FEED_URL)
+
+    assert len(index["entries"]) == 2
+    assert mock_get.call_count == 2
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.get_episode_audio_file_with_episode_title")
+@patch("podcast_audio_resolver_service.audio_extractor.find_existing_audio_file", return_value=(None, None))
+def test_streaming_mode_hands_over_enclosure_without_downloading(mock_existing, mock_download, monkeypatch):
+    monkeypatch.setattr(audio_extractor, "AUDIO_SOURCE", "stream")
+    index = parse_feed_index(_chunks(FEED_XML))
+
+    data = audio_extractor.download_audio_and_get_metadata(FEED_URL, "Episode 1", feed_index=index)
+
+    mock_download.assert_not_called()
+    assert data["file_path"] is None
+    assert data["audio_url"] == "http://example.com/ep1.mp3"
+    assert data["metadata"]["show_title"] == "Planet Voices"
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.get_episode_audio_file_with_episode_title")
+@patch("podcast_audio_resolver_service.audio_extractor.downloader.probe")
+def test_url_mode_keys_transcripts_by_enclosure_identity(mock_probe, mock_download, monkeypatch):
+    monkeypatch.setattr(audio_extractor, "AUDIO_SOURCE", "url")
+    mock_probe.return_value = {"ranged": True, "size": 1000, "etag": '"v1"', "last_modified": None, "url": None}
+    index = parse_feed_index(_chunks(FEED_XML))
+
+    data = audio_extractor.download_audio_and_get_metadata(FEED_URL, "Episode 1", feed_index=index)
+
+    mock_download.assert_not_called()
+    assert data["audio_source"] == "url"
+    assert data["file_path"] is None
+    assert data["file_hash"] == audio_extractor.enclosure_key("http://example.com/ep1.mp3", "ep-1000001")
+    # A republished file gets a new key
+    mock_probe.return_value = {**mock_probe.return_value, "etag": '"v2"'}
+    assert audio_extractor.enclosure_key("http://example.com/ep1.mp3", "ep-1000001") != data["file_hash"]
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.get_episode_audio_file_with_episode_title",
+       return_value=("audio_files/store/ab/abc.mp3", "abc"))
+@patch("podcast_audio_resolver_service.audio_extractor.downloader.probe",
+       side_effect=audio_extractor.requests.exceptions.ConnectionError("blocked"))
+def test_url_mode_downloads_enclosures_it_cannot_probe(mock_probe, mock_download, monkeypatch):
+    monkeypatch.setattr(audio_extractor, "AUDIO_SOURCE", "url")
+    index = parse_feed_index(_chunks(FEED_XML))
+
+    data = audio_extractor.download_audio_and_get_metadata(FEED_URL, "Episode 1", feed_index=index)
+
+    assert data["audio_source"] == "file"
+    assert data["file_path"] == "audio_files/store/ab/abc.mp3"
+    assert data["file_hash"] == "abc"
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+import pytest
+from unittest.mock import patch
+from podcast_audio_resolver_service import download_index, audio_store, audio_extractor
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_index, "DOWNLOAD_INDEX_PATH", str(tmp_path / "download_index.db"))
+    monkeypatch.setattr(download_index, "LEGACY_CACHE_FILE", str(tmp_path / "download_cache.json"))
+    monkeypatch.setattr(download_index, "AUDIO_FOLDER", str(tmp_path / "audio"))
+    monkeypatch.setattr(download_index, "_conn", None)
+    monkeypatch.setattr(download_index, "_entries", {})
+    monkeypatch.setattr(download_index, "_synced", False)
+    monkeypatch.setattr(audio_store, "_metrics", dict.fromkeys(audio_store._metrics, 0))
+    yield tmp_path
+    if download_index._conn is not None:
+        download_index._conn.close()
+
+
+def _stored(content, url, last_used):
+    """Publish content as if downloaded from url and last used at last_used"""
+    temp_file = audio_store.partial_path(url, ".mp3")
+    with open(temp_file, "wb") as f:
+        f.write(content)
+    file_hash = hashlib.md5(content).hexdigest()
+    file_path = audio_store.publish(temp_file, file_hash, ".mp3")
+    download_index.record_download(url, file_path, file_hash, "Title")
+    download_index._connection().execute(
+        "UPDATE files SET last_access = ? WHERE file_path = ?", (last_used, file_path)
+    )
+    return file_path
+
+
+def test_identical_audio_is_stored_once():
+    first = _stored(b"same audio", "https://a.example.com/ep.mp3", time.time())
+    second = _stored(b"same audio", "https://b.example.com/ep.mp3", time.time())
+
+    assert first == second
+    assert first.endswith(os.path.join(hashlib.md5(b"same audio").hexdigest()[:2], hashlib.md5(b"same audio").hexdigest() + ".mp3"))
+    assert os.listdir(os.path.dirname(audio_store.partial_path("https://a.example.com/ep.mp3", ".mp3"))) == []
+    assert audio_store.get_metrics()["deduplicated"] == 1
+    assert audio_store.get_metrics()["files"] == 1
+
+
+@patch("podcast_audio_resolver_service.audio_store.CacheService")
+def test_eviction_is_lru_and_skips_in_flight_and_recent_files(mock_cache, monkeypatch):
+    now = time.time()
+    oldest = _stored(b"a" * 100, "https://example.com/a.mp3", now - 4000)
+    in_flight = _stored(b"b" * 100, "https://example.com/b.mp3", now - 3000)
+    older = _stored(b"c" * 100, "https://example.com/c.mp3", now - 2000)
+    recent = _stored(b"d" * 100, "https://example.com/d.mp3", now - 10)
+    mock_cache.get_inflight_file_paths.return_value = {in_flight}
+    monkeypatch.setattr(audio_store, "AUDIO_STORE_QUOTA_BYTES", 150)
+
+    assert audio_store.evict() == 2
+
+    assert not os.path.exists(oldest) and not os.path.exists(older)
+    assert os.path.exists(in_flight) and os.path.exists(recent)
+    assert download_index.get_download("https://example.com/a.mp3") is None
+    metrics = audio_store.get_metrics()
+    assert (metrics["files"], metrics["bytes"], metrics["evictions"], metrics["evicted_bytes"]) == (2, 200, 2, 200)
+
+
+@patch("podcast_audio_resolver_service.audio_store.CacheService")
+def test_expired_files_evicted_under_quota(mock_cache):
+    stale = _stored(b"old", "https://example.com/old.mp3", time.time() - audio_store.AUDIO_STORE_MAX_AGE_SECONDS - 1)
+    fresh = _stored(b"new", "https://example.com/new.mp3", time.time() - 3600)
+    mock_cache.get_inflight_file_paths.return_value = set()
+
+    assert audio_store.evict() == 1
+    assert not os.path.exists(stale) and os.path.exists(fresh)
+
+
+@patch("podcast_audio_resolver_service.audio_store.CacheService")
+def test_no_eviction_when_in_flight_jobs_unknown(mock_cache, monkeypatch):
+    file_path = _stored(b"a" * 100, "https://example.com/a.mp3", time.time() - 4000)
+    mock_cache.get_inflight_file_paths.return_value = None
+    monkeypatch.setattr(audio_store, "AUDIO_STORE_QUOTA_BYTES", 10)
+
+    assert audio_store.evict() == 0
+    assert os.path.exists(file_path)
+
+
+@patch("podcast_audio_resolver_service.audio_extractor.audio_store.evict_in_background")
+@patch("podcast_audio_resolver_service.audio_extractor.downloader.fetch")
+def test_download_lands_in_store_and_is_reused(mock_fetch, mock_evict):
+    def fetch(url, part_path, on_progress=None):
+        with open(part_path, "wb") as f:
+            f.write(b"audiobytes")
+    mock_fetch.side_effect = fetch
+
+    file_path, file_hash = audio_extractor.download_to_store("https://example.com/ep.m4a?ref=x", "Shared Title")
+
+    assert file_hash == hashlib.md5(b"audiobytes").hexdigest()
+    assert file_path == audio_store.object_path(file_hash, ".m4a")
+    mock_evict.assert_called_once()
+    assert audio_extractor.find_existing_audio_file("https://example.com/ep.m4a", "Shared Title") == (file_path, file_hash)
+    # Store objects are named by hash, so another show's episode with this title doesn't match
+    assert download_index.find_file_by_title("Shared Title") is None
+    assert audio_store.get_metrics()["hits"] == 1
+    # A second download of the same URL finds the published file instead
+    assert audio_extractor.download_to_store("https://example.com/ep.m4a", "Shared Title") == (file_path, file_hash)
+    assert mock_fetch.call_count == 1
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import threading
+import pytest
+from unittest.mock import patch
+from podcast_audio_resolver_service import download_index, audio_extractor
+import file_hashing
+
+
+@pytest.fixture(autouse=True)
+def index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(download_index, "DOWNLOAD_INDEX_PATH", str(tmp_path / "download_index.db"))
+    monkeypatch.setattr(download_index, "LEGACY_CACHE_FILE", str(tmp_path / "download_cache.json"))
+    monkeypatch.setattr(download_index, "_conn", None)
+    monkeypatch.setattr(download_index, "_entries", {})
+    monkeypatch.setattr(download_index, "AUDIO_FOLDER", str(tmp_path / "audio"))
+    monkeypatch.setattr(download_index, "_synced", False)
+    yield tmp_path
+    if download_index._conn is not None:
+        download_index._conn.close()
+
+
+def _reopen(monkeypatch):
+    """Simulate a fresh process opening the same index"""
+    download_index._conn.close()
+    monkeypatch.setattr(download_index, "_conn", None)
+    monkeypatch.setattr(download_index, "_entries", {})
+
+
+def test_legacy_json_imported_once(index_path, monkeypatch):
+    (index_path / "download_cache.json").write_text(json.dumps({
+        "https://example.com/a.mp3?token=1": {"file_path": "audio_files/a.mp3", "file_hash": "aaa", "episode_title": "A"}
+    }))
+
+    assert download_index.get_download("https://example.com/a.mp3")["file_hash"] == "aaa"
+
+    # Entries removed after the import stay removed
+    download_index.remove_download("https://example.com/a.mp3")
+    _reopen(monkeypatch)
+    assert download_index.get_download("https://example.com/a.mp3") is None
+
+
+def test_upsert_replaces_and_persists(monkeypatch):
+    download_index.record_download("https://example.com/a.mp3", "audio_files/a.mp3", "old", "A")
+    download_index.record_download("https://example.com/a.mp3?ref=x", "audio_files/a2.mp3", "new", "A")
+
+    _reopen(monkeypatch)
+    assert download_index.get_download("https://example.com/a.mp3") == {
+        "file_path": "audio_files/a2.mp3", "file_hash": "new", "episode_title": "A"
+    }
+    assert list(download_index.list_downloads()) == ["https://example.com/a.mp3"]
+
+
+def test_concurrent_records_are_not_lost():
+    def record(n):
+        download_index.record_download(f"https://example.com/{n}.mp3", f"audio_files/{n}.mp3", str(n), None)
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(download_index.list_downloads()) == 50
+
+
+def test_missing_file_is_dropped_from_index(index_path):
+    download_index.record_download("https://example.com/gone.mp3", str(index_path / "gone.mp3"), "abc", "Gone Episode")
+
+    assert audio_extractor.find_existing_audio_file("https://example.com/gone.mp3", "Gone Episode") == (None, None)
+    assert download_index.get_download("https://example.com/gone.mp3") is None
+
+
+@pytest.fixture
+def audio_folder(index_path):
+    folder = index_path / "audio"
+    folder.mkdir()
+    return folder
+
+
+def test_title_lookup_hashes_each_file_once(audio_folder, monkeypatch):
+    (audio_folder / "Old_Episode-Part_1.mp3").write_bytes(b"audio")
+    (audio_folder / "notes.txt").write_text("not audio")
+
+    with patch.object(file_hashing, "hash_file", wraps=file_hashing.hash_file) as mock_hash:
+        found = download_index.find_file_by_title(" Old Episode/Part 1")
+        assert found == (str(audio_folder / "Old_Episode-Part_1.mp3"), hashlib.md5(b"audio").hexdigest())
+
+        # A new process finds the persisted hash without reading the file again
+        _reopen(monkeypatch)
+        monkeypatch.setattr(download_index, "_synced", False)
+        assert download_index.find_file_by_title("Old Episode/Part 1") == found
+        assert mock_hash.call_count == 1
+
+    assert download_index.find_file_by_title("notes") is None
+
+
+def test_recorded_downloads_found_by_title_without_rescan(audio_folder):
+    download_index.sync_audio_folder()
+    file_path = audio_folder / "New_Episode.m4a"
+    file_path.write_bytes(b"fresh")
+    download_index.record_download("https://example.com/new.m4a", str(file_path), "hash1", "New Episode")
+
+    assert download_index.find_file_by_title("New Episode") == (str(file_path), "hash1")
+
+    file_path.unlink()
+    assert download_index.find_file_by_title("New Episode") is None
@@ -0,0 +1,193 @@
+import os
+import pytest
+import requests
+from podcast_audio_resolver_service import downloader
+
+URL = "https://cdn.example.com/episode.mp3"
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers, fail_after=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+        self.url = URL
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(self.status_code)
+
+    def iter_content(self, chunk_size):
+        limit = len(self.body) if self.fail_after is None else self.fail_after
+        for start in range(0, limit, 1000):
+            yield self.body[start:min(start + 1000, limit)]
+        if self.fail_after is not None:
+            raise requests.exceptions.ChunkedEncodingError("connection dropped")
+
+
+class FakeServer:
+    """Serves BODY, honouring Range and If-Range like a CDN would"""
+
+    def __init__(self, body=BODY, etag='"v1"', ranges=True):
+        self.body = body
+        self.etag = etag
+        self.ranges = ranges
+        # Requests after the probe that still get ranges, None for all
+        self.ranged_requests = None
+        self.requests = []
+        self.clients = []
+        # Byte counts after which upcoming responses drop the connection
+        self.drops = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        self.clients.append(kwargs.get("client"))
+        fail_after = self.drops.pop(0) if self.drops else None
+        range_header = headers.get("Range")
+        if_range = headers.get("If-Range")
+        # Weak ETags never satisfy If-Range
+        stale = if_range is not None and (if_range != self.etag or if_range.startswith("W/"))
+        refused = self.ranged_requests is not None and len(self.requests) > self.ranged_requests + 1
+        if not self.ranges or not range_header or stale or refused:
+            return FakeResponse(200, self.body, {"Content-Length": str(len(self.body)), "ETag": self.etag}, fail_after)
+        start, _, end = range_header[len("bytes="):].partition("-")
+        start, end = int(start), int(end) if end else len(self.body) - 1
+        return FakeResponse(206, self.body[start:end + 1], {
+            "Content-Range": f"bytes {start}-{end}/{len(self.body)}",
+            "ETag": self.etag
+        }, fail_after)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    monkeypatch.setattr(downloader.http_client, "get", server)
+    monkeypatch.setattr(downloader, "DOWNLOAD_PARALLEL_MIN_BYTES", 4096)
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_BYTES", 3000)
+    return server
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_large_file_fetched_in_parallel_segments(server, tmp_path):
+    part_path = str(tmp_path / "episode.mp3.part")
+    progress = []
+
+    downloader.fetch(URL, part_path, lambda done, total: progress.append((done, total)))
+
+    assert _read(part_path) == BODY
+    ranges = sorted(headers["Range"] for headers in server.requests[1:])
+    assert ranges == ["bytes=0-2999", "bytes=3000-5999", "bytes=6000-8999", "bytes=9000-10239"]
+    assert all(headers["If-Range"] == '"v1"' for headers in server.requests[1:])
+    assert progress[-1] == (len(BODY), len(BODY))
+    # Segments use the download pool, not the session lookups share
+    assert all(client is downloader.http_client.download_session for client in server.clients)
+
+
+def test_interrupted_download_resumes_missing_segments(server, tmp_path, monkeypatch):
+    part_path = str(tmp_path / "episode.mp3.part")
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_WORKERS", 1)
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 0)
+    # The third segment drops midway; the others complete
+    server.drops = [None, None, None, 500]
+
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.fetch(URL, part_path)
+    assert os.path.exists(part_path)
+
+    server.requests.clear()
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY
+    assert [headers["Range"] for headers in server.requests[1:]] == ["bytes=6000-8999"]
+
+
+def test_dropped_segment_retried_from_where_it_stopped(server, tmp_path, monkeypatch):
+    part_path = str(tmp_path / "episode.mp3.part")
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_WORKERS", 1)
+    server.drops = [None, 1000]
+
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY
+    assert server.requests[2]["Range"] == "bytes=1000-2999"
+
+
+def test_changed_enclosure_is_downloaded_from_scratch(server, tmp_path, monkeypatch):
+    part_path = str(tmp_path / "episode.mp3.part")
+    monkeypatch.setattr(downloader, "DOWNLOAD_SEGMENT_WORKERS", 1)
+    monkeypatch.setattr(downloader, "DOWNLOAD_RETRIES", 0)
+    server.drops = [None, None, 10]
+    with pytest.raises(requests.exceptions.RequestException):
+        downloader.fetch(URL, part_path)
+
+    server.body = BODY[::-1]
+    server.etag = '"v2"'
+    server.requests.clear()
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY[::-1]
+    assert len(server.requests) == 5
+
+
+def test_small_file_resumed_sequentially(server, tmp_path):
+    small = BODY[:4000]
+    server.body = small
+    part_path = str(tmp_path / "episode.mp3.part")
+    server.drops = [None, 2500]
+
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == small
+    assert server.requests[2] == {"Range": "bytes=2500-", "If-Range": '"v1"'}
+
+
+def test_server_without_ranges_streams_whole_file(server, tmp_path):
+    server.ranges = False
+    part_path = str(tmp_path / "episode.mp3.part")
+
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY
+    assert len(server.requests) == 1
+
+
+def test_probe_reads_validators_without_downloading(server):
+    info = downloader.probe(URL)
+
+    assert info["size"] == len(BODY)
+    assert info["etag"] == '"v1"'
+    assert info["ranged"] is True
+    assert server.requests == [{"Range": "bytes=0-0"}]
+
+
+def test_weak_etag_is_not_used_for_if_range(server, tmp_path):
+    server.etag = 'W/"abc"'
+    part_path = str(tmp_path / "episode.mp3.part")
+
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY
+    assert all("If-Range" not in headers for headers in server.requests)
+
+
+def test_fresh_download_falls_back_to_sequential_when_segments_refused(server, tmp_path):
+    server.ranged_requests = 0
+    part_path = str(tmp_path / "episode.mp3.part")
+
+    downloader.fetch(URL, part_path)
+
+    assert _read(part_path) == BODY
+    assert server.requests[-1] == {}
@@ -0,0 +1,74 @@
+import threading
+from unittest.mock import patch, MagicMock
+from podcast_audio_resolver_service import get_audio
+
+APPLE_URL = "https://podcasts.apple.com/us/podcast/the-daily/id1200361736?i=1000586070870"
+
+
+def test_apple_title_and_feed_lookups_run_concurrently():
+    # Both lookups wait on each other, so this only finishes if they overlap
+    both_started = threading.Barrier(2, timeout=5)
+    feed_index = MagicMock()
+
+    def get_title(url):
+        both_started.wait()
+        return "Episode Title"
+
+    def get_rss(url):
+        both_started.wait()
+        return "http://example.com/rss.xml"
+
+    with patch("podcast_audio_resolver_service.get_audio.apple_scraper.get_episode_title", side_effect=get_title), \
+         patch("podcast_audio_resolver_service.get_audio.get_rss_from_apple_link", side_effect=get_rss), \
+         patch("podcast_audio_resolver_service.get_audio.get_feed_index", return_value=feed_index) as mock_feed, \
+         patch("podcast_audio_resolver_service.get_audio.download_audio_and_get_metadata",
+               return_value={"file_path": "audio_files/x.mp3", "metadata": {}}) as mock_download:
+
+        data = get_audio.get_episode_audio_from_apple(APPLE_URL)
+
+    assert data["file_path"] == "audio_files/x.mp3"
+    # The feed fetch starts without waiting for the title; it gets the pending
+    # scrape so it can stop at that episode once the title is in
+    (rss_url, title_future), _ = mock_feed.call_args
+    assert rss_url == "http://example.com/rss.xml"
+    assert title_future.result() == "Episode Title"
+    # The speculatively fetched feed is reused rather than fetched again
+    mock_download.assert_called_once_with("http://example.com/rss.xml", "Episode Title", None, feed_index)
+
+
+def test_apple_missing_title_is_reported():
+    with patch("podcast_audio_resolver_service.get_audio.apple_scraper.get_episode_title", return_value=None), \
+         patch("podcast_audio_resolver_service.get_audio.get_rss_from_apple_link", return_value="http://example.com/rss.xml"), \
+         patch("podcast_audio_resolver_service.get_audio.get_feed_index"), \
+         patch("podcast_audio_resolver_service.get_audio.download_audio_and_get_metadata") as mock_download:
+
+        data = get_audio.get_episode_audio_from_apple(APPLE_URL)
+
+    assert "Could not extract episode title" in data["error"]
+    mock_download.assert_not_called()
+
+
+def test_apple_feed_fetch_does_not_wait_for_title():
+    title_released = threading.Event()
+    feed_started = threading.Event()
+
+    def get_title(url):
+        # The scrape only finishes once the feed fetch has begun
+        assert feed_started.wait(timeout=5)
+        title_released.set()
+        return "Episode Title"
+
+    def get_feed_index(rss_url, title_future):
+        feed_started.set()
+        return MagicMock()
+
+    with patch("podcast_audio_resolver_service.get_audio.apple_scraper.get_episode_title", side_effect=get_title), \
+         patch("podcast_audio_resolver_service.get_audio.get_rss_from_apple_link", return_value="http://example.com/rss.xml"), \
+         patch("podcast_audio_resolver_service.get_audio.get_feed_index", side_effect=get_feed_index), \
+         patch("podcast_audio_resolver_service.get_audio.download_audio_and_get_metadata",
+               return_value={"file_path": "audio_files/x.mp3", "metadata": {}}):
+
+        data = get_audio.get_episode_audio_from_apple(APPLE_URL)
+
+    assert title_released.is_set()
+    assert data["file_path"] == "audio_files/x.mp3"
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+from podcast_audio_resolver_service.html_extract import extract_text
+from podcast_audio_resolver_service import apple_scraper, spotify_scraper
+
+SPOTIFY_PAGE = (
+    '<html><head><title>Ep | Podcast on Spotify</title></head><body>'
+    '<h1 data-testid="episodeTitle" class="x">The <b>Big</b> Episode &amp; More</h1>'
+    '<p data-testid="entity-header-entity-subtitle">Planet Voices</p>'
+)
+
+
+def _chunks(text, size):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def test_extract_text_across_chunk_boundaries():
+    found = extract_text(_chunks(SPOTIFY_PAGE, 7), spotify_scraper.TITLE_TARGETS)
+
+    assert found == {"episode_title": "The Big Episode & More", "show_title": "Planet Voices"}
+
+
+def test_extract_text_stops_once_all_targets_found():
+    def page():
+        yield SPOTIFY_PAGE
+        raise AssertionError("read past the targets")
+
+    found = extract_text(page(), spotify_scraper.TITLE_TARGETS)
+
+    assert found["show_title"] == "Planet Voices"
+
+
+def test_extract_text_child_target():
+    page = '<h1 class="product-header headings__title">Ignored<span> Episode 3 </span></h1>'
+
+    found = extract_text([page], apple_scraper.TITLE_TARGETS)
+
+    assert found == {"episode_title": " Episode 3 "}
+
+
+def test_extract_text_missing_target_left_out():
+    found = extract_text(['<h1 class="other">Nope</h1>'], apple_scraper.TITLE_TARGETS)
+
+    assert found == {}
+
+
+def test_spotify_titles_served_from_cache():
+    cached = {"episode_title": "The Big Episode", "show_title": "Planet Voices"}
+    with patch("podcast_audio_resolver_service.spotify_scraper.CacheService.get_cached_page_metadata", return_value=cached), \
+         patch("podcast_audio_resolver_service.spotify_scraper.fetch_page_text") as mock_fetch:
+
+        titles = spotify_scraper.get_show_and_episode_title("https://open.spotify.com/episode/abc123")
+
+    assert titles == ["The Big Episode", "Planet Voices"]
+    mock_fetch.assert_not_called()
+
+
+def test_apple_title_cached_after_scrape():
+    url = "https://podcasts.apple.com/us/podcast/x/id1?i=1000"
+    with patch("podcast_audio_resolver_service.apple_scraper.CacheService.get_cached_page_metadata", return_value=None), \
+         patch("podcast_audio_resolver_service.apple_scraper.CacheService.set_cached_page_metadata") as mock_set, \
+         patch("podcast_audio_resolver_service.apple_scraper.fetch_page_text", return_value={"episode_title": " Episode 3 "}):
+
+        assert apple_scraper.get_episode_title(url) == "Episode 3"
+
+    mock_set.assert_called_once_with(url, {"episode_title": "Episode 3"})
@@ -0,0 +1,60 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from podcast_audio_resolver_service import http_client
+
+
+def test_shared_session_pools_and_retries():
+    adapter = http_client.session.get_adapter("https://api.podcastindex.org")
+    assert adapter is http_client.session.get_adapter("https://podcasts.apple.com")
+    assert adapter._pool_maxsize == http_client.HTTP_POOL_MAXSIZE
+    assert adapter._pool_block is True
+    assert adapter.max_retries.total == http_client.HTTP_RETRIES
+    assert 503 in adapter.max_retries.status_forcelist
+
+
+def test_downloads_have_their_own_non_blocking_pool():
+    adapter = http_client.download_session.get_adapter("https://cdn.example.com")
+    # Segment downloads can't take the connections lookups to the same host wait for
+    assert adapter is not http_client.session.get_adapter("https://cdn.example.com")
+    assert adapter._pool_maxsize == http_client.DOWNLOAD_POOL_MAXSIZE
+    assert adapter._pool_block is False
+    assert adapter.max_retries.total == http_client.HTTP_RETRIES
+
+
+@patch("podcast_audio_resolver_service.http_client.session")
+def test_request_uses_given_client(mock_session):
+    client = MagicMock()
+    client.request.return_value = MagicMock(status_code=206)
+
+    http_client.get("https://client-test.example.com/ep.mp3", client=client, stream=True)
+
+    mock_session.request.assert_not_called()
+    assert client.request.call_args[1]["stream"] is True
+    assert http_client.get_latency_stats()["client-test.example.com"]["count"] == 1
+
+
+@patch("podcast_audio_resolver_service.http_client.session")
+def test_request_applies_default_timeout_and_records_latency(mock_session):
+    mock_session.request.return_value = MagicMock(status_code=200)
+
+    http_client.get("https://latency-test.example.com/feed.xml")
+    http_client.get("https://latency-test.example.com/other", timeout=30)
+
+    first_call, second_call = mock_session.request.call_args_list
+    assert first_call[1]["timeout"] == (http_client.HTTP_CONNECT_TIMEOUT, http_client.HTTP_READ_TIMEOUT)
+    assert second_call[1]["timeout"] == 30
+
+    stats = http_client.get_latency_stats()["latency-test.example.com"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 0
+    assert sum(stats["histogram"].values()) == 2
+
+
+@patch("podcast_audio_resolver_service.http_client.session")
+def test_request_counts_failures(mock_session):
+    mock_session.request.side_effect = ConnectionError("boom")
+
+    with pytest.raises(ConnectionError):
+        http_client.get("https://failing-host.example.com/")
+
+    assert http_client.get_latency_stats()["failing-host.example.com"]["errors"] == 1
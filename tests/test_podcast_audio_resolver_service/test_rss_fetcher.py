@@ -1,10 +1,20 @@
+import time
 import pytest
 from unittest.mock import patch
 from podcast_audio_resolver_service import rss_fetcher
+from cache_service import CacheService
 
 
-@patch("podcast_audio_resolver_service.rss_fetcher.requests.post")
-def test_get_rss_feed_url_valid(mock_post):
+@pytest.fixture(autouse=True)
+def feed_url_cache():
+    """Start every test from an empty feed URL cache"""
+    with patch("podcast_audio_resolver_service.rss_fetcher.CacheService.get_cached_feed_url", return_value=None) as mock_get, \
+         patch("podcast_audio_resolver_service.rss_fetcher.CacheService.set_cached_feed_url") as mock_set:
+        yield mock_get, mock_set
+
+
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_valid(mock_post, feed_url_cache):
     mock_post.return_value.status_code = 200
     mock_post.return_value.json.return_value = {
         "feeds": [{"url": "http://example.com/feed.xml"}]
@@ -12,10 +22,11 @@ def test_get_rss_feed_url_valid(mock_post):
 
     rss = rss_fetcher.get_rss_feed_url("The Daily")
     assert rss == "http://example.com/feed.xml"
+    feed_url_cache[1].assert_called_once_with("title", "The Daily", "http://example.com/feed.xml")
 
 
-@patch("podcast_audio_resolver_service.rss_fetcher.requests.get")
-def test_valid_rss_from_apple_url(mock_get):
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.get")
+def test_valid_rss_from_apple_url(mock_get, feed_url_cache):
     mock_get.return_value.status_code = 200
     mock_get.return_value.json.return_value = {
         "feed": {"url": "http://example.com/rss.xml"}
@@ -24,12 +35,51 @@ def test_valid_rss_from_apple_url(mock_get):
     url = "https://podcasts.apple.com/us/podcast/the-daily/id1200361736?i=1000586070870"
     rss = rss_fetcher.get_rss_from_apple_link(url)
     assert rss == "http://example.com/rss.xml"
+    feed_url_cache[1].assert_called_once_with("itunes", "1200361736", "http://example.com/rss.xml")
 
 
-@patch("podcast_audio_resolver_service.rss_fetcher.requests.post")
-def test_get_rss_feed_url_invalid(mock_post):
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_invalid(mock_post, feed_url_cache):
     mock_post.return_value.status_code = 200
     mock_post.return_value.json.return_value = {"feeds": []}
 
     rss = rss_fetcher.get_rss_feed_url("SomeInvalidPodcastTitle123")
     assert rss is None
+    # Misses are cached too, so unknown shows don't hit the API every time
+    feed_url_cache[1].assert_called_once_with("title", "SomeInvalidPodcastTitle123", None)
+
+
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_api_error_not_cached(mock_post, feed_url_cache):
+    mock_post.return_value.status_code = 503
+    mock_post.return_value.text = "unavailable"
+
+    assert rss_fetcher.get_rss_feed_url("The Daily") is None
+    feed_url_cache[1].assert_not_called()
+
+
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_fresh_cache_hit(mock_post, feed_url_cache):
+    feed_url_cache[0].return_value = {"url": "http://example.com/feed.xml", "fetched_at": time.time()}
+
+    assert rss_fetcher.get_rss_feed_url("The Daily") == "http://example.com/feed.xml"
+    mock_post.assert_not_called()
+
+
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_negative_cache_hit(mock_post, feed_url_cache):
+    feed_url_cache[0].return_value = {"url": None, "fetched_at": time.time()}
+
+    assert rss_fetcher.get_rss_feed_url("SomeInvalidPodcastTitle123") is None
+    mock_post.assert_not_called()
+
+
+@patch("podcast_audio_resolver_service.rss_fetcher._refresh_in_background")
+@patch("podcast_audio_resolver_service.rss_fetcher.http_client.post")
+def test_get_rss_feed_url_stale_served_while_revalidating(mock_post, mock_refresh, feed_url_cache):
+    stale_at = time.time() - CacheService.FEED_URL_FRESH_SECONDS - 1
+    feed_url_cache[0].return_value = {"url": "http://example.com/old.xml", "fetched_at": stale_at}
+
+    assert rss_fetcher.get_rss_feed_url("The Daily") == "http://example.com/old.xml"
+    mock_post.assert_not_called()
+    mock_refresh.assert_called_once_with("title", "The Daily", rss_fetcher._fetch_feed_url_by_title)
@@ -51,3 +51,123 @@ async def test_consumer_message_processing(monkeypatch):
 
         mock_summarize.assert_called_once()
         mock_broadcast.assert_awaited_once_with("job123", payload)
+
+
+def _entry(parsed):
+    return {"data": json.dumps(parsed)}
+
+
+def test_handle_entry_relays_updates_then_acks():
+    parsed = {
+        "job_id": "job123",
+        "summary_type": "ts",
+        "transcript": "Climate change is real.",
+        "transcript_id": "a" * 64,
+        "metadata": {
+            "summary": "Climate story",
+            "show_title": "Planet Voices",
+            "show_summary": "Voices from the climate frontlines"
+        }
+    }
+    events = []
+
+    with patch("summarization_service.transcription_complete_consumer.summarize.get_summary", return_value="Summary") as mock_summarize, \
+         patch("summarization_service.transcription_complete_consumer.CacheService") as mock_cache, \
+         patch("summarization_service.transcription_complete_consumer.publish_job_update",
+               side_effect=lambda job_id, payload: events.append(("publish", payload["status"]))), \
+         patch("summarization_service.transcription_complete_consumer.redis_client") as mock_redis:
+        mock_cache.get_cached_summary.return_value = None
+        mock_cache.has_cached_transcript.return_value = True
+        mock_redis.xack.side_effect = lambda *args: events.append(("ack", args[2]))
+
+        transcription_complete_consumer._slots.acquire()
+        transcription_complete_consumer._handle_entry(None, "1-0", _entry(parsed))
+
+        mock_summarize.assert_called_once()
+        # Looked up by the id from the event, without rehashing the transcript
+        mock_cache.get_cached_summary.assert_called_once_with("a" * 64, "ts")
+        mock_cache.get_transcript_id.assert_not_called()
+        mock_cache.set_cached_summary.assert_called_once_with("a" * 64, "ts", "Summary")
+        assert events == [
+            ("publish", "summarization_received"),
+            ("publish", "done"),
+            ("ack", "1-0")
+        ]
+
+
+def test_handle_entry_uses_cached_summary():
+    parsed = {
+        "job_id": "job123",
+        "summary_type": "ts",
+        "transcript": "Climate change is real.",
+        "metadata": {"summary": "", "show_title": "", "show_summary": ""}
+    }
+
+    with patch("summarization_service.transcription_complete_consumer.summarize.get_summary") as mock_summarize, \
+         patch("summarization_service.transcription_complete_consumer.CacheService") as mock_cache, \
+         patch("summarization_service.transcription_complete_consumer.publish_job_update") as mock_publish, \
+         patch("summarization_service.transcription_complete_consumer.redis_client"):
+        mock_cache.get_transcript_id.return_value = "b" * 64
+        mock_cache.get_cached_summary.return_value = "Cached summary"
+
+        transcription_complete_consumer._slots.acquire()
+        transcription_complete_consumer._handle_entry(None, "2-0", _entry(parsed))
+
+        mock_summarize.assert_not_called()
+        mock_cache.set_cached_summary.assert_not_called()
+        final_payload = mock_publish.call_args[0][1]
+        assert final_payload["status"] == "done"
+        assert final_payload["summary"] == "Cached summary"
+
+
+def test_slow_summary_keeps_its_inflight_claim_until_acked():
+    parsed = {
+        "job_id": "job123",
+        "platform": "apple",
+        "episode_id": "123",
+        "summary_type": "ts",
+        "transcript": "Climate change is real.",
+        "transcript_id": "a" * 64,
+        "metadata": {"summary": "", "show_title": "", "show_summary": ""}
+    }
+
+    def slow_summary(*args):
+        # Heartbeats fire while the LLM call is still running
+        transcription_complete_consumer._refresh_inflight_jobs()
+        return "Summary"
+
+    module = "summarization_service.transcription_complete_consumer"
+    with patch(f"{module}.summarize.get_summary", side_effect=slow_summary), \
+         patch(f"{module}.CacheService") as mock_cache, \
+         patch(f"{module}.publish_job_update"), \
+         patch(f"{module}.redis_client"):
+        mock_cache.get_cached_summary.return_value = None
+
+        transcription_complete_consumer._slots.acquire()
+        transcription_complete_consumer._handle_entry(None, "3-0", _entry(parsed))
+
+        mock_cache.refresh_inflight_jobs.assert_called_once_with([("apple", "123", "ts", "job123")])
+        transcription_complete_consumer._refresh_inflight_jobs()
+        assert mock_cache.refresh_inflight_jobs.call_args[0][0] == []
+
+
+def test_consumer_runs_shared_loop_on_worker_pool():
+    module = "summarization_service.transcription_complete_consumer"
+    with patch(f"{module}.ensure_consumer_group"), \
+         patch(f"{module}.consume_group") as mock_consume, \
+         patch(f"{module}._executor") as mock_executor:
+        transcription_complete_consumer.consume_transcription_completed("loop")
+
+        args = mock_consume.call_args[0]
+        assert args[:5] == (
+            transcription_complete_consumer.TRANSCRIPTION_COMPLETE_STREAM,
+            transcription_complete_consumer.CONSUMER_GROUP,
+            transcription_complete_consumer.CONSUMER_NAME,
+            transcription_complete_consumer._slots,
+            transcription_complete_consumer.WORKER_COUNT
+        )
+        args[7]("1-0", {"data": "{}"})
+        mock_executor.submit.assert_called_once_with(
+            transcription_complete_consumer._handle_entry, "loop", "1-0", {"data": "{}"}
+        )
+        assert mock_consume.call_args[1]["on_heartbeat"] is transcription_complete_consumer._refresh_inflight_jobs
@@ -0,0 +1,40 @@
+import hashlib
+from unittest.mock import patch, MagicMock
+from transcription_service import assemblyai_transcriber
+
+
+def test_upload_stream_hashes_while_uploading():
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = iter([b"first ", b"", b"second"])
+    uploaded = []
+
+    def upload_file(stream):
+        # The upload consumes the download as it arrives
+        uploaded.extend(stream)
+        return "https://cdn.assemblyai.com/upload/abc"
+
+    with patch("transcription_service.assemblyai_transcriber.requests.get", return_value=response) as mock_get, \
+         patch.object(assemblyai_transcriber.transcriber, "upload_file", side_effect=upload_file):
+        upload_url, file_hash = assemblyai_transcriber.upload_stream("https://example.com/ep.mp3")
+
+    assert upload_url == "https://cdn.assemblyai.com/upload/abc"
+    assert uploaded == [b"first ", b"second"]
+    assert file_hash == hashlib.md5(b"first second").hexdigest()
+    assert mock_get.call_args[1]["stream"] is True
+
+
+def test_transcribe_url_relays_enclosures_assemblyai_cannot_fetch():
+    def transcribe_audio(audio_source):
+        if audio_source == "https://example.com/ep.mp3":
+            raise assemblyai_transcriber.aai.TranscriptError("Download error")
+        return "Relayed."
+
+    with patch("transcription_service.assemblyai_transcriber.transcribe_audio", side_effect=transcribe_audio) as mock_transcribe, \
+         patch("transcription_service.assemblyai_transcriber.upload_stream",
+               return_value=("https://cdn.assemblyai.com/upload/abc", "md5")) as mock_upload:
+        transcript = assemblyai_transcriber.transcribe_url("https://example.com/ep.mp3")
+
+    assert transcript == "Relayed."
+    mock_upload.assert_called_once_with("https://example.com/ep.mp3")
+    assert mock_transcribe.call_args[0][0] == "https://cdn.assemblyai.com/upload/abc"
@@ -0,0 +1,68 @@
+import random
+from unittest.mock import patch
+from transcription_service import audio_fingerprint
+
+
+def _recording(seed, length):
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for _ in range(length)]
+
+
+def _reencoded(items, seed):
+    """Flip a couple of bits in some items, as a lossy re-encode does"""
+    rng = random.Random(seed)
+    return [item ^ (0b11 << rng.randrange(30)) if rng.random() < 0.3 else item for item in items]
+
+
+def test_ad_varied_copy_aligns_with_shifted_segments():
+    episode = _recording(1, 2000)
+    # Different pre-roll and mid-roll ads around the same episode audio
+    first = _recording(2, 150) + episode[:1000] + _recording(3, 100) + episode[1000:]
+    second = _reencoded(_recording(4, 250) + episode[:1000] + _recording(5, 200) + episode[1000:], seed=6)
+
+    coverage, segments = audio_fingerprint.align(second, first)
+
+    assert coverage > 0.8
+    assert len(segments) == 2
+    # Each copy's episode audio starts after its own pre-roll
+    assert segments[0]["start"] == round(250 * audio_fingerprint.ITEM_SECONDS, 1)
+    assert segments[0]["cached_start"] == round(150 * audio_fingerprint.ITEM_SECONDS, 1)
+
+
+def test_different_episodes_do_not_align():
+    coverage, segments = audio_fingerprint.align(_recording(1, 2000), _recording(2, 2000))
+
+    assert coverage == 0
+    assert segments == []
+
+
+def test_copies_share_a_minhash_band():
+    episode = _recording(1, 2000)
+    bands = audio_fingerprint._bands(_recording(2, 150) + episode)
+    other_bands = audio_fingerprint._bands(_recording(3, 300) + episode)
+
+    assert set(bands) & set(other_bands)
+    assert not set(bands) & set(audio_fingerprint._bands(_recording(4, 2000)))
+
+
+def test_find_match_picks_candidate_above_coverage():
+    episode = _recording(1, 2000)
+    fingerprint = {"items": _recording(2, 100) + episode, "bands": []}
+    candidates = {
+        "samehash": {"transcript_id": "t" * 64, "items": episode},
+        "otherhash": {"transcript_id": "o" * 64, "items": _recording(3, 2000)}
+    }
+
+    with patch("transcription_service.audio_fingerprint.CacheService.get_audio_fingerprint_candidates",
+               return_value=candidates):
+        match = audio_fingerprint.find_match(fingerprint)
+
+    assert match["file_hash"] == "samehash"
+    assert match["transcript_id"] == "t" * 64
+    assert match["coverage"] >= audio_fingerprint.MIN_COVERAGE
+
+
+def test_fingerprinting_disabled_without_fpcalc(monkeypatch):
+    monkeypatch.setattr(audio_fingerprint, "FPCALC_PATH", None)
+
+    assert audio_fingerprint.fingerprint_file("episode.mp3") is None
@@ -1,9 +1,12 @@
 import pytest
 import asyncio
 import json
-from unittest.mock import patch, MagicMock, mock_open
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
 
+from transcription_service import audio_upload_consumer
 from transcription_service.audio_upload_consumer import _handle_message
+from cache_service import CacheService
 
 
 @pytest.mark.asyncio
@@ -22,7 +25,7 @@ async def test_handle_message_success():
     dummy_transcript = "This is a dummy transcript for testing."
 
     with patch("os.path.exists", return_value=True) as mock_exists, \
-         patch("builtins.open", mock_open(read_data=b"fake audio data")) as mock_file, \
+         patch("transcription_service.audio_upload_consumer.file_hashing.hash_file", return_value="fakehash") as mock_hash, \
          patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash", return_value=None) as mock_cache_get, \
          patch("transcription_service.audio_upload_consumer.CacheService.set_cached_transcript_by_hash", return_value=True) as mock_cache_set, \
          patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_audio", return_value=dummy_transcript) as mock_transcribe, \
@@ -33,8 +36,11 @@ async def test_handle_message_success():
         # Verify file existence was checked
         mock_exists.assert_called_once_with("audio_files/fake.mp3")
         
+        # The hash is computed off the event loop by the shared helper
+        mock_hash.assert_called_once_with("audio_files/fake.mp3")
+
         # Verify cache was checked and set
-        mock_cache_get.assert_called_once()
+        mock_cache_get.assert_called_once_with("fakehash")
         mock_cache_set.assert_called_once()
         
         # Verify transcription was called
@@ -45,3 +51,401 @@ async def test_handle_message_success():
         emitted_data = mock_emit.call_args[0][0]
         assert emitted_data["transcript"] == dummy_transcript
         assert emitted_data["job_id"] == "xyz123"
+        assert emitted_data["transcript_id"] == CacheService.get_transcript_id(dummy_transcript)
+        # The same id is used for the cache entry, so it is only computed once
+        assert mock_cache_set.call_args[0][2] == emitted_data["transcript_id"]
+
+
+@pytest.mark.asyncio
+async def test_handle_message_cache_hit_forwards_transcript_id():
+    parsed_data = {
+        "file_path": "audio_files/fake.mp3",
+        "file_hash": "abc123",
+        "metadata": {},
+        "summary_type": "ts",
+        "job_id": "xyz123"
+    }
+    cached = {"transcript": "Cached transcript.", "transcript_hash": "f" * 64}
+
+    with patch("os.path.exists", return_value=True), \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash", return_value=cached), \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_audio") as mock_transcribe, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_transcribe.assert_not_called()
+        emitted_data = mock_emit.call_args[0][0]
+        assert emitted_data["transcript"] == "Cached transcript."
+        assert emitted_data["transcript_id"] == "f" * 64
+
+
+@pytest.mark.asyncio
+async def test_handle_message_streams_when_file_not_local():
+    parsed_data = {
+        "file_path": "audio_files/store/ab/abc.mp3",
+        "file_hash": "abc",
+        "audio_url": "https://example.com/ep.mp3",
+        "metadata": {},
+        "summary_type": "ts",
+        "job_id": "xyz123"
+    }
+
+    with patch("os.path.exists", return_value=False), \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.upload_stream",
+               return_value=("https://cdn.assemblyai.com/upload/1", "streamedhash")) as mock_upload, \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash", return_value=None) as mock_cache_get, \
+         patch("transcription_service.audio_upload_consumer.CacheService.set_cached_transcript_by_hash", return_value=True) as mock_cache_set, \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_audio", return_value="Streamed.") as mock_transcribe, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_upload.assert_called_once_with("https://example.com/ep.mp3")
+        # The resolver's hash is tried first; the streamed bytes' hash keys the new entry
+        assert [call[0][0] for call in mock_cache_get.call_args_list] == ["abc", "streamedhash"]
+        mock_transcribe.assert_called_once_with("https://cdn.assemblyai.com/upload/1")
+        assert mock_cache_set.call_args[0][0] == "streamedhash"
+        assert mock_emit.call_args[0][0]["transcript"] == "Streamed."
+
+
+@pytest.mark.asyncio
+async def test_handle_message_streamed_audio_can_hit_cache():
+    parsed_data = {"audio_url": "https://example.com/ep.mp3", "metadata": {}, "job_id": "xyz123"}
+
+    with patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.upload_stream",
+               return_value=("https://cdn.assemblyai.com/upload/1", "streamedhash")), \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash",
+               return_value={"transcript": "Cached.", "transcript_hash": "f" * 64}), \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_audio") as mock_transcribe, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_transcribe.assert_not_called()
+        assert mock_emit.call_args[0][0]["transcript_id"] == "f" * 64
+
+
+@pytest.mark.asyncio
+async def test_handle_message_streamed_audio_checks_sent_hash_before_uploading():
+    parsed_data = {
+        "file_path": "audio_files/store/ab/abc.mp3",
+        "file_hash": "abc",
+        "audio_url": "https://example.com/ep.mp3",
+        "metadata": {},
+        "job_id": "xyz123"
+    }
+
+    with patch("os.path.exists", return_value=False), \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.upload_stream") as mock_upload, \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash",
+               return_value={"transcript": "Cached.", "transcript_hash": "f" * 64}) as mock_cache_get, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_cache_get.assert_called_once_with("abc")
+        mock_upload.assert_not_called()
+        assert mock_emit.call_args[0][0]["transcript"] == "Cached."
+
+
+@pytest.mark.asyncio
+async def test_handle_message_url_mode_checks_cache_before_any_transfer():
+    parsed_data = {
+        "audio_url": "https://example.com/ep.mp3",
+        "audio_source": "url",
+        "file_hash": "enclosurekey",
+        "metadata": {},
+        "job_id": "xyz123"
+    }
+
+    with patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.upload_stream") as mock_upload, \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash", return_value=None) as mock_cache_get, \
+         patch("transcription_service.audio_upload_consumer.CacheService.set_cached_transcript_by_hash", return_value=True) as mock_cache_set, \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_url", return_value="Fetched.") as mock_transcribe, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_upload.assert_not_called()
+        mock_cache_get.assert_called_once_with("enclosurekey")
+        mock_transcribe.assert_called_once_with("https://example.com/ep.mp3")
+        assert mock_cache_set.call_args[0][0] == "enclosurekey"
+        assert mock_emit.call_args[0][0]["transcript"] == "Fetched."
+
+
+@pytest.mark.asyncio
+async def test_handle_message_reuses_transcript_of_matching_audio(monkeypatch):
+    monkeypatch.setattr(audio_upload_consumer.audio_fingerprint, "FPCALC_PATH", "/usr/bin/fpcalc")
+    parsed_data = {"file_path": "audio_files/store/ab/abc.mp3", "file_hash": "advariedhash", "metadata": {}, "job_id": "xyz123"}
+    match = {"file_hash": "originalhash", "transcript_id": "f" * 64, "coverage": 0.9, "segments": []}
+    cached = {"transcript": "Cached.", "transcript_hash": "f" * 64}
+
+    with patch("os.path.exists", return_value=True), \
+         patch("transcription_service.audio_upload_consumer.audio_fingerprint.fingerprint_file",
+               return_value={"items": [1], "bands": ["0:1-2"]}), \
+         patch("transcription_service.audio_upload_consumer.audio_fingerprint.find_match", return_value=match), \
+         patch("transcription_service.audio_upload_consumer.CacheService.get_cached_transcript_by_hash",
+               side_effect=[None, cached]) as mock_cache_get, \
+         patch("transcription_service.audio_upload_consumer.CacheService.set_cached_transcript_by_hash") as mock_cache_set, \
+         patch("transcription_service.audio_upload_consumer.CacheService.link_file_hash_to_transcript") as mock_link, \
+         patch("transcription_service.audio_upload_consumer.assemblyai_transcriber.transcribe_audio") as mock_transcribe, \
+         patch("transcription_service.audio_upload_consumer.transcription_complete_producer.emit_transcription_completed") as mock_emit:
+
+        await _handle_message(parsed_data)
+
+        mock_transcribe.assert_not_called()
+        assert mock_cache_get.call_args_list[1][0][0] == "originalhash"
+        # The new file's hash now points straight at the shared transcript,
+        # whose blob is not rewritten
+        mock_link.assert_called_once_with("advariedhash", "f" * 64)
+        mock_cache_set.assert_not_called()
+        emitted = mock_emit.call_args[0][0]
+        assert emitted["transcript_id"] == "f" * 64
+        assert emitted["fingerprint_match"] == match
+
+
+@pytest.mark.asyncio
+async def test_missing_audio_fails_job_and_releases_episode():
+    parsed_data = {
+        "file_path": "audio_files/gone.mp3",
+        "platform": "apple",
+        "episode_id": "123",
+        "summary_type": "ts",
+        "job_id": "xyz123"
+    }
+
+    with patch("os.path.exists", return_value=False), \
+         patch("transcription_service.audio_upload_consumer.CacheService") as mock_cache, \
+         patch("transcription_service.audio_upload_consumer.publish_job_update") as mock_publish, \
+         patch("transcription_service.audio_upload_consumer.redis_client"):
+        future = asyncio.run_coroutine_threadsafe(_handle_message(parsed_data), asyncio.get_running_loop())
+        await asyncio.sleep(0.05)
+        assert isinstance(future.exception(), FileNotFoundError)
+
+        audio_upload_consumer._slots.acquire()
+        audio_upload_consumer._on_handled("1-0", parsed_data, future)
+
+        assert mock_publish.call_args[0][1]["status"] == "error"
+        mock_cache.release_inflight_job.assert_called_once_with("apple", "123", "ts", "xyz123")
+
+
+@pytest.mark.asyncio
+async def test_dispatch_acks_after_handling():
+    from transcription_service import audio_upload_consumer
+
+    entries = [("1-0", {"data": json.dumps({"file_path": "audio_files/fake.mp3", "job_id": "xyz123"})})]
+
+    with patch("transcription_service.audio_upload_consumer._handle_message", new_callable=AsyncMock) as mock_handle, \
+         patch("transcription_service.audio_upload_consumer.redis_client") as mock_redis:
+
+        for msg_id, data in entries:
+            audio_upload_consumer._slots.acquire()
+            audio_upload_consumer._dispatch_entry(asyncio.get_running_loop(), msg_id, data)
+        await asyncio.sleep(0.05)
+
+        mock_handle.assert_awaited_once()
+        mock_redis.xack.assert_called_once_with(
+            audio_upload_consumer.AUDIO_UPLOADED_STREAM, audio_upload_consumer.CONSUMER_GROUP, "1-0"
+        )
+        assert "1-0" not in audio_upload_consumer._in_flight
+
+
+@pytest.mark.asyncio
+async def test_dispatch_acks_malformed_messages_without_handling():
+    from transcription_service import audio_upload_consumer
+
+    entries = [("1-0", {"data": "not json"}), ("2-0", {})]
+
+    with patch("transcription_service.audio_upload_consumer._handle_message", new_callable=AsyncMock) as mock_handle, \
+         patch("transcription_service.audio_upload_consumer.redis_client") as mock_redis:
+
+        for msg_id, data in entries:
+            audio_upload_consumer._slots.acquire()
+            audio_upload_consumer._dispatch_entry(asyncio.get_running_loop(), msg_id, data)
+
+        mock_handle.assert_not_called()
+        acked = [call[0][2] for call in mock_redis.xack.call_args_list]
+        assert acked == ["1-0", "2-0"]
+
+
+def test_claim_stale_messages_pages_through_xautoclaim():
+    import redis_stream_client
+
+    with patch("redis_stream_client.redis_client") as mock_redis:
+        mock_redis.xautoclaim.side_effect = [
+            ["5-0", [("1-0", {"data": "{}"})], []],
+            ["0-0", [("6-0", {"data": "{}"})], []],
+        ]
+
+        claimed = redis_stream_client.claim_stale_messages("audio_uploaded", "group", "consumer", 60000, 10)
+
+        assert [msg_id for msg_id, _ in claimed] == ["1-0", "6-0"]
+        assert mock_redis.xautoclaim.call_args_list[1][1]["start_id"] == "5-0"
+        assert mock_redis.xautoclaim.call_args[1]["min_idle_time"] == 60000
+
+
+def test_trim_consumed_keeps_entries_any_group_still_needs():
+    import redis_stream_client
+
+    with patch("redis_stream_client.redis_client") as mock_redis:
+        mock_redis.xinfo_groups.return_value = [
+            {"name": "transcription_service", "last-delivered-id": "900-0"},
+            {"name": "audit", "last-delivered-id": "700-3"},
+        ]
+        # The first group still has 450-1 pending; the second has nothing pending
+        mock_redis.xpending.side_effect = [{"pending": 2, "min": "450-1"}, {"pending": 0, "min": None}]
+
+        redis_stream_client.trim_consumed("audio_uploaded")
+
+        mock_redis.xtrim.assert_called_once_with("audio_uploaded", minid="450-1", approximate=True)
+
+        # A group that hasn't read anything yet keeps the whole stream
+        mock_redis.xtrim.reset_mock()
+        mock_redis.xinfo_groups.return_value = [{"name": "new", "last-delivered-id": "0-0"}]
+        mock_redis.xpending.side_effect = [{"pending": 0, "min": None}]
+        redis_stream_client.trim_consumed("audio_uploaded")
+        mock_redis.xtrim.assert_not_called()
+
+
+def test_acquire_free_slots_pauses_when_all_busy():
+    import redis_stream_client
+
+    slots = threading.BoundedSemaphore(2)
+    assert redis_stream_client.acquire_free_slots(slots, 2, timeout=0.1) == 2
+    # Every slot is held, so the read loop gets nothing to read with
+    assert redis_stream_client.acquire_free_slots(slots, 2, timeout=0.01) == 0
+
+
+def test_get_metrics_reports_in_flight_and_queue_depth():
+    from transcription_service import audio_upload_consumer
+
+    with patch("redis_stream_client.redis_client") as mock_redis:
+        mock_redis.xinfo_groups.return_value = [
+            {"name": "other_group", "pending": 9, "lag": 9},
+            {"name": audio_upload_consumer.CONSUMER_GROUP, "pending": 2, "lag": 7},
+        ]
+        with audio_upload_consumer._in_flight_lock:
+            audio_upload_consumer._in_flight.add("9-0")
+        try:
+            metrics = audio_upload_consumer.get_metrics()
+        finally:
+            audio_upload_consumer._in_flight.discard("9-0")
+
+        assert metrics["in_flight"] == 1
+        assert metrics["pending"] == 2
+        assert metrics["queue_depth"] == 7
+        assert metrics["max_concurrency"] == audio_upload_consumer.MAX_CONCURRENT_TRANSCRIPTIONS
+
+
+class _StopConsumer(BaseException):
+    pass
+
+
+def _run_consume_group(mock_redis, handle_entry, slots=None, on_heartbeat=None):
+    import redis_stream_client
+
+    slots = slots or threading.BoundedSemaphore(1)
+    in_flight = set()
+    with pytest.raises(_StopConsumer):
+        redis_stream_client.consume_group(
+            "audio_uploaded", "group", "consumer", slots, 1, in_flight, threading.Lock(),
+            handle_entry, 60000, claim_interval_seconds=0, read_error_backoff_seconds=5,
+            on_heartbeat=on_heartbeat
+        )
+    return slots, in_flight
+
+
+def test_consume_group_keeps_reading_after_redis_errors():
+    with patch("redis_stream_client.redis_client") as mock_redis, \
+         patch("redis_stream_client.time.sleep") as mock_sleep:
+        mock_redis.xclaim.side_effect = ConnectionError("reset")
+        mock_redis.xautoclaim.side_effect = ConnectionError("reset")
+        mock_redis.xreadgroup.side_effect = [ConnectionError("reset"), [], _StopConsumer()]
+        on_heartbeat = MagicMock(side_effect=ConnectionError("reset"))
+
+        slots, _ = _run_consume_group(mock_redis, MagicMock(), on_heartbeat=on_heartbeat)
+
+        assert mock_redis.xreadgroup.call_count == 3
+        mock_sleep.assert_called_once_with(5)
+        # Job leases are refreshed every interval even while stream heartbeats fail
+        assert on_heartbeat.call_count == 3
+        # Every slot taken for a read that came back empty was returned
+        assert slots.acquire(blocking=False)
+
+
+def test_consume_group_survives_failed_dispatch():
+    handled = []
+    slots = threading.BoundedSemaphore(1)
+
+    def handle_entry(msg_id, data):
+        handled.append(msg_id)
+        if msg_id == "1-0":
+            raise RuntimeError("executor shut down")
+        # Finished at once; the failed entry must have freed the only slot
+        slots.release()
+
+    with patch("redis_stream_client.redis_client") as mock_redis:
+        mock_redis.xautoclaim.return_value = ["0-0", [], []]
+        mock_redis.xreadgroup.side_effect = [
+            [("audio_uploaded", [("1-0", {"data": "{}"})])],
+            [("audio_uploaded", [("2-0", {"data": "{}"})])],
+            _StopConsumer(),
+        ]
+
+        _, in_flight = _run_consume_group(mock_redis, handle_entry, slots)
+
+        assert handled == ["1-0", "2-0"]
+        # Only the dispatched entry is heartbeated; the failed one is left to reclaiming
+        assert in_flight == {"2-0"}
+
+
+def test_consume_audio_uploaded_runs_shared_loop():
+    module = "transcription_service.audio_upload_consumer"
+    with patch(f"{module}.ensure_consumer_group"), \
+         patch(f"{module}.consume_group") as mock_consume, \
+         patch(f"{module}._dispatch_entry") as mock_dispatch:
+        audio_upload_consumer.consume_audio_uploaded("loop")
+
+        args = mock_consume.call_args[0]
+        assert args[:5] == (
+            audio_upload_consumer.AUDIO_UPLOADED_STREAM, audio_upload_consumer.CONSUMER_GROUP,
+            audio_upload_consumer.CONSUMER_NAME, audio_upload_consumer._slots,
+            audio_upload_consumer.MAX_CONCURRENT_TRANSCRIPTIONS
+        )
+        args[7]("1-0", {"data": "{}"})
+        mock_dispatch.assert_called_once_with("loop", "1-0", {"data": "{}"})
+        assert mock_consume.call_args[1]["on_heartbeat"] is audio_upload_consumer._refresh_inflight_jobs
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_refreshes_claim_of_running_job_until_acked():
+    data = {"data": json.dumps({
+        "audio_url": "https://example.com/ep.mp3", "platform": "apple",
+        "episode_id": "123", "summary_type": "ts", "job_id": "xyz123"
+    })}
+    started = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def slow_transcription(parsed_data):
+        started.set()
+        await finish.wait()
+
+    module = "transcription_service.audio_upload_consumer"
+    with patch(f"{module}._handle_message", side_effect=slow_transcription), \
+         patch(f"{module}.redis_client"), \
+         patch(f"{module}.CacheService") as mock_cache:
+        audio_upload_consumer._slots.acquire()
+        audio_upload_consumer._dispatch_entry(asyncio.get_running_loop(), "1-0", data)
+        await started.wait()
+
+        # However long the transcription runs, every heartbeat extends its claim
+        audio_upload_consumer._refresh_inflight_jobs()
+        audio_upload_consumer._refresh_inflight_jobs()
+        assert mock_cache.refresh_inflight_jobs.call_args_list[-1][0][0] == [("apple", "123", "ts", "xyz123")]
+        assert mock_cache.refresh_inflight_jobs.call_count == 2
+
+        finish.set()
+        await asyncio.sleep(0.05)
+        audio_upload_consumer._refresh_inflight_jobs()
+        assert mock_cache.refresh_inflight_jobs.call_args[0][0] == []
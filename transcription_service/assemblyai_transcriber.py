@@ -1,5 +1,8 @@
 import os
+import hashlib
+from typing import Tuple
 import assemblyai as aai
+import requests
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,13 +27,51 @@ config = aai.TranscriptionConfig(
 
 transcriber = aai.Transcriber(config=config)
 
-def transcribe_audio(file_path: str):
+# Enclosures streamed to AssemblyAI are read from the publisher in chunks this large
+STREAM_CHUNK_BYTES = 256 * 1024
+STREAM_TIMEOUT = (3.05, float(os.getenv("STREAM_READ_TIMEOUT", "30")))
+
+class _HashingStream:
+    """Yields a download's chunks to the upload, hashing them on the way"""
+
+    def __init__(self, response: requests.Response):
+        self._chunks = response.iter_content(chunk_size=STREAM_CHUNK_BYTES)
+        self.md5 = hashlib.md5()
+        self.size = 0
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if chunk:  # Filter out keep-alive chunks
+                self.md5.update(chunk)
+                self.size += len(chunk)
+                yield chunk
+
+def upload_stream(audio_url: str) -> Tuple[str, str]:
+    """
+    Pipe an enclosure from its publisher into an AssemblyAI upload without
+    staging it on disk; the upload proceeds as the download arrives.
+    Returns (upload_url, file_hash), the hash being the same MD5 the
+    resolver computes for files it downloads.
+    """
+    print(f"Streaming {audio_url} to AssemblyAI...")
+    with requests.get(audio_url, stream=True, timeout=STREAM_TIMEOUT) as response:
+        response.raise_for_status()
+        stream = _HashingStream(response)
+        upload_url = transcriber.upload_file(stream)
+    print(f"Uploaded {stream.size} bytes")
+    return upload_url, stream.md5.hexdigest()
+
+def transcribe_audio(audio_source: str):
+    """Transcribe a local file, or audio at a URL AssemblyAI can fetch (e.g. an upload_url)"""
     print("Transcribing...")
     try:
-        transcript = transcriber.transcribe(file_path, config=config)
+        transcript = transcriber.transcribe(audio_source, config=config)
     except Exception as e:
         print(f"Transcription failed: {e}")
         raise
+    if transcript.status == aai.TranscriptStatus.error:
+        print(f"Transcription failed: {transcript.error}")
+        raise aai.TranscriptError(transcript.error)
 
     final_transcript = []
     print("Transcript:")
@@ -39,3 +80,16 @@ def transcribe_audio(file_path: str):
         final_transcript.append(line)
 
     return "\n".join(final_transcript)
+
+def transcribe_url(audio_url: str):
+    """
+    Have AssemblyAI fetch a public enclosure itself, so the audio is neither
+    downloaded nor re-uploaded here. Publishers that refuse AssemblyAI's
+    fetcher are relayed through upload_stream instead.
+    """
+    try:
+        return transcribe_audio(audio_url)
+    except aai.TranscriptError as e:
+        print(f"⚠️ AssemblyAI could not transcribe {audio_url} directly ({e}), relaying it instead")
+    upload_url, _ = upload_stream(audio_url)
+    return transcribe_audio(upload_url)
@@ -0,0 +1,152 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from cache_service import CacheService
+
+# Dynamic ad insertion means two downloads of one episode rarely share an MD5,
+# so transcripts are also matched by acoustic fingerprint. Fingerprints come
+# from Chromaprint's fpcalc (apt: libchromaprint-tools), which decodes the
+# audio itself; without it only byte-identical files reuse a transcript.
+FPCALC_PATH = os.getenv("FPCALC_PATH") or shutil.which("fpcalc")
+FPCALC_TIMEOUT = 120
+# Each raw Chromaprint item describes this many seconds of audio
+ITEM_SECONDS = 0.1238
+# Items differing in at most this many of their 32 bits are the same sound
+MAX_BIT_ERRORS = int(os.getenv("FINGERPRINT_MAX_BIT_ERRORS", "8"))
+# Shortest run of matching audio that counts as a shared segment (~10s), and
+# the unmatched items tolerated inside one
+MIN_SEGMENT_ITEMS = 80
+MAX_GAP_ITEMS = 8
+# Share of both recordings that shared segments must cover before a transcript is reused
+MIN_COVERAGE = float(os.getenv("FINGERPRINT_MIN_COVERAGE", "0.8"))
+# Items this common in a recording (silence, tones) say nothing about alignment
+MAX_ITEM_REPEATS = 20
+# Alignment offsets tried per candidate, most voted first
+MAX_OFFSETS = 20
+# Candidates are found by MinHash LSH: recordings sharing any band of their
+# signature are compared item by item
+MINHASH_BANDS = 16
+MINHASH_ROWS = 2
+MAX_CANDIDATES = 10
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: every replica must derive the same bands
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+
+def _bands(items: List[int]) -> List[str]:
+    distinct = set(items)
+    signature = [min((a * item + b) % _PRIME for item in distinct) for a, b in _PERMUTATIONS]
+    return [
+        f"{band}:" + "-".join(str(value) for value in signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+        for band in range(MINHASH_BANDS)
+    ]
+
+def fingerprint_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Fingerprint a file's decoded audio as {"items", "bands"}. Returns None
+    if fpcalc is not installed or can't read the file. Runs a subprocess;
+    call it from a worker thread.
+    """
+    if not FPCALC_PATH:
+        return None
+    try:
+        result = subprocess.run(
+            [FPCALC_PATH, "-raw", "-json", "-length", "0", file_path],
+            capture_output=True, timeout=FPCALC_TIMEOUT, check=True
+        )
+        items = json.loads(result.stdout)["fingerprint"]
+    except (OSError, subprocess.SubprocessError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not fingerprint {file_path}: {e}")
+        return None
+    if not items:
+        return None
+    return {"items": items, "bands": _bands(items)}
+
+def align(items: List[int], cached_items: List[int]) -> Tuple[float, List[Dict[str, float]]]:
+    """
+    Find stretches of audio two recordings share, each at its own offset
+    since inserted or removed ads shift everything after them. Returns the
+    share of each recording the stretches cover (the smaller of the two)
+    and the stretches as seconds in both recordings.
+    """
+    if not items or not cached_items:
+        return 0.0, []
+    positions = defaultdict(list)
+    for position, item in enumerate(cached_items):
+        positions[item].append(position)
+    # Exact item matches vote for the offset between the recordings
+    votes = Counter()
+    for position, item in enumerate(items):
+        matches = positions.get(item)
+        if matches and len(matches) <= MAX_ITEM_REPEATS:
+            for cached_position in matches:
+                votes[cached_position - position] += 1
+
+    covered = bytearray(len(items))
+    cached_covered = bytearray(len(cached_items))
+    segments = []
+
+    def add_segment(start, end, offset):
+        # Neighbouring offsets often find the same stretch again
+        if sum(covered[start:end + 1]) * 2 > end - start + 1:
+            return
+        covered[start:end + 1] = b"\x01" * (end - start + 1)
+        cached_covered[start + offset:end + offset + 1] = b"\x01" * (end - start + 1)
+        segments.append({
+            "start": round(start * ITEM_SECONDS, 1),
+            "end": round((end + 1) * ITEM_SECONDS, 1),
+            "cached_start": round((start + offset) * ITEM_SECONDS, 1)
+        })
+
+    for offset, count in votes.most_common(MAX_OFFSETS):
+        if count < MIN_SEGMENT_ITEMS // 4:
+            break
+        first, stop = max(0, -offset), min(len(items), len(cached_items) - offset)
+        run_start = last_match = None
+        # Bit errors are counted item by item, so near matches count too
+        for position in range(first, stop + 1):
+            if position < stop and (items[position] ^ cached_items[position + offset]).bit_count() <= MAX_BIT_ERRORS:
+                if run_start is None:
+                    run_start = position
+                last_match = position
+            elif run_start is not None and (position == stop or position - last_match > MAX_GAP_ITEMS):
+                if last_match - run_start + 1 >= MIN_SEGMENT_ITEMS:
+                    add_segment(run_start, last_match, offset)
+                run_start = None
+
+    coverage = min(sum(covered) / len(items), sum(cached_covered) / len(cached_items))
+    segments.sort(key=lambda segment: segment["start"])
+    return coverage, segments
+
+def find_match(fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The transcribed recording closest to this fingerprint, if shared
+    segments cover at least MIN_COVERAGE of both: {"file_hash",
+    "transcript_id", "coverage", "segments"}.
+    """
+    candidates = CacheService.get_audio_fingerprint_candidates(fingerprint["bands"], MAX_CANDIDATES)
+    best = None
+    for file_hash, cached in (candidates or {}).items():
+        coverage, segments = align(fingerprint["items"], cached["items"])
+        if coverage >= MIN_COVERAGE and (best is None or coverage > best["coverage"]):
+            best = {
+                "file_hash": file_hash,
+                "transcript_id": cached["transcript_id"],
+                "coverage": round(coverage, 3),
+                "segments": segments
+            }
+    return best
+
+def remember(file_hash: str, transcript_id: str, fingerprint: Dict[str, Any]) -> bool:
+    """Make a transcribed recording findable by find_match"""
+    return CacheService.set_audio_fingerprint(
+        file_hash, transcript_id, fingerprint["items"], fingerprint["bands"]
+    )
@@ -1,9 +1,42 @@
-from redis_stream_client import redis_client, AUDIO_UPLOADED_STREAM
-from transcription_service import assemblyai_transcriber, transcription_complete_producer
+from redis_stream_client import (
+    redis_client, AUDIO_UPLOADED_STREAM, ensure_consumer_group, default_consumer_name,
+    consume_group, consumer_group_backlog, publish_job_update
+)
+from transcription_service import assemblyai_transcriber, audio_fingerprint, transcription_complete_producer
 from cache_service import CacheService
+import file_hashing
+from concurrent.futures import ThreadPoolExecutor
 import asyncio, json, time
-import hashlib
 import os
+import threading
+
+# Consumer group settings: every transcription replica joins the same group
+# and Redis hands each audio_uploaded message to exactly one of them
+CONSUMER_GROUP = os.getenv("TRANSCRIPTION_CONSUMER_GROUP", "transcription_service")
+CONSUMER_NAME = os.getenv("TRANSCRIPTION_CONSUMER_NAME", default_consumer_name())
+# Upper bound on concurrent AssemblyAI jobs in this replica; the read loop
+# stops pulling messages while every slot is busy, leaving them in the stream
+MAX_CONCURRENT_TRANSCRIPTIONS = int(os.getenv("TRANSCRIPTION_MAX_CONCURRENCY", "2"))
+READ_BLOCK_MS = 5000
+# Messages pending longer than this on a consumer that stopped heartbeating
+# (i.e. crashed) are reclaimed by another replica
+CLAIM_MIN_IDLE_MS = int(os.getenv("TRANSCRIPTION_CLAIM_MIN_IDLE_MS", str(5 * 60 * 1000)))
+CLAIM_INTERVAL_SECONDS = 30
+# Pause after a failed stream read before trying again
+READ_ERROR_BACKOFF_SECONDS = 5
+
+# Message ids this consumer is still working on (shared with the event loop thread)
+_in_flight: set = set()
+_in_flight_lock = threading.Lock()
+# In-flight job claim (platform, episode_id, summary_type, job_id) of each of
+# those messages, refreshed on every heartbeat so long transcriptions keep it
+_in_flight_jobs: dict = {}
+# One slot per allowed transcription; released once the message is acked
+_slots = threading.BoundedSemaphore(MAX_CONCURRENT_TRANSCRIPTIONS)
+# Dedicated pool so uploads can't exhaust the event loop's default executor
+_transcribe_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_TRANSCRIPTIONS, thread_name_prefix="transcriber"
+)
 
 
 temp_msg = """[Speaker A] You're listening to TED Talks Daily where we bring you new ideas to spark your curiosity every day. I'm your host, Elise Hume. People living across the South Pacific in island nations like Polynesia and Micronesia make up less than 1% of global greenhouse gas emissions and yet they are among the most vulnerable to the threat of climate change. But climate justice advocate Fenton Lutana Tabua doesn't want to feed into the narrative that they are only victims of the climate crisis waiting to be saved. In his 2024 talk, Fenton, a Fiji native himself shares the importance of using community led storytelling to break stereotypes of victimhood.
@@ -15,42 +48,118 @@ temp_msg = """[Speaker A] You're listening to TED Talks Daily where we bring you
 [Speaker B] Why am I so socially awkward? And what am I going to do about that?
 [Speaker C] Now? Ty is a psychologist and expert on awkwardness, and he has some answers. So awkward. That's next time on the TED Radio Hour from npr. Subscribe or listen to the TED Radio Hour wherever you get your podcasts"""
 
+def _find_fingerprint_match(file_path, file_hash):
+    """
+    Fingerprint a local file and look for a transcribed recording of the
+    same audio. Returns (fingerprint, cached_transcript); a match is also
+    cached under file_hash so the next identical file skips fingerprinting.
+    """
+    fingerprint = audio_fingerprint.fingerprint_file(file_path)
+    if not fingerprint:
+        return None, None
+    match = audio_fingerprint.find_match(fingerprint)
+    if not match:
+        return fingerprint, None
+    cached_transcript = CacheService.get_cached_transcript_by_hash(match["file_hash"])
+    if not cached_transcript:
+        return fingerprint, None
+    print(
+        f"🎯 Audio matches {match['file_hash'][:8]}... "
+        f"({match['coverage']:.0%} shared in {len(match['segments'])} segments)"
+    )
+    CacheService.link_file_hash_to_transcript(file_hash, match["transcript_id"])
+    return fingerprint, {**cached_transcript, "fingerprint_match": match}
+
 async def _handle_message(parsed_data):
     start_time = time.time()
+    loop = asyncio.get_running_loop()
     
-    # Use pre-computed file hash if available, otherwise compute it
-    file_path = parsed_data['file_path']
-    if not os.path.exists(file_path):
-        print(f"❌ Audio file not found: {file_path}")
-        return
+    # Local file if the resolver downloaded one we can see, otherwise the enclosure URL
+    file_path = parsed_data.get('file_path')
+    audio_url = parsed_data.get('audio_url')
+    # In URL mode AssemblyAI fetches the enclosure itself and file_hash is the
+    # resolver's enclosure key, so the cache is checked before any audio moves
+    fetch_remotely = bool(
+        parsed_data.get('audio_source') == 'url' and audio_url and parsed_data.get('file_hash')
+    )
+    # Unusable messages raise so _on_handled reports the job and frees its episode
+    if fetch_remotely:
+        file_path = None
+    elif file_path and not os.path.exists(file_path):
+        if not audio_url:
+            raise FileNotFoundError(f"Audio file not found: {file_path}")
+        # Downloaded on another machine; stream it ourselves
+        print(f"⚠️ Audio file not on this machine, streaming instead: {file_path}")
+        file_path = None
+    elif not file_path and not audio_url:
+        raise ValueError("Message has neither a file path nor an audio URL")
+    source_label = file_path or audio_url
+    cached_transcript = checked_hash = None
     
-    # Check if file_hash was pre-computed during download
-    if 'file_hash' in parsed_data and parsed_data['file_hash']:
+    if fetch_remotely:
+        audio_source = audio_url
         file_hash = parsed_data['file_hash']
-        print(f"🎯 Using pre-computed file hash: {file_hash[:8]}...")
+        print(f"🎯 Using enclosure key: {file_hash[:8]}...")
+    elif file_path:
+        audio_source = file_path
+        # Check if file_hash was pre-computed during download
+        if 'file_hash' in parsed_data and parsed_data['file_hash']:
+            file_hash = parsed_data['file_hash']
+            print(f"🎯 Using pre-computed file hash: {file_hash[:8]}...")
+        else:
+            # Fallback: compute hash by reading file (for backward compatibility)
+            print(f"🔄 Computing file hash for {file_path}...")
+            file_hash = await loop.run_in_executor(_transcribe_executor, file_hashing.hash_file, file_path)
+            print(f"📝 Computed file hash: {file_hash[:8]}...")
     else:
-        # Fallback: compute hash by reading file (for backward compatibility)
-        print(f"🔄 Computing file hash for {file_path}...")
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        print(f"📝 Computed file hash: {file_hash[:8]}...")
+        file_hash = checked_hash = parsed_data.get('file_hash')
+        # The resolver hashed its copy already; a cached transcript means
+        # nothing has to be downloaded or uploaded
+        if file_hash:
+            cached_transcript = CacheService.get_cached_transcript_by_hash(file_hash)
+        if not cached_transcript:
+            # The upload to AssemblyAI overlaps the download from the publisher;
+            # the hash is known once both finish
+            audio_source, file_hash = await loop.run_in_executor(
+                _transcribe_executor, assemblyai_transcriber.upload_stream, audio_url
+            )
+            print(f"📝 Streamed file hash: {file_hash[:8]}...")
     
     # Check transcript cache first
-    cached_transcript = CacheService.get_cached_transcript_by_hash(file_hash)
+    if not cached_transcript and file_hash != checked_hash:
+        cached_transcript = CacheService.get_cached_transcript_by_hash(file_hash)
+    fingerprint = None
+    if not cached_transcript and file_path and audio_fingerprint.FPCALC_PATH:
+        # The same episode with different ads has different bytes but mostly the same sound
+        fingerprint, cached_transcript = await loop.run_in_executor(
+            _transcribe_executor, _find_fingerprint_match, file_path, file_hash
+        )
+        if cached_transcript:
+            parsed_data["fingerprint_match"] = cached_transcript.pop("fingerprint_match")
     if cached_transcript:
-        print(f"🎯 Found cached transcript for {file_path}")
+        print(f"🎯 Found cached transcript for {source_label}")
         message_txt = cached_transcript["transcript"]
+        # Entries written before the normalized layout don't carry their id
+        transcript_id = cached_transcript.get("transcript_hash") or CacheService.get_transcript_id(message_txt)
         end_time = time.time()
         total_time = end_time - start_time
         print(f"Retrieved cached transcript in {total_time}s")
     else:
         # No cached transcript, perform transcription
-        print(f"🔄 Transcribing {file_path}...")
-        message_txt = await asyncio.to_thread(assemblyai_transcriber.transcribe_audio, file_path)
+        print(f"🔄 Transcribing {source_label}...")
+        if fetch_remotely:
+            transcribe = assemblyai_transcriber.transcribe_url
+        else:
+            transcribe = assemblyai_transcriber.transcribe_audio
+        message_txt = await loop.run_in_executor(_transcribe_executor, transcribe, audio_source)
         end_time = time.time()
         total_time = end_time - start_time
         print(f"Transcribed and diarized data in {total_time}")
 
+        # Hash the transcript once here; the id travels with the event so the
+        # summarizer never has to rehash it
+        transcript_id = CacheService.get_transcript_id(message_txt)
+
         # Cache the transcript for future use
         transcript_data = {
             "transcript": message_txt,
@@ -61,46 +170,125 @@ async def _handle_message(parsed_data):
             "file_hash": file_hash,
             "summaries": {}
         }
-        CacheService.set_cached_transcript_by_hash(file_hash, transcript_data)
-        print(f"💾 Cached transcript for {file_path}")
+        CacheService.set_cached_transcript_by_hash(file_hash, transcript_data, transcript_id)
+        if fingerprint:
+            audio_fingerprint.remember(file_hash, transcript_id, fingerprint)
+        print(f"💾 Cached transcript for {source_label}")
 
     # now process & emit
     parsed_data["transcript"] = message_txt
+    parsed_data["transcript_id"] = transcript_id
     transcription_complete_producer.emit_transcription_completed(parsed_data)
-    print(f"✅ Processed and emitted for {parsed_data['file_path']}")
+    print(f"✅ Processed and emitted for {source_label}")
 
-def consume_audio_uploaded(loop):
-    print("🎧 Trimming old stream entries and starting consumer...")
-    redis_client.xtrim(AUDIO_UPLOADED_STREAM, maxlen=0)
-    last_id = "0"  # only listen to *new* messages
-    print("👂 Listening for audio_uploaded events...")
+def _ack(msg_id):
+    try:
+        redis_client.xack(AUDIO_UPLOADED_STREAM, CONSUMER_GROUP, msg_id)
+    except Exception as e:
+        print(f"⚠️ Failed to ack {msg_id}: {e}")
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(msg_id)
+            _in_flight_jobs.pop(msg_id, None)
+        _slots.release()
+
+def _refresh_inflight_jobs():
+    with _in_flight_lock:
+        jobs = list(_in_flight_jobs.values())
+    CacheService.refresh_inflight_jobs(jobs)
 
+def _fail_job(parsed_data, error):
+    """Report a failed transcription to the job's clients and free its episode for retries"""
+    job_id = parsed_data.get("job_id")
+    if not job_id:
+        return
+    payload = {
+        "job_id": job_id,
+        "status": "error",
+        "error": str(error)
+    }
+    CacheService.set_job_result(job_id, payload)
     try:
-        while True:
-            messages = redis_client.xread({AUDIO_UPLOADED_STREAM: last_id}, block=60000, count=1)
-            for stream, entries in messages:
-                for msg_id, data in entries:
-                    print(f"🎧 Received: {data.get('data')}")
-                    last_id = msg_id
-                    raw_json = data.get('data')
-                    if raw_json:
-                        try:
-                            parsed_data = json.loads(raw_json)
-                        except json.JSONDecodeError as e:
-                            print("❌ Failed to decode JSON:", e)
-                            continue
-                        except Exception as e:
-                            print(e);
-                    else:
-                        print("No Data Found")
-                        continue
-                    asyncio.run_coroutine_threadsafe(
-                        _handle_message(parsed_data),
-                        loop
-                    )
-
-    except asyncio.CancelledError:
-        print("🛑 Consumer task cancelled — shutting down gracefully.")
+        publish_job_update(job_id, payload)
+    except Exception as e:
+        print(f"⚠️ Failed to publish failure of job {job_id}: {e}")
+    if parsed_data.get("platform") and parsed_data.get("episode_id"):
+        CacheService.release_inflight_job(
+            parsed_data["platform"], parsed_data["episode_id"], parsed_data.get("summary_type"), job_id
+        )
+
+def _on_handled(msg_id, parsed_data, future):
+    # Failed jobs are acked too (no automatic retry); only messages held by a
+    # consumer that died before finishing are redelivered via XAUTOCLAIM
+    error = future.exception()
+    if error:
+        print(f"❌ Failed to process {msg_id}: {error}")
+        _fail_job(parsed_data, error)
+    _ack(msg_id)
+
+def _dispatch_entry(loop, msg_id, data):
+    """Schedule one entry on the loop; the caller holds its slot"""
+    if not data:
+        # Entry was trimmed from the stream while pending
+        _ack(msg_id)
+        return
+    print(f"🎧 Received: {data.get('data')}")
+    raw_json = data.get('data')
+    if not raw_json:
+        print("No Data Found")
+        _ack(msg_id)
+        return
+    try:
+        parsed_data = json.loads(raw_json)
+    except json.JSONDecodeError as e:
+        print("❌ Failed to decode JSON:", e)
+        _ack(msg_id)
+        return
+    if parsed_data.get("platform") and parsed_data.get("episode_id") and parsed_data.get("job_id"):
+        with _in_flight_lock:
+            _in_flight_jobs[msg_id] = (
+                parsed_data["platform"], parsed_data["episode_id"],
+                parsed_data.get("summary_type"), parsed_data["job_id"]
+            )
+    future = asyncio.run_coroutine_threadsafe(
+        _handle_message(parsed_data),
+        loop
+    )
+    future.add_done_callback(
+        lambda f: _on_handled(msg_id, parsed_data, f)
+    )
+
+def get_metrics():
+    """Concurrency and backlog figures for this replica"""
+    with _in_flight_lock:
+        in_flight = len(_in_flight)
+    metrics = {
+        "in_flight": in_flight,
+        "max_concurrency": MAX_CONCURRENT_TRANSCRIPTIONS,
+        "pending": None,
+        "queue_depth": None,
+    }
+    try:
+        backlog = consumer_group_backlog(AUDIO_UPLOADED_STREAM, CONSUMER_GROUP)
+        metrics["pending"] = backlog["pending"]
+        metrics["queue_depth"] = backlog["lag"]
+    except Exception as e:
+        print(f"⚠️ Failed to read {AUDIO_UPLOADED_STREAM} backlog: {e}")
+    return metrics
+
+def consume_audio_uploaded(loop):
+    ensure_consumer_group(AUDIO_UPLOADED_STREAM, CONSUMER_GROUP)
+    print(
+        f"👂 Listening for audio_uploaded events as {CONSUMER_NAME} in group {CONSUMER_GROUP} "
+        f"(max {MAX_CONCURRENT_TRANSCRIPTIONS} concurrent transcriptions)..."
+    )
+    consume_group(
+        AUDIO_UPLOADED_STREAM, CONSUMER_GROUP, CONSUMER_NAME,
+        _slots, MAX_CONCURRENT_TRANSCRIPTIONS, _in_flight, _in_flight_lock,
+        lambda msg_id, data: _dispatch_entry(loop, msg_id, data),
+        CLAIM_MIN_IDLE_MS, CLAIM_INTERVAL_SECONDS, READ_BLOCK_MS, READ_ERROR_BACKOFF_SECONDS,
+        on_heartbeat=_refresh_inflight_jobs
+    )
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
 
-from transcription_service.audio_upload_consumer import consume_audio_uploaded
+from transcription_service.audio_upload_consumer import consume_audio_uploaded, get_metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,3 +18,8 @@ app = FastAPI(lifespan=lifespan)
 @app.get("/health")
 def health_check():
     return {"status": "transcription_service is running"}
+
+@app.get("/metrics")
+def metrics():
+    """In-flight transcriptions and audio_uploaded backlog for this replica"""
+    return get_metrics()
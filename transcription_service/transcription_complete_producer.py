@@ -1,10 +1,10 @@
-from redis_stream_client import redis_client, TRANSCRIPTION_COMPLETE_STREAM
+from redis_stream_client import redis_client, TRANSCRIPTION_COMPLETE_STREAM, trim_consumed
 import json
 
 def emit_transcription_completed(data: dict):
     redis_client.xadd(TRANSCRIPTION_COMPLETE_STREAM, {"data": json.dumps(data)})
-    redis_client.xtrim(TRANSCRIPTION_COMPLETE_STREAM, maxlen="500")
-    print(f"✅ Event emitted: transcription_completed for {data['file_path']}")
+    trim_consumed(TRANSCRIPTION_COMPLETE_STREAM)
+    print(f"✅ Event emitted: transcription_completed for {data.get('file_path') or data.get('audio_url')}")
 
 # Example usage
 # if __name__ == "__main__":